@@ -0,0 +1,234 @@
+"""Batched HTTP/JSON capacity API for other systems.
+
+POST /capacity with a JSON body
+
+    {"resources": {...},                      # optional, default office
+     "scenarios": [{"name": "a", "mix": [0.76, 0.09, 0.15], "demand": 45}, ...]}
+
+returns {"config_key", "resource_names", "results": [...]}, one result per
+scenario in the same format as dmv_cli.py (capacity, bottleneck, feasibility
+and per-resource utilization). All scenarios of a request that are not
+already cached are evaluated in one calculate_capacity_batch call. Parsed
+configurations and per-scenario results are kept in LRU caches keyed by the
+config hash. GET /health reports cache statistics.
+
+The server is plain asyncio (HTTP/1.1 with keep-alive, no extra packages).
+CapacityAPI.handle does all the work, so LocalClient can call it in-process
+without sockets.
+
+Usage:
+    python dmv_api.py --port 8080
+    curl -X POST localhost:8080/capacity -d '{"scenarios": [{"mix": [0.8, 0.05, 0.15], "demand": 50}]}'
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+import numpy as np
+
+from dmv_cache import LRUCache, config_key
+from dmv_core import (
+    DEFAULT_DEMAND, DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG, calculate_capacity_batch, config_to_matrix, scenario_reports
+)
+
+# Same tolerance as dmv_core.validate_mix
+MIX_TOLERANCE = 1e-6
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_SCENARIOS = 100_000
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    """A client error, answered with the given HTTP status and message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class CapacityAPI:
+    """Request handling and caches, independent of the transport"""
+
+    def __init__(self, config_cache_size=64, result_cache_size=100_000):
+        self.configs = LRUCache(maxsize=config_cache_size)
+        self.results = LRUCache(maxsize=result_cache_size)
+        self.requests = 0
+        self.scenarios_evaluated = 0
+
+    def _config(self, resources_config):
+        """(key, resource names, times, units) for a config, parsed once per distinct config"""
+        if not isinstance(resources_config, dict) or not resources_config:
+            raise RequestError(400, "'resources' must be a non-empty object of resource pools")
+        key = config_key(resources_config)
+
+        def parse():
+            try:
+                names, times, units = config_to_matrix(resources_config)
+            except (KeyError, TypeError, ValueError, AttributeError) as exc:
+                raise RequestError(400, f"Invalid resources config: {exc!r}") from exc
+            if not (np.isfinite(times).all() and np.isfinite(units).all()) or (times < 0).any() or (units < 0).any():
+                raise RequestError(400, "Process times and 'num_resources' must be finite and non-negative")
+            return key, names, times, units
+
+        return self.configs.get_or_compute(key, parse)
+
+    def _parse_scenarios(self, scenarios):
+        if not isinstance(scenarios, list) or not scenarios:
+            raise RequestError(400, "'scenarios' must be a non-empty list")
+        if len(scenarios) > MAX_SCENARIOS:
+            raise RequestError(413, f"At most {MAX_SCENARIOS} scenarios per request")
+        try:
+            names = [str(s.get("name", f"scenario_{i + 1}")) for i, s in enumerate(scenarios)]
+            mixes = np.array([s.get("mix", DEFAULT_MIX) for s in scenarios], dtype=float)
+            demand = np.array([s.get("demand", DEFAULT_DEMAND) for s in scenarios], dtype=float)
+        except (AttributeError, TypeError, ValueError) as exc:
+            raise RequestError(400, f"Scenarios need a numeric 'mix' of three shares and 'demand': {exc}") from exc
+        if mixes.ndim != 2 or mixes.shape[1] != 3:
+            raise RequestError(400, "Every 'mix' must have exactly three shares")
+        bad = np.flatnonzero((mixes < 0).any(axis=1) | (np.abs(mixes.sum(axis=1) - 1) > MIX_TOLERANCE)
+                             | ~np.isfinite(demand) | (demand < 0))
+        if len(bad):
+            raise RequestError(400, f"{len(bad)} scenario(s), first {names[bad[0]]!r}, need non-negative mix "
+                                    f"shares summing to 1 and a finite, non-negative demand")
+        return names, mixes, demand
+
+    def evaluate(self, payload):
+        """Evaluate a /capacity request body (already decoded) and return the response dict"""
+        if not isinstance(payload, dict):
+            raise RequestError(400, "Request body must be a JSON object")
+        key, resource_names, times, units = self._config(payload.get("resources", DEFAULT_RESOURCES_CONFIG))
+        names, mixes, demand = self._parse_scenarios(payload.get("scenarios"))
+
+        # Reuse cached scenarios, evaluate the rest as one batch
+        scenario_keys = [(key,) + tuple(m) + (d,) for m, d in zip(mixes.tolist(), demand.tolist())]
+        cached = [self.results.get(k) for k in scenario_keys]
+        missing = [i for i, c in enumerate(cached) if c is None]
+        if missing:
+            batch = calculate_capacity_batch(mixes[missing], times, units)
+            for i, report in zip(missing, scenario_reports(batch, mixes[missing], demand[missing], resource_names, units)):
+                self.results.put(scenario_keys[i], report)
+                cached[i] = report
+            self.scenarios_evaluated += len(missing)
+
+        return {
+            "config_key": key,
+            "resource_names": resource_names,
+            "results": [{"scenario": name, **report} for name, report in zip(names, cached)],
+        }
+
+    async def handle(self, method, path, body):
+        """Route one request; returns (status, JSON-ready dict)"""
+        self.requests += 1
+        path = path.split("?", 1)[0]
+        try:
+            if path == "/health":
+                if method != "GET":
+                    raise RequestError(405, "Use GET")
+                return 200, {"status": "ok", "requests": self.requests, "scenarios_evaluated": self.scenarios_evaluated,
+                             "config_cache": self.configs.stats(), "result_cache": self.results.stats()}
+            if path == "/capacity":
+                if method != "POST":
+                    raise RequestError(405, "Use POST")
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError as exc:
+                    raise RequestError(400, f"Body is not valid JSON: {exc}") from exc
+                return 200, self.evaluate(payload)
+            raise RequestError(404, f"No route for {path}")
+        except RequestError as exc:
+            return exc.status, {"error": str(exc)}
+
+
+class LocalClient:
+    """Calls a CapacityAPI in-process, e.g. from tests or notebooks (not from inside a running event loop)"""
+
+    def __init__(self, api=None):
+        self.api = api or CapacityAPI()
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        status, response = asyncio.run(self.api.handle(method, path, body))
+        # Round-trip through JSON so callers see exactly what an HTTP client would
+        return status, json.loads(json.dumps(response))
+
+    def capacity(self, scenarios, resources=None):
+        payload = {"scenarios": scenarios}
+        if resources is not None:
+            payload["resources"] = resources
+        return self.request("POST", "/capacity", payload)
+
+
+# ============================================================================
+# HTTP SERVER
+# ============================================================================
+async def _respond(writer, status, payload, keep_alive):
+    data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + data)
+    await writer.drain()
+
+
+def make_connection_handler(api):
+    async def serve_connection(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await _respond(writer, 413, {"error": f"Body larger than {MAX_BODY_BYTES} bytes"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = await api.handle(method, target, body)
+                except Exception as exc:  # a failing request still gets a reply, and the server keeps running
+                    status, payload = 500, {"error": f"Internal error: {type(exc).__name__}: {exc}"}
+                await _respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    return serve_connection
+
+
+async def serve(host="127.0.0.1", port=8080, api=None):
+    server = await asyncio.start_server(make_connection_handler(api or CapacityAPI()), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve batched DMV capacity calculations over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+    print(f"Serving on http://{args.host}:{args.port} (POST /capacity, GET /health)", file=sys.stderr)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,72 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
 import numpy as np
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from dmv_cache import LRUCache, config_key
+from dmv_charts import (
+    build_capacity_figure,
+    build_mix_figure,
+    build_multiday_figure,
+    build_bottleneck_map_figure,
+    build_plan_figure,
+    build_profile_figure,
+    build_utilization_figure,
+    build_wait_curve_figure,
+)
+from dmv_core import DEFAULT_RESOURCES_CONFIG, calculate_utilization, find_bottleneck
+from dmv_demand import DEFAULT_HOURLY_PROFILE, DemandProfile
+from dmv_instrument import PROFILERS, RunRecorder, debug_enabled_from_env, make_profiler
+from dmv_multiday import (
+    analytic_multiday,
+    demand_schedule,
+    settling_day,
+    simulate_multiday,
+    split_routes,
+    steady_state_load,
+)
+from dmv_plan import bottleneck_changes, demand_forecast, forecast_dates, mix_trend, plan_capacity, rollup
+from dmv_queueing import pool_visit_profile, queue_curves
+from dmv_regions import BottleneckMap
+from dmv_surface import load_surface
+from dmv_sim import make_process_pool, run_replications
+from dmv_store import ScenarioStore
+
+# Number of results, tables and figures kept in the shared scenario cache
+SCENARIO_CACHE_SIZE = 512
 
 st.set_page_config(page_title="DMV License Renewal Capacity", layout="wide", initial_sidebar_state="expanded")
 
+# Stage timings and the debug panel are off unless DMV_DEBUG is set or the URL has ?debug=1
+debug_mode = debug_enabled_from_env() or st.query_params.get("debug") == "1"
+recorder = RunRecorder(enabled=debug_mode)
+
+# A profiled run that ended in an error never reached stop_profiler(); don't let it profile this run too
+leftover_profiler = st.session_state.pop("active_profiler", None)
+if leftover_profiler is not None:
+    leftover_profiler.stop()
+
+profiler = None
+if debug_mode and st.session_state.pop("profile_next_run", False):
+    try:
+        profiler = make_profiler(st.session_state.get("profiler_name", "cprofile"))
+        profiler.start()
+        st.session_state["active_profiler"] = profiler
+    except ImportError as exc:
+        profiler = None
+        st.warning(str(exc))
+
+
+def stop_profiler():
+    """Stop this run's profiler, if any, and return its report; call before st.stop() and st.rerun()"""
+    global profiler
+    st.session_state.pop("active_profiler", None)
+    report = profiler.stop() if profiler is not None else None
+    profiler = None
+    return report
+
+
 st.title("🚗 DMV License Renewal - Capacity Analysis Tool")
 
 st.markdown("""
@@ -39,6 +100,7 @@ with st.sidebar:
     
     if p3 < 0:
         st.error("❌ Sum exceeds 100%. Please adjust sliders.")
+        stop_profiler()
         st.stop()
     
     st.write(f"**Type 3: No proper docs:** {p3}%")
@@ -58,540 +120,922 @@ with st.sidebar:
     
     # Reset button
     if st.button("🔄 Reset to Default"):
+        stop_profiler()
         st.session_state.clear()
         st.rerun()
 
 # ============================================================================
-# RESOURCE CONFIGURATION
+# RESOURCE CONFIGURATION & CAPACITY CALCULATION (see dmv_core.py)
 # ============================================================================
-resources_config = {
-    "Review Clerks": {
-        "Type 1": 2.5,
-        "Type 2": 2.5,
-        "Type 3": 2.5,  # All applicants need document review
-        "num_resources": 2,
-        "description": "Review documents for violations and restrictions"
-    },
-    "Cashiers": {
-        "Type 1": 1.0,
-        "Type 2": 1.0,
-        "Type 3": 0.0,  # Type 3 leaves at review stage
-        "num_resources": 2,
-        "description": "Process license renewal payment"
-    },
-    "Eye Exam Clerks": {
-        "Type 1": 2.0,
-        "Type 2": 4.0,  # Fails once (2 min), returns to pass (2 min) = 4 min total
-        "Type 3": 0.0,  # Type 3 leaves at review stage
-        "num_resources": 2,
-        "description": "Conduct vision screening test"
-    },
-    "Photo/Printing Machines": {
-        "Type 1": 3.0,
-        "Type 2": 3.0,
-        "Type 3": 0.0,  # Type 3 leaves at review stage
-        "num_resources": 4,
-        "description": "Take photo and print license"
-    },
-}
+resources_config = DEFAULT_RESOURCES_CONFIG
 
-# ============================================================================
-# CAPACITY CALCULATION FUNCTION
-# ============================================================================
-def calculate_capacity(p1, p2, p3, resources_config):
-    """Calculate capacity metrics for each resource using product aggregation method"""
-    results = {}
-    
-    for resource_name, resource_info in resources_config.items():
-        t1 = resource_info["Type 1"]
-        t2 = resource_info["Type 2"]
-        t3 = resource_info["Type 3"]
-        num_resources = resource_info["num_resources"]
-        
-        # Aggregate effective mean process time (in minutes)
-        # T_agg = p1*T1 + p2*T2 + p3*T3
-        t_agg = p1 * t1 + p2 * t2 + p3 * t3
-        
-        # Effective capacity per hour per resource
-        # C_eff = 60 minutes/hour / T_agg
-        if t_agg > 0:
-            capacity_per_hour = 60 / t_agg
-            pool_capacity = capacity_per_hour * num_resources
-        else:
-            capacity_per_hour = float('inf')
-            pool_capacity = float('inf')
-        
-        results[resource_name] = {
-            "t1": t1,
-            "t2": t2,
-            "t3": t3,
-            "t_agg": t_agg,
-            "capacity_per_hour": capacity_per_hour,
-            "num_resources": num_resources,
-            "pool_capacity": pool_capacity,
-            "description": resource_info["description"]
-        }
-    
-    return results
 
-results = calculate_capacity(p1_dec, p2_dec, p3_dec, resources_config)
+@st.cache_resource
+def get_scenario_cache():
+    """One LRU cache per server process, shared by every session"""
+    return LRUCache(maxsize=SCENARIO_CACHE_SIZE)
 
-# Find bottleneck
-bottleneck_resource = min(
-    results.items(), 
-    key=lambda x: x[1]['pool_capacity'] if x[1]['pool_capacity'] != float('inf') else float('inf')
-)
-system_capacity = bottleneck_resource[1]['pool_capacity']
 
-# ============================================================================
-# MAIN CONTENT - TABS
-# ============================================================================
-tab1, tab2, tab3, tab4 = st.tabs(["📋 Executive Summary", "📊 Detailed Analysis", "📈 Visualizations", "❓ About"])
+@st.cache_resource
+def get_capacity_surface(resources_config):
+    """Capacity at every whole-percent mix, memory-mapped from disk and shared by every session"""
+    return load_surface(resources_config)
 
-# ============================================================================
-# TAB 1: EXECUTIVE SUMMARY
-# ============================================================================
-with tab1:
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric(
-            "System Capacity",
-            f"{system_capacity:.2f}",
-            "licenses/hr",
-            help="Maximum number of licenses the DMV can renew per hour"
-        )
-    
-    with col2:
-        st.metric(
-            "Bottleneck Resource",
-            bottleneck_resource[0].replace(" Clerks", "").replace(" Machines", ""),
-            help="The resource limiting the system's capacity"
-        )
-    
-    with col3:
-        daily_capacity = system_capacity * 8
-        st.metric(
-            "8-Hour Capacity",
-            f"{daily_capacity:.0f}",
-            "licenses/day",
-            help="Maximum number of licenses in an 8-hour operating day"
-        )
-    
-    with col4:
-        weekly_capacity = system_capacity * 8 * 5
-        st.metric(
-            "Weekly Capacity",
-            f"{weekly_capacity:.0f}",
-            "licenses/week",
-            help="Maximum number of licenses in a 40-hour week"
-        )
-    
-    st.divider()
+
+@st.cache_resource
+def get_scenario_store():
+    """Saved scenarios on disk, shared by every session; kept in memory if the store directory is not writable"""
+    try:
+        return ScenarioStore()
+    except (OSError, sqlite3.Error):
+        return ScenarioStore(":memory:")
+
+
+@st.cache_resource
+def get_simulation_pools():
+    """Worker processes for simulation replications plus a thread that waits on them, shared by every session"""
+    processes = make_process_pool()
+    waiter = ThreadPoolExecutor(max_workers=2)
+    return processes, waiter
+
+
+with recorder.stage("config"):
+    scenario_cache = get_scenario_cache()
+    capacity_surface = get_capacity_surface(resources_config)
     
-    # Summary table
-    st.subheader("📋 Resource Capacity Summary Table")
+    # Everything except the utilization section depends only on the mix and the config
+    mix_key = (config_key(resources_config), p1, p2, p3)
+
+with recorder.stage("compute"):
+    # Slider positions are whole percents, so this is a lookup into the precomputed surface
+    results = capacity_surface.results(p1, p2)
     
+    # Find bottleneck
+    bottleneck_resource = find_bottleneck(results)
+    system_capacity = bottleneck_resource[1]['pool_capacity']
+
+# ============================================================================
+# TABLE BUILDERS
+# ============================================================================
+def format_capacity(value):
+    return f"{value:.2f}" if value != float('inf') else "∞"
+
+
+def build_summary_table(results, bottleneck_name):
     summary_data = []
     for resource_name, data in results.items():
-        bottleneck_indicator = "🔴" if resource_name == bottleneck_resource[0] else ""
+        bottleneck_indicator = "🔴" if resource_name == bottleneck_name else ""
         summary_data.append({
             "🎯": bottleneck_indicator,
             "Resource": resource_name,
             "# Units": data['num_resources'],
             "Agg. Time (min)": f"{data['t_agg']:.3f}",
-            "Capacity/Unit/hr": f"{data['capacity_per_hour']:.2f}" if data['capacity_per_hour'] != float('inf') else "∞",
-            "Pool Capacity/hr": f"{data['pool_capacity']:.2f}" if data['pool_capacity'] != float('inf') else "∞",
+            "Capacity/Unit/hr": format_capacity(data['capacity_per_hour']),
+            "Pool Capacity/hr": format_capacity(data['pool_capacity']),
         })
-    
-    summary_df = pd.DataFrame(summary_data)
-    st.dataframe(summary_df, use_container_width=True, hide_index=True)
-    
-    st.caption("🔴 = Bottleneck resource (limits system capacity)")
+    return pd.DataFrame(summary_data)
+
+
+def build_process_table(results):
+    process_times = []
+    for resource_name, data in results.items():
+        process_times.append({
+            "Resource": resource_name,
+            "Type 1": f"{data['t1']:.1f}",
+            "Type 2": f"{data['t2']:.1f}",
+            "Type 3": f"{data['t3']:.1f}",
+            "Aggregate": f"{data['t_agg']:.3f}"
+        })
+    return pd.DataFrame(process_times)
+
+
+def build_capacity_table(results):
+    capacity_data = []
+    for resource_name, data in results.items():
+        capacity_data.append({
+            "Resource": resource_name,
+            "Per Unit": format_capacity(data['capacity_per_hour']),
+            "Pool Total": format_capacity(data['pool_capacity'])
+        })
+    return pd.DataFrame(capacity_data)
+
+
+def build_comparison_table(comparison):
+    """One row per saved scenario with changes against the comparison baseline"""
+    rows = []
+    for i, scenario in enumerate(comparison["scenarios"]):
+        p1_saved, p2_saved, p3_saved = scenario["mix"]
+        row = {
+            "Scenario": scenario["name"],
+            "Tags": ", ".join(scenario["tags"]),
+            "Mix (%)": f"{p1_saved:.0%} / {p2_saved:.0%} / {p3_saved:.0%}",
+            "Demand": comparison["demand"][i],
+            "Capacity/hr": format_capacity(comparison["system_capacity"][i]),
+            "Δ Capacity": comparison["capacity_change"][i],
+            "Bottleneck": ("🔄 " if comparison["bottleneck_changed"][i] else "") + comparison["bottleneck"][i],
+            "Feasible": "✅" if comparison["feasible"][i] else "❌",
+        }
+        for r, resource_name in enumerate(comparison["resource_names"]):
+            row[f"{resource_name} Util %"] = comparison["utilization"][i, r]
+            row[f"Δ {resource_name}"] = comparison["utilization_change"][i, r]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def record_fragment_timings(scope, fragment_recorder):
+    """Log a fragment's stage timings and keep them for the debug panel"""
+    if fragment_recorder.enabled:
+        fragment_recorder.log(scope=scope)
+        st.session_state.setdefault("fragment_timings", {})[scope] = fragment_recorder.as_rows()
+
+
+# ============================================================================
+# MAIN CONTENT - TABS
+# ============================================================================
+TAB_LABELS = ["📋 Executive Summary", "📊 Detailed Analysis", "📈 Visualizations", "❓ About"]
+
+# Only the open tab is rendered (tab.open is False for the others); Streamlit
+# versions without lazy tabs have no tab.open, and there every tab is rendered
+try:
+    tab1, tab2, tab3, tab4 = st.tabs(TAB_LABELS, key="main_tabs", on_change="rerun")
+except TypeError:
+    tab1, tab2, tab3, tab4 = st.tabs(TAB_LABELS)
+
+
+def tab_is_open(tab):
+    """False only for a lazy tab that is not selected"""
+    return getattr(tab, "open", None) is not False
+
+
+# ============================================================================
+# TAB 1: EXECUTIVE SUMMARY
+# ============================================================================
+with tab1:
+    if tab_is_open(tab1):
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric(
+                "System Capacity",
+                f"{system_capacity:.2f}",
+                "licenses/hr",
+                help="Maximum number of licenses the DMV can renew per hour"
+            )
+        
+        with col2:
+            st.metric(
+                "Bottleneck Resource",
+                bottleneck_resource[0].replace(" Clerks", "").replace(" Machines", ""),
+                help="The resource limiting the system's capacity"
+            )
+        
+        with col3:
+            daily_capacity = system_capacity * 8
+            st.metric(
+                "8-Hour Capacity",
+                f"{daily_capacity:.0f}",
+                "licenses/day",
+                help="Maximum number of licenses in an 8-hour operating day"
+            )
+        
+        with col4:
+            weekly_capacity = system_capacity * 8 * 5
+            st.metric(
+                "Weekly Capacity",
+                f"{weekly_capacity:.0f}",
+                "licenses/week",
+                help="Maximum number of licenses in a 40-hour week"
+            )
+        
+        st.divider()
+        
+        # Summary table
+        st.subheader("📋 Resource Capacity Summary Table")
+        
+        with recorder.stage("table:summary"):
+            summary_df = scenario_cache.get_or_compute(
+                ("summary_df",) + mix_key,
+                lambda: build_summary_table(results, bottleneck_resource[0])
+            )
+        with recorder.stage("render:summary"):
+            st.dataframe(summary_df, use_container_width=True, hide_index=True)
+        
+        st.caption("🔴 = Bottleneck resource (limits system capacity)")
+        
+        st.divider()
+        
+        # --------- LONG-RANGE CAPACITY PLAN (see dmv_plan.py) ---------
+        @st.fragment
+        def render_capacity_plan():
+            fragment_recorder = RunRecorder(enabled=debug_mode)
+            st.subheader("📆 Long-Range Capacity Plan")
+            demand = st.session_state.get("demand_value", 45)
+            st.caption(
+                f"Daily demand from {demand} appl/hr × 8 h on weekdays, with annual growth, a renewal wave every spring "
+                "and holiday closures (their applicants come the next open day), against the current staffing and "
+                "one extra unit of each resource"
+            )
+            
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                years = st.number_input("Years", min_value=1, max_value=10, value=5, step=1)
+            
+            with col2:
+                growth = st.number_input("Annual growth (%)", min_value=-10.0, max_value=20.0, value=3.0, step=0.5)
+            
+            with col3:
+                wave = st.slider("Spring renewal wave (%)", min_value=0, max_value=100, value=30, step=5)
+            
+            with col4:
+                # With Type 1 at 100% there is no room for Type 2, and a 0-0 slider is invalid
+                if p1 < 100:
+                    final_p2 = st.slider("Type 2 share in final year (%)", min_value=0, max_value=100 - p1, value=p2)
+                else:
+                    final_p2 = 0
+            
+            # Plans start on the next 1 January; the start is part of the key so cached plans roll over at New Year
+            start = (np.datetime64("today", "Y") + 1).astype("datetime64[D]")
+            plan_key = ("plan", str(start), demand, years, growth, wave, final_p2) + mix_key
+            
+            def compute_plan():
+                dates = forecast_dates(start, int(years * 365.25))
+                waves = [{"peak": np.datetime64(f"{year}-03-15"), "width_days": 21, "amplitude": wave / 100}
+                         for year in range(int(str(dates[0])[:4]), int(str(dates[-1])[:4]) + 1)]
+                forecast = demand_forecast(dates, demand * 8, annual_growth=growth / 100, renewal_waves=waves)
+                mix = mix_trend(len(dates), (p1_dec, p2_dec, p3_dec), (p1_dec, final_p2 / 100, 1 - p1_dec - final_p2 / 100))
+                staffing = {"Current": {}}
+                staffing.update({
+                    f"+1 {name}": {name: info["num_resources"] + 1} for name, info in resources_config.items()
+                })
+                plan = plan_capacity(resources_config, mix, forecast, staffing)
+                return plan, rollup(plan, "M")
+            
+            with fragment_recorder.stage("compute:plan"):
+                plan, rolled = scenario_cache.get_or_compute(plan_key, compute_plan)
+            
+            with fragment_recorder.stage("figure:plan"):
+                fig_plan = scenario_cache.get_or_compute(
+                    ("fig_plan",) + plan_key, lambda: build_plan_figure(rolled, plan["scenario_names"])
+                )
+            with fragment_recorder.stage("render:plan"):
+                st.plotly_chart(fig_plan, use_container_width=True)
+            
+            rows = []
+            for s, scenario_name in enumerate(plan["scenario_names"]):
+                changes = bottleneck_changes(plan, s)
+                row = {
+                    "Staffing": scenario_name,
+                    "Infeasible Days": int((~plan["feasible"][s]).sum()),
+                    "Unmet Demand": f"{plan['cumulative_unmet'][s, -1]:,.0f}",
+                    "First Bottleneck Change": (
+                        f"{changes[0][0]}: {changes[0][1]} → {changes[0][2]}" if changes else "–"
+                    ),
+                }
+                for r, resource_name in enumerate(plan["resource_names"]):
+                    saturated = plan["first_saturation_date"][s, r]
+                    row[f"{resource_name} Saturates"] = "never" if np.isnat(saturated) else str(saturated)
+                rows.append(row)
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+            st.caption(
+                f"{plan['dates'][0]} to {plan['dates'][-1]} · a resource saturates on the first day its work "
+                "exceeds its available minutes · unmet demand is summed over all days"
+            )
+            
+            record_fragment_timings("capacity plan", fragment_recorder)
+        
+        render_capacity_plan()
+        
+        st.divider()
+        
+        # --------- SAVED SCENARIOS (see dmv_store.py) ---------
+        # Kept on disk, so saved what-ifs survive "Reset to Default" and server restarts
+        @st.fragment
+        def render_saved_scenarios():
+            fragment_recorder = RunRecorder(enabled=debug_mode)
+            st.subheader("💾 Saved Scenarios")
+            scenario_store = get_scenario_store()
+            demand = st.session_state.get("demand_value", 45)
+            
+            col1, col2, col3 = st.columns([2, 2, 1])
+            
+            with col1:
+                scenario_name = st.text_input(
+                    "Scenario name", key="scenario_name", placeholder=f"Mix {p1}/{p2}/{p3} at {demand} appl/hr"
+                )
+            
+            with col2:
+                scenario_tags = st.text_input("Tags (comma-separated)", key="scenario_tags")
+            
+            with col3:
+                st.write("")
+                if st.button("💾 Save current"):
+                    with fragment_recorder.stage("store:save"):
+                        scenario_store.save(
+                            scenario_name.strip() or f"Mix {p1}/{p2}/{p3} at {demand} appl/hr",
+                            (p1_dec, p2_dec, p3_dec), demand, resources_config,
+                            tags=[tag.strip() for tag in scenario_tags.split(",") if tag.strip()]
+                        )
+                    st.toast("Scenario saved")
+            
+            selected_tags = st.multiselect("Show scenarios tagged", sorted(scenario_store.tags()), key="scenario_filter")
+            with fragment_recorder.stage("store:query"):
+                saved = scenario_store.query(tags=selected_tags, limit=500)
+            
+            if not saved:
+                st.info("No saved scenarios yet. Save the current mix and demand to compare it with later what-ifs.")
+            else:
+                baseline = st.selectbox(
+                    "Compare against",
+                    [s["id"] for s in saved],
+                    format_func=lambda scenario_id: next(s["name"] for s in saved if s["id"] == scenario_id),
+                    key="scenario_baseline"
+                )
+                with fragment_recorder.stage("store:compare"):
+                    comparison = scenario_store.compare([s["id"] for s in saved], baseline=baseline)
+                    comparison_df = build_comparison_table(comparison)
+                with fragment_recorder.stage("render:comparison"):
+                    st.dataframe(
+                        comparison_df.style.format(precision=1, na_rep="–"),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                st.caption(
+                    f"{len(saved)} scenario(s), newest first · Δ columns are changes against the selected scenario · "
+                    "🔄 = different bottleneck"
+                )
+            
+            record_fragment_timings("saved scenarios", fragment_recorder)
+        
+        render_saved_scenarios()
 
 # ============================================================================
 # TAB 2: DETAILED ANALYSIS
 # ============================================================================
 with tab2:
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("Process Times by Applicant Type (minutes)")
-        
-        process_times = []
-        for resource_name, data in results.items():
-            process_times.append({
-                "Resource": resource_name,
-                "Type 1": f"{data['t1']:.1f}",
-                "Type 2": f"{data['t2']:.1f}",
-                "Type 3": f"{data['t3']:.1f}",
-                "Aggregate": f"{data['t_agg']:.3f}"
-            })
-        
-        process_df = pd.DataFrame(process_times)
-        st.dataframe(process_df, use_container_width=True, hide_index=True)
-        
-        st.caption("Aggregate = Weighted average using product mix")
-    
-    with col2:
-        st.subheader("Capacity per Hour (licenses/hr)")
-        
-        capacity_data = []
-        for resource_name, data in results.items():
-            capacity_data.append({
-                "Resource": resource_name,
-                "Per Unit": f"{data['capacity_per_hour']:.2f}" if data['capacity_per_hour'] != float('inf') else "∞",
-                "Pool Total": f"{data['pool_capacity']:.2f}" if data['pool_capacity'] != float('inf') else "∞"
-            })
-        
-        capacity_df = pd.DataFrame(capacity_data)
-        st.dataframe(capacity_df, use_container_width=True, hide_index=True)
-    
-    st.divider()
-    
-    # Detailed resource breakdowns
-    st.subheader("🔍 Detailed Resource Analysis")
-    
-    for i, (resource_name, data) in enumerate(results.items()):
-        with st.expander(f"📌 {resource_name} - {data['description']}", expanded=i==0):
-            col1, col2, col3 = st.columns(3)
+    if tab_is_open(tab2):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("Process Times by Applicant Type (minutes)")
             
-            with col1:
-                st.write("**Process Times by Type:**")
-                st.code(f"""
+            with recorder.stage("table:process"):
+                process_df = scenario_cache.get_or_compute(("process_df",) + mix_key, lambda: build_process_table(results))
+            with recorder.stage("render:process"):
+                st.dataframe(process_df, use_container_width=True, hide_index=True)
+            
+            st.caption("Aggregate = Weighted average using product mix")
+        
+        with col2:
+            st.subheader("Capacity per Hour (licenses/hr)")
+            
+            with recorder.stage("table:capacity"):
+                capacity_df = scenario_cache.get_or_compute(("capacity_df",) + mix_key, lambda: build_capacity_table(results))
+            with recorder.stage("render:capacity_table"):
+                st.dataframe(capacity_df, use_container_width=True, hide_index=True)
+        
+        st.divider()
+        
+        # Detailed resource breakdowns
+        st.subheader("🔍 Detailed Resource Analysis")
+        
+        for i, (resource_name, data) in enumerate(results.items()):
+            with st.expander(f"📌 {resource_name} - {data['description']}", expanded=i==0):
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.write("**Process Times by Type:**")
+                    st.code(f"""
 Type 1: {data['t1']:.1f} min
 Type 2: {data['t2']:.1f} min
 Type 3: {data['t3']:.1f} min
                 """, language="text")
-            
-            with col2:
-                st.write("**Aggregate Calculation:**")
-                calc_text = f"T_agg = {p1:.1%}×{data['t1']} + {p2:.1%}×{data['t2']} + {p3:.1%}×{data['t3']}"
-                st.code(f"""{calc_text}
+                
+                with col2:
+                    st.write("**Aggregate Calculation:**")
+                    calc_text = f"T_agg = {p1:.1%}×{data['t1']} + {p2:.1%}×{data['t2']} + {p3:.1%}×{data['t3']}"
+                    st.code(f"""{calc_text}
        = {data['t_agg']:.3f} min
                 """, language="text")
-            
-            with col3:
-                st.write("**Effective Capacity:**")
-                if data['capacity_per_hour'] != float('inf'):
-                    st.code(f"""
+                
+                with col3:
+                    st.write("**Effective Capacity:**")
+                    if data['capacity_per_hour'] != float('inf'):
+                        st.code(f"""
 Per unit: {data['capacity_per_hour']:.2f} lic/hr
 Pool ({data['num_resources']} units):
   {data['pool_capacity']:.2f} lic/hr
                     """, language="text")
+                    else:
+                        st.code(f"Infinite (no processing)", language="text")
+                
+                # Utilization at 45 applicants/hour
+                st.divider()
+                st.write("**Utilization at 45 applicants/hour:**")
+                if data['pool_capacity'] != float('inf') and data['pool_capacity'] > 0:
+                    util = (45 / data['pool_capacity']) * 100
+                    if util <= 100:
+                        st.success(f"{util:.1f}% utilized")
+                    else:
+                        st.error(f"{util:.1f}% utilized (OVERLOADED)")
                 else:
-                    st.code(f"Infinite (no processing)", language="text")
-            
-            # Utilization at 45 applicants/hour
-            st.divider()
-            st.write("**Utilization at 45 applicants/hour:**")
-            if data['pool_capacity'] != float('inf') and data['pool_capacity'] > 0:
-                util = (45 / data['pool_capacity']) * 100
-                if util <= 100:
-                    st.success(f"{util:.1f}% utilized")
-                else:
-                    st.error(f"{util:.1f}% utilized (OVERLOADED)")
-            else:
-                st.info("Not involved in processing")
+                    st.info("Not involved in processing")
 
 # ============================================================================
 # TAB 3: VISUALIZATIONS
 # ============================================================================
 with tab3:
-    col1, col2 = st.columns(2)
-    
-    # --------- CAPACITY CHART ---------
-    with col1:
-        capacity_list = [results[r]['pool_capacity'] for r in results.keys() 
-                        if results[r]['pool_capacity'] != float('inf')]
-        resource_names = [r for r in results.keys() 
-                         if results[r]['pool_capacity'] != float('inf')]
-        
-        # Color code: green for non-bottleneck, red for bottleneck
-        colors = ['#e74c3c' if r == bottleneck_resource[0] else '#2ecc71' 
-                 for r in resource_names]
-        
-        fig_capacity = go.Figure(data=[
-            go.Bar(
-                x=resource_names,
-                y=capacity_list,
-                marker=dict(
-                    color=colors,
-                    line=dict(color='black', width=2)
-                ),
-                text=[f"{c:.1f}" for c in capacity_list],
-                textposition='outside',
-                hovertemplate='<b>%{x}</b><br>Capacity: %{y:.2f} licenses/hr<extra></extra>'
-            )
-        ])
-        
-        system_cap = min(capacity_list)
-        fig_capacity.add_hline(
-            y=system_cap,
-            line_dash="dash",
-            line_color="red",
-            line_width=2,
-            annotation_text=f"System Capacity: {system_cap:.2f}/hr",
-            annotation_position="right",
-            annotation_font_size=12
-        )
+    if tab_is_open(tab3):
+        col1, col2 = st.columns(2)
         
-        fig_capacity.update_layout(
-            title="Resource Pool Capacity (licenses/hour)",
-            xaxis_title="Resource",
-            yaxis_title="Capacity (licenses/hour)",
-            height=500,
-            hovermode='x',
-            template='plotly_white',
-            showlegend=False
-        )
+        # --------- CAPACITY CHART ---------
+        with col1:
+            with recorder.stage("figure:capacity"):
+                fig_capacity = scenario_cache.get_or_compute(
+                    ("fig_capacity",) + mix_key,
+                    lambda: build_capacity_figure(results, bottleneck_resource[0])
+                )
+            
+            with recorder.stage("render:capacity"):
+                st.plotly_chart(fig_capacity, use_container_width=True)
         
-        st.plotly_chart(fig_capacity, use_container_width=True)
-    
-    # --------- PRODUCT MIX PIE CHART ---------
-    with col2:
-        fig_mix = go.Figure(data=[go.Pie(
-            labels=['Type 1<br>(Proper docs, pass exam)',
-                    'Type 2<br>(Fail exam)',
-                    'Type 3<br>(No proper docs)'],
-            values=[p1, p2, p3],
-            marker=dict(colors=['#2ecc71', '#f39c12', '#e74c3c']),
-            textinfo='label+percent+value',
-            hovertemplate='<b>%{label}</b><br>%{percent}<br>(%{value}%)<extra></extra>'
-        )])
-        
-        fig_mix.update_layout(
-            title="Product Mix Distribution",
-            height=500,
-            template='plotly_white'
-        )
+        # --------- PRODUCT MIX PIE CHART ---------
+        with col2:
+            with recorder.stage("figure:mix"):
+                fig_mix = scenario_cache.get_or_compute(("fig_mix", p1, p2, p3), lambda: build_mix_figure(p1, p2, p3))
+            
+            with recorder.stage("render:mix"):
+                st.plotly_chart(fig_mix, use_container_width=True)
         
-        st.plotly_chart(fig_mix, use_container_width=True)
-    
-    st.divider()
-    
-    # --------- UTILIZATION ANALYSIS ---------
-    st.subheader("⏱️ Utilization Analysis")
-    
-    col1, col2 = st.columns([1, 3])
-    
-    with col1:
-        demand = st.number_input(
-            "Applicants per hour",
-            value=45,
-            min_value=0,
-            max_value=200,
-            step=5,
-            help="Expected arrival rate of applicants at the DMV"
-        )
-    
-    if demand > 0 and system_capacity > 0:
-        utilization_data = []
-        for resource_name, data in results.items():
-            if data['pool_capacity'] != float('inf') and data['pool_capacity'] > 0:
-                util = (demand / data['pool_capacity']) * 100
-                utilization_data.append({
-                    "Resource": resource_name,
-                    "Pool Capacity": data['pool_capacity'],
-                    "Demand": demand,
-                    "Utilization %": util
-                })
+        st.divider()
         
-        util_df = pd.DataFrame(utilization_data)
+        # --------- BOTTLENECK REGIONS ---------
+        st.subheader("🗺️ Bottleneck Regions")
         
-        with col2:
-            fig_util = go.Figure(data=[
-                go.Bar(
-                    x=util_df["Resource"],
-                    y=util_df["Utilization %"],
-                    marker=dict(
-                        color=util_df["Utilization %"],
-                        colorscale=['#2ecc71', '#f39c12', '#e74c3c'],
-                        cmin=0,
-                        cmax=150,
-                        showscale=True,
-                        colorbar=dict(title="Utilization %"),
-                        line=dict(color='black', width=1.5)
-                    ),
-                    text=[f"{u:.1f}%" for u in util_df["Utilization %"]],
-                    textposition='outside',
-                    hovertemplate='<b>%{x}</b><br>Utilization: %{y:.1f}%<extra></extra>'
-                )
-            ])
-            
-            fig_util.add_hline(
-                y=100,
-                line_dash="dash",
-                line_color="red",
-                line_width=2,
-                annotation_text="Full Capacity (100%)",
-                annotation_position="right"
+        def compute_bottleneck_map():
+            bottleneck_map = BottleneckMap.from_config(resources_config)
+            return bottleneck_map, bottleneck_map.regions(), bottleneck_map.capacity_grid()
+        
+        with recorder.stage("compute:bottleneck_map"):
+            # The regions depend only on the config, so they are computed once and shared by every mix
+            bottleneck_map, regions, (grid_values, capacity_grid, _) = scenario_cache.get_or_compute(
+                ("bottleneck_map", mix_key[0]), compute_bottleneck_map
             )
-            
-            fig_util.update_layout(
-                title=f"Resource Utilization at {demand} applicants/hour",
-                xaxis_title="Resource",
-                yaxis_title="Utilization (%)",
-                height=500,
-                hovermode='x',
-                template='plotly_white'
+            # Exact points where the bottleneck changes as the Type 2 share rises with Type 1 fixed
+            sweep = bottleneck_map.breakpoints((p1_dec, 0, 1 - p1_dec), (p1_dec, 1 - p1_dec, 0))
+        
+        with recorder.stage("figure:bottleneck_map"):
+            fig_map = scenario_cache.get_or_compute(
+                ("fig_bottleneck_map",) + mix_key,
+                lambda: build_bottleneck_map_figure(grid_values, capacity_grid, regions, p1, p2)
             )
-            
-            st.plotly_chart(fig_util, use_container_width=True)
         
-        # Feasibility check
-        st.subheader("✅ Feasibility Assessment")
+        with recorder.stage("render:bottleneck_map"):
+            st.plotly_chart(fig_map, use_container_width=True)
         
-        col1, col2, col3 = st.columns(3)
+        st.caption(
+            f"With Type 1 at {p1}%, as the Type 2 share rises from 0% to {100 - p1}%: " +
+            " → ".join(
+                f"{segment['resource']} ({segment['mix_from'][1]:.1%}–{segment['mix_to'][1]:.1%})"
+                for segment in sweep
+            )
+        )
         
-        with col1:
-            st.metric("System Capacity", f"{system_capacity:.2f} appl/hr")
+        st.divider()
         
-        with col2:
-            st.metric("Demand", f"{demand} appl/hr")
+        # --------- MULTI-DAY RETURN VISITS ---------
+        # Rendered inside the utilization fragment (below), so a demand change reruns it too
+        @st.fragment
+        def render_multiday():
+            fragment_recorder = RunRecorder(enabled=debug_mode)
+            st.subheader("📅 Multi-Day Load with Return Visits")
+            st.caption(
+                "Type 2 applicants come back on a later day for the passing eye exam and photo, "
+                "adding to that day's load instead of the day they failed"
+            )
+            
+            demand = st.session_state.get("demand_value", 45)
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                delay = st.number_input("Return after (days)", min_value=1, max_value=10, value=3, step=1)
+            
+            with col2:
+                shock = st.slider("Demand change (%)", min_value=-50, max_value=100, value=20, step=5)
+            
+            with col3:
+                shock_day = st.number_input("Change from day", min_value=1, max_value=119, value=30, step=1) - 1
+            
+            n_days = 120
+            multiday_key = ("multiday", demand, delay, shock, shock_day) + mix_key
+            
+            def compute_multiday():
+                schedule = demand_schedule(demand, n_days, shock / 100, shock_day)
+                mix = (p1_dec, p2_dec, p3_dec)
+                analytic = analytic_multiday(resources_config, mix, schedule, return_delay={delay: 1.0})
+                simulated = simulate_multiday(resources_config, mix, schedule, return_delay={delay: 1.0}, n_runs=200, seed=0)
+                return analytic, simulated
+            
+            with fragment_recorder.stage("compute:multiday"):
+                analytic, simulated = scenario_cache.get_or_compute(multiday_key, compute_multiday)
+            
+            # Highlight the busiest resource that receives returning applicants
+            _, return_work, _, _ = split_routes(resources_config)
+            receiving = np.flatnonzero(return_work.any(axis=0))
+            final_load = steady_state_load(resources_config, (p1_dec, p2_dec, p3_dec), demand * (1 + shock / 100))
+            highlight = receiving[np.argmax(analytic["utilization"][-1, receiving])] if len(receiving) else 0
+            
+            with fragment_recorder.stage("figure:multiday"):
+                fig_days = scenario_cache.get_or_compute(
+                    ("fig_multiday",) + multiday_key,
+                    lambda: build_multiday_figure(analytic, simulated, highlight, shock_day)
+                )
+            with fragment_recorder.stage("render:multiday"):
+                st.plotly_chart(fig_days, use_container_width=True)
+            
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric("Returns per Day (after change)", f"{analytic['returns'][-1]:.1f} applicants")
+            
+            with col2:
+                settled = settling_day(analytic["load"][:, highlight], final_load[highlight], start=shock_day)
+                st.metric(
+                    f"Days for {analytic['resource_names'][highlight]} to Settle",
+                    f"{settled - shock_day}" if settled is not None else "not within horizon",
+                    help="Days after the demand change until the expected daily load stays within 1% of its new steady state"
+                )
+            
+            with col3:
+                st.metric(
+                    "Days with Carried-Over Work (simulated)",
+                    f"{(simulated['backlog'].max(axis=2) > 0).mean() * 100:.1f}%",
+                    help="Share of simulated days on which some resource could not finish the day's work"
+                )
+            
+            record_fragment_timings("multi-day", fragment_recorder)
         
-        with col3:
-            if demand <= system_capacity:
-                spare_capacity = system_capacity - demand
-                spare_percent = (spare_capacity / system_capacity) * 100
-                st.success(
-                    f"✅ **Feasible**\n\n"
-                    f"Spare: {spare_capacity:.2f} appl/hr\n"
-                    f"({spare_percent:.1f}% buffer)"
+        # --------- UTILIZATION ANALYSIS ---------
+        # Runs as a fragment: changing demand reruns only this section, not the whole page
+        @st.fragment
+        def render_utilization_analysis():
+            # Fragment reruns skip the rest of the page, so they are timed on their own
+            fragment_recorder = RunRecorder(enabled=debug_mode)
+            st.subheader("⏱️ Utilization Analysis")
+            
+            col1, col2 = st.columns([1, 3])
+            
+            with col1:
+                # Widget state is dropped while this tab is closed, so the value is kept separately
+                demand = st.number_input(
+                    "Applicants per hour",
+                    value=st.session_state.get("demand_value", 45),
+                    min_value=0,
+                    max_value=200,
+                    step=5,
+                    help="Expected arrival rate of applicants at the DMV",
+                    key="demand"
                 )
-            else:
-                shortage = demand - system_capacity
-                shortage_percent = (shortage / demand) * 100
-                st.error(
-                    f"❌ **Infeasible**\n\n"
-                    f"Shortage: {shortage:.2f} appl/hr\n"
-                    f"({shortage_percent:.1f}% over capacity)"
+                st.session_state["demand_value"] = demand
+            
+            if demand > 0 and system_capacity > 0:
+                # Only this section depends on demand
+                util_key = (demand,) + mix_key
+                with fragment_recorder.stage("table:utilization"):
+                    util_df = scenario_cache.get_or_compute(
+                        ("util_df",) + util_key,
+                        lambda: pd.DataFrame(calculate_utilization(results, demand))
+                    )
+                
+                with col2:
+                    with fragment_recorder.stage("figure:utilization"):
+                        fig_util = scenario_cache.get_or_compute(
+                            ("fig_util",) + util_key,
+                            lambda: build_utilization_figure(util_df, demand)
+                        )
+                    
+                    with fragment_recorder.stage("render:utilization"):
+                        st.plotly_chart(fig_util, use_container_width=True)
+                
+                # Feasibility check
+                st.subheader("✅ Feasibility Assessment")
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric("System Capacity", f"{system_capacity:.2f} appl/hr")
+                
+                with col2:
+                    st.metric("Demand", f"{demand} appl/hr")
+                
+                with col3:
+                    if demand <= system_capacity:
+                        spare_capacity = system_capacity - demand
+                        spare_percent = (spare_capacity / system_capacity) * 100
+                        st.success(
+                            f"✅ **Feasible**\n\n"
+                            f"Spare: {spare_capacity:.2f} appl/hr\n"
+                            f"({spare_percent:.1f}% buffer)"
+                        )
+                    else:
+                        shortage = demand - system_capacity
+                        shortage_percent = (shortage / demand) * 100
+                        st.error(
+                            f"❌ **Infeasible**\n\n"
+                            f"Shortage: {shortage:.2f} appl/hr\n"
+                            f"({shortage_percent:.1f}% over capacity)"
+                        )
+                
+                st.divider()
+                
+                # Detailed utilization table
+                st.dataframe(
+                    util_df.style.format({
+                        'Pool Capacity': '{:.2f}',
+                        'Demand': '{:.0f}',
+                        'Utilization %': '{:.1f}'
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+                
+                # --------- EXPECTED WAIT VS DEMAND ---------
+                def compute_wait_curves():
+                    visits, cs2 = pool_visit_profile((p1_dec, p2_dec, p3_dec), resources_config)
+                    demands = np.arange(0, 201)
+                    curves = queue_curves(
+                        demands,
+                        [data['t_agg'] for data in results.values()],
+                        [data['num_resources'] for data in results.values()],
+                        visits,
+                        cs2
+                    )
+                    return demands, curves
+                
+                with fragment_recorder.stage("compute:wait_curves"):
+                    demands, wait_curves = scenario_cache.get_or_compute(("wait_curves",) + mix_key, compute_wait_curves)
+                with fragment_recorder.stage("figure:wait"):
+                    fig_wait = scenario_cache.get_or_compute(
+                        ("fig_wait",) + util_key,
+                        lambda: build_wait_curve_figure(demands, wait_curves["wait"], list(results.keys()), demand)
+                    )
+                with fragment_recorder.stage("render:wait"):
+                    st.plotly_chart(fig_wait, use_container_width=True)
+                st.caption(
+                    f"Expected wait at {demand} appl/hr: " +
+                    " · ".join(
+                        f"{name}: {w:.1f} min" if w != float('inf') else f"{name}: unbounded"
+                        for name, w in zip(results.keys(), wait_curves["wait"][min(demand, 200)])
+                    )
                 )
+                
+                st.divider()
+                
+                # --------- SIMULATED WAITING TIMES ---------
+                st.subheader("🎲 Simulated Waiting Times (95% confidence intervals)")
+                st.caption("Independent stochastic replications of an 8-hour day, run in background worker processes")
+                
+                col1, col2 = st.columns([1, 3])
+                
+                with col1:
+                    n_replications = st.selectbox("Replications", [50, 100, 200, 500], index=2)
+                    sim_key = (p1, p2, p3, demand, n_replications)
+                    if st.button("▶️ Run simulation"):
+                        processes, waiter = get_simulation_pools()
+                        st.session_state["replication_job"] = (sim_key, waiter.submit(
+                            run_replications, resources_config, (p1_dec, p2_dec, p3_dec), demand,
+                            n_replications=n_replications, seed=0, executor=processes
+                        ))
+                
+                def render_replication_results():
+                    job = st.session_state.get("replication_job")
+                    if job is None:
+                        st.info("Press **Run simulation** to estimate waiting times at this demand and product mix.")
+                        return
+                    job_key, future = job
+                    if not future.done():
+                        st.info("⏳ Simulation running...")
+                        return
+                    if polling:
+                        # Polling is fixed when the fragment is created; a full rerun recreates it without
+                        stop_profiler()
+                        st.rerun(scope="app")
+                    try:
+                        replications = future.result()
+                    except Exception as exc:
+                        st.error(f"❌ Simulation failed: {exc}")
+                        return
+                    if job_key != sim_key:
+                        st.warning("Results below are for a previous product mix, demand or replication count.")
+                    rows = []
+                    for resource_name in results.keys():
+                        ci = replications["summary"].get(f"{resource_name}/mean_wait")
+                        queue_ci = replications["summary"].get(f"{resource_name}/mean_queue")
+                        if ci is None:
+                            continue
+                        rows.append({
+                            "Resource": resource_name,
+                            "Mean Wait (min)": ci["mean"],
+                            "Wait 95% CI": f"{ci['ci_low']:.2f} – {ci['ci_high']:.2f}",
+                            "Mean Queue": queue_ci["mean"],
+                            "Queue 95% CI": f"{queue_ci['ci_low']:.2f} – {queue_ci['ci_high']:.2f}",
+                        })
+                    throughput = replications["summary"]["throughput_per_hour"]
+                    st.metric(
+                        "Simulated Throughput",
+                        f"{throughput['mean']:.2f} appl/hr",
+                        f"± {throughput['half_width']:.2f} ({replications['replications']} replications)",
+                        delta_color="off"
+                    )
+                    st.dataframe(
+                        pd.DataFrame(rows).style.format({'Mean Wait (min)': '{:.2f}', 'Mean Queue': '{:.2f}'}),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                
+                # Poll once a second only while a job is still running
+                job = st.session_state.get("replication_job")
+                polling = job is not None and not job[1].done()
+                with col2:
+                    st.fragment(render_replication_results, run_every=1.0 if polling else None)()
+            
+            record_fragment_timings("utilization", fragment_recorder)
+            
+            # Nested: the multi-day inputs rerun only that section, a demand change reruns both
+            st.divider()
+            render_multiday()
         
+        render_utilization_analysis()
+
         st.divider()
         
-        # Detailed utilization table
-        st.dataframe(
-            util_df.style.format({
-                'Pool Capacity': '{:.2f}',
-                'Demand': '{:.0f}',
-                'Utilization %': '{:.1f}'
-            }),
-            use_container_width=True,
-            hide_index=True
-        )
+        # --------- TIME-OF-DAY DEMAND PROFILE ---------
+        # Runs as a fragment: editing the profile reruns only this section
+        @st.fragment
+        def render_demand_profile():
+            fragment_recorder = RunRecorder(enabled=debug_mode)
+            st.subheader("🕐 Time-of-Day Demand Profile")
+            st.caption("Arrivals above system capacity in an hour carry over as a queue into the next hour")
+            
+            col1, col2 = st.columns([1, 3])
+            
+            # The profile lives in the session so an edit only recomputes the hours after it
+            profile = st.session_state.get("demand_profile")
+            if profile is None:
+                profile = DemandProfile(DEFAULT_HOURLY_PROFILE, system_capacity)
+                st.session_state["demand_profile"] = profile
+            
+            with col1:
+                profile_input = st.data_editor(
+                    pd.DataFrame({
+                        "Start": profile.interval_starts(),
+                        "Applicants/hr": profile.arrival_rates.copy(),
+                    }),
+                    disabled=["Start"],
+                    hide_index=True,
+                    use_container_width=True,
+                    key="profile_editor"
+                )
+            
+            with fragment_recorder.stage("compute:profile"):
+                profile.set_rates(profile_input["Applicants/hr"].fillna(0).to_numpy(dtype=float))
+                for i in range(len(profile)):
+                    profile.set_capacity(i, system_capacity)
+                profile_result = profile.evaluate()
+            
+            with col2:
+                with fragment_recorder.stage("figure:profile"):
+                    fig_profile = build_profile_figure(profile_result)
+                with fragment_recorder.stage("render:profile"):
+                    st.plotly_chart(fig_profile, use_container_width=True)
+            
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric("End-of-Day Queue", f"{profile_result['end_of_day_queue']:.0f} applicants")
+            
+            with col2:
+                st.metric("Peak Carried-Over Queue", f"{profile_result['backlog'].max():.0f} applicants")
+            
+            with col3:
+                st.metric("Hours Over Capacity", f"{int((profile_result['load'] > 1).sum())} of {len(profile)}")
+            
+            record_fragment_timings("demand profile", fragment_recorder)
+        
+        render_demand_profile()
 
 # ============================================================================
 # TAB 4: ABOUT & METHODOLOGY
 # ============================================================================
 with tab4:
-    st.markdown("""
-    ## 📚 About This Tool
-    
-    This tool implements the **Product Aggregation Method** for capacity analysis based on:
-    - *Operations Engineering and Management: Concepts, Analytics, and Principles for Improvement*
-    - Authors: Seyed M. R. Iravani
-    
-    ### 🎯 Problem Statement
-    
-    The Willowglen County DMV office renews driving licenses with the following process:
-    
-    1. **Review Clerks (2)** - Review documents, check violations (2.5 min per applicant)
-    2. **Cashiers (2)** - Process payment (1 min per applicant with proper docs)
-    3. **Eye Exam Clerks (2)** - Vision screening test (2 min per applicant)
-    4. **Photo/Printing Machines (4)** - Take photo and print license (3 min per applicant)
-    
-    **Applicant Types:**
-    - **Type 1 (76.5%)**: Proper documentation + Pass eye exam
-    - **Type 2 (8.5%)**: Proper documentation + Fail eye exam (must return after getting eye report)
-    - **Type 3 (15%)**: No proper documentation (leave at review stage)
-    
-    ### 📐 Methodology: Product Aggregation Method
-    
-    **Step 1: Calculate Aggregate Effective Time**
-    
-    For each resource, calculate the weighted average process time across all product types:
-    
-    $$T_{eff}^{agg} = \\sum_{k=1}^{K} p_k \\times T_k$$
-    
-    Where:
-    - $p_k$ = proportion of type k applicants in the product mix
-    - $T_k$ = process time for type k at this resource
-    - $K$ = number of product types
-    
-    **Step 2: Calculate Capacity per Resource**
-    
-    $$C_{eff} = \\frac{60 \\text{ min/hour}}{T_{eff}^{agg}}$$
-    
-    **Step 3: Calculate Pool Capacity**
-    
-    For resource pools with multiple units:
-    
-    $$C_{pool} = C_{eff} \\times \\text{(number of units)}$$
-    
-    **Step 4: Identify Bottleneck**
-    
-    The bottleneck is the resource with the lowest pool capacity.
-    
-    **Step 5: System Capacity**
-    
-    $$C_{system} = \\min(C_{pool}) = C_{bottleneck}$$
-    
-    ### 💡 Key Insights
-    
-    1. **Product Mix Impact**: The aggregate process time is sensitive to the product mix
-       - More Type 1 applicants → Lower aggregate times → Higher capacity
-       - More Type 2 applicants → Higher aggregate times → Lower capacity
-       - More Type 3 applicants → Lower aggregate times → Higher capacity (fewer resources needed)
-    
-    2. **Type 2 Effect**: Type 2 applicants require the eye exam resource twice
-       - On first visit: 2 minutes (fails)
-       - On return visit: 2 minutes (passes) + 3 minutes (photo/printing)
-       - Total contribution to eye exam: 4 minutes per Type 2 applicant
-    
-    3. **Bottleneck Identification**: Focus improvement efforts on the bottleneck resource
-       - In the default scenario, the Eye Exam Clerks or Photo/Printing Machines may be the bottleneck
-       - Increasing capacity of non-bottleneck resources won't improve system performance
-    
-    4. **Utilization Analysis**: Compare demand to capacity
-       - Utilization = (Demand / Capacity) × 100%
-       - Ideally, utilization should be 70-85% to allow for variability
-       - Over 100% means the system is overloaded
-    
-    ### 🔧 Practical Applications
-    
-    **Scenario 1: Current Demand is 45 applicants/hour**
-    - Check utilization of each resource
-    - Identify bottleneck resource
-    - Plan capacity improvements
-    
-    **Scenario 2: Demand Forecasted to Increase**
-    - Adjust demand slider
-    - Identify when system will become infeasible
-    - Decide whether to add resources or change product mix assumptions
-    
-    **Scenario 3: Change Product Mix**
-    - Adjust sliders for different applicant type distributions
-    - See how system capacity changes
-    - Understand impact of service quality improvements
-    
-    ### 📊 Example Calculations
-    
-    **For Eye Exam Clerks with default mix (76.5%, 8.5%, 15%):**
-    
-    - Type 1 process time: 2.0 minutes
-    - Type 2 process time: 4.0 minutes (fails once, returns)
-    - Type 3 process time: 0.0 minutes (not applicable)
-    - Aggregate: (0.765 × 2.0) + (0.085 × 4.0) + (0.15 × 0.0) = **1.87 minutes**
-    - Capacity per clerk: 60 / 1.87 = **32.1 licenses/hour**
-    - Pool capacity (2 clerks): 32.1 × 2 = **64.2 licenses/hour**
-    
-    ### 📝 References
-    
-    - Iravani, S.M.R. (2024). Operations Engineering and Management. McGraw-Hill.
-    - Chapter 4: Process Capacity Analysis
-    - Product Aggregation Method for Multi-Product Systems
-    """)
+    if tab_is_open(tab4):
+        st.markdown("""
+        ## 📚 About This Tool
+        
+        This tool implements the **Product Aggregation Method** for capacity analysis based on:
+        - *Operations Engineering and Management: Concepts, Analytics, and Principles for Improvement*
+        - Authors: Seyed M. R. Iravani
+        
+        ### 🎯 Problem Statement
+        
+        The Willowglen County DMV office renews driving licenses with the following process:
+        
+        1. **Review Clerks (2)** - Review documents, check violations (2.5 min per applicant)
+        2. **Cashiers (2)** - Process payment (1 min per applicant with proper docs)
+        3. **Eye Exam Clerks (2)** - Vision screening test (2 min per applicant)
+        4. **Photo/Printing Machines (4)** - Take photo and print license (3 min per applicant)
+        
+        **Applicant Types:**
+        - **Type 1 (76.5%)**: Proper documentation + Pass eye exam
+        - **Type 2 (8.5%)**: Proper documentation + Fail eye exam (must return after getting eye report)
+        - **Type 3 (15%)**: No proper documentation (leave at review stage)
+        
+        ### 📐 Methodology: Product Aggregation Method
+        
+        **Step 1: Calculate Aggregate Effective Time**
+        
+        For each resource, calculate the weighted average process time across all product types:
+        
+        $$T_{eff}^{agg} = \\sum_{k=1}^{K} p_k \\times T_k$$
+        
+        Where:
+        - $p_k$ = proportion of type k applicants in the product mix
+        - $T_k$ = process time for type k at this resource
+        - $K$ = number of product types
+        
+        **Step 2: Calculate Capacity per Resource**
+        
+        $$C_{eff} = \\frac{60 \\text{ min/hour}}{T_{eff}^{agg}}$$
+        
+        **Step 3: Calculate Pool Capacity**
+        
+        For resource pools with multiple units:
+        
+        $$C_{pool} = C_{eff} \\times \\text{(number of units)}$$
+        
+        **Step 4: Identify Bottleneck**
+        
+        The bottleneck is the resource with the lowest pool capacity.
+        
+        **Step 5: System Capacity**
+        
+        $$C_{system} = \\min(C_{pool}) = C_{bottleneck}$$
+        
+        ### 💡 Key Insights
+        
+        1. **Product Mix Impact**: The aggregate process time is sensitive to the product mix
+           - More Type 1 applicants → Lower aggregate times → Higher capacity
+           - More Type 2 applicants → Higher aggregate times → Lower capacity
+           - More Type 3 applicants → Lower aggregate times → Higher capacity (fewer resources needed)
+        
+        2. **Type 2 Effect**: Type 2 applicants require the eye exam resource twice
+           - On first visit: 2 minutes (fails)
+           - On return visit: 2 minutes (passes) + 3 minutes (photo/printing)
+           - Total contribution to eye exam: 4 minutes per Type 2 applicant
+        
+        3. **Bottleneck Identification**: Focus improvement efforts on the bottleneck resource
+           - In the default scenario, the Eye Exam Clerks or Photo/Printing Machines may be the bottleneck
+           - Increasing capacity of non-bottleneck resources won't improve system performance
+        
+        4. **Utilization Analysis**: Compare demand to capacity
+           - Utilization = (Demand / Capacity) × 100%
+           - Ideally, utilization should be 70-85% to allow for variability
+           - Over 100% means the system is overloaded
+        
+        ### 🔧 Practical Applications
+        
+        **Scenario 1: Current Demand is 45 applicants/hour**
+        - Check utilization of each resource
+        - Identify bottleneck resource
+        - Plan capacity improvements
+        
+        **Scenario 2: Demand Forecasted to Increase**
+        - Adjust demand slider
+        - Identify when system will become infeasible
+        - Decide whether to add resources or change product mix assumptions
+        
+        **Scenario 3: Change Product Mix**
+        - Adjust sliders for different applicant type distributions
+        - See how system capacity changes
+        - Understand impact of service quality improvements
+        
+        ### 📊 Example Calculations
+        
+        **For Eye Exam Clerks with default mix (76.5%, 8.5%, 15%):**
+        
+        - Type 1 process time: 2.0 minutes
+        - Type 2 process time: 4.0 minutes (fails once, returns)
+        - Type 3 process time: 0.0 minutes (not applicable)
+        - Aggregate: (0.765 × 2.0) + (0.085 × 4.0) + (0.15 × 0.0) = **1.87 minutes**
+        - Capacity per clerk: 60 / 1.87 = **32.1 licenses/hour**
+        - Pool capacity (2 clerks): 32.1 × 2 = **64.2 licenses/hour**
+        
+        ### 📝 References
+        
+        - Iravani, S.M.R. (2024). Operations Engineering and Management. McGraw-Hill.
+        - Chapter 4: Process Capacity Analysis
+        - Product Aggregation Method for Multi-Product Systems
+        """)
 
 # ============================================================================
 # FOOTER
@@ -603,3 +1047,37 @@ st.markdown("""
     <p>Built with Streamlit 📊 and Plotly 📈</p>
 </div>
 """, unsafe_allow_html=True)
+
+# ============================================================================
+# DEBUG PANEL (DMV_DEBUG=1 or ?debug=1 only)
+# ============================================================================
+if debug_mode:
+    profile_output = stop_profiler()
+    recorder.log(scope="page", mix=[p1, p2, p3], cache=scenario_cache.stats())
+    
+    with st.sidebar:
+        with st.expander("🛠️ Performance (debug)", expanded=profile_output is not None):
+            st.caption(f"Rerun {recorder.run_id}: {recorder.elapsed() * 1000:.1f} ms in total")
+            st.dataframe(
+                pd.DataFrame(recorder.as_rows(), columns=["Stage", "ms"]).style.format({"ms": "{:.2f}"}),
+                use_container_width=True,
+                hide_index=True
+            )
+            for scope, rows in st.session_state.get("fragment_timings", {}).items():
+                st.caption(f"Last {scope} section run")
+                st.dataframe(
+                    pd.DataFrame(rows, columns=["Stage", "ms"]).style.format({"ms": "{:.2f}"}),
+                    use_container_width=True,
+                    hide_index=True
+                )
+            
+            cache_stats = scenario_cache.stats()
+            st.caption(
+                f"Scenario cache: {cache_stats['size']}/{cache_stats['maxsize']} entries, "
+                f"{cache_stats['hits']} hits, {cache_stats['misses']} misses"
+            )
+            
+            st.selectbox("Profiler", sorted(PROFILERS), key="profiler_name")
+            st.button("🔬 Profile one rerun", on_click=lambda: st.session_state.update(profile_next_run=True))
+            if profile_output:
+                st.code(profile_output, language="text")
@@ -0,0 +1,266 @@
+"""Bulk capacity analysis of many office configurations from CSV or Excel.
+
+Each input row is one office scenario. Required columns are "office" and the
+mix "p1", "p2", "p3" (proportions, or percentages summing to 100). Optional
+columns are "scenario", "demand" (applicants/hr) and per-resource overrides
+named "<Resource> [Type 1]" ... "<Resource> [Type 3]" for process times and
+"<Resource> [units]" for unit counts, e.g. "Eye Exam Clerks [units]". Anything
+not given falls back to the base configuration (DEFAULT_RESOURCES_CONFIG).
+
+Rows are streamed (csv.reader, or openpyxl in read-only mode for .xlsx) and
+turned into NumPy arrays chunk by chunk, so a 100k-row file is never held as
+Python dicts. Each chunk is evaluated with one calculate_capacity_batch call.
+
+Usage:
+    python dmv_batch.py offices.xlsx --out ranked.csv
+    python dmv_batch.py offices.csv --rank-by utilization --top 20
+"""
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from dmv_core import APPLICANT_TYPES, DEFAULT_RESOURCES_CONFIG, calculate_capacity_batch, config_to_matrix
+
+UNITS_FIELD = "units"
+
+# How far a row's shares may be from summing to 1 (rounded percentages)
+MIX_TOLERANCE = 0.01
+
+# Invalid rows reported individually before only counting them
+MAX_REPORTED_ERRORS = 20
+
+RANKED_FIELDS = [
+    "rank", "office", "scenario", "p1", "p2", "p3", "demand",
+    "system_capacity", "bottleneck", "utilization_pct", "feasible",
+]
+
+
+def iter_rows(path, sheet=None):
+    """Yield every row (header first) as a list of raw cell values, streaming from CSV or Excel"""
+    if Path(path).suffix.lower() in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.active
+            for row in worksheet.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.reader(f)
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return np.nan
+    return float(value)
+
+
+def parse_header(header, resources_config):
+    """Map column names to positions and resource overrides; raise ValueError on unknown columns"""
+    columns = {str(name).strip(): i for i, name in enumerate(header) if name is not None}
+    for required in ("office", "p1", "p2", "p3"):
+        if required not in columns:
+            raise ValueError(f"Missing required column '{required}'")
+
+    resource_index = {name: r for r, name in enumerate(resources_config)}
+    overrides = []
+    for name, i in columns.items():
+        if not name.endswith("]") or " [" not in name:
+            continue
+        resource_name, field = name[:-1].rsplit(" [", 1)
+        if resource_name not in resource_index:
+            raise ValueError(f"Column '{name}' refers to unknown resource '{resource_name}'")
+        if field == UNITS_FIELD:
+            overrides.append((i, resource_index[resource_name], None))
+        elif field in APPLICANT_TYPES:
+            overrides.append((i, resource_index[resource_name], APPLICANT_TYPES.index(field)))
+        else:
+            raise ValueError(f"Column '{name}' must end in [Type 1], [Type 2], [Type 3] or [{UNITS_FIELD}]")
+    return columns, overrides
+
+
+def evaluate_chunk(rows, columns, overrides, base_times, base_units):
+    """Vectorized capacity for one chunk of raw rows; returns (mixes, demand, batch, problems).
+
+    `problems` holds one message per row, None for rows that can be used.
+    """
+    n = len(rows)
+    cell = lambda row, i: row[i] if i < len(row) else None
+
+    mixes = np.array([[_to_float(cell(row, columns[p])) for p in ("p1", "p2", "p3")] for row in rows])
+    totals = mixes.sum(axis=1)
+    # Rows whose shares add up to about 100 are percentages
+    mixes[totals > 1.5] /= 100
+    totals = mixes.sum(axis=1)
+    # Allow for shares rounded in the spreadsheet, then renormalize
+    valid = np.isfinite(totals) & (np.abs(totals - 1) < MIX_TOLERANCE) & (mixes >= 0).all(axis=1)
+    mixes[valid] /= totals[valid, np.newaxis]
+    problems = np.where(valid, None, "product mix must be non-negative and sum to 1 (or 100)")
+
+    demand = np.full(n, np.nan)
+    if "demand" in columns:
+        demand = np.array([_to_float(cell(row, columns["demand"])) for row in rows])
+
+    times = np.broadcast_to(base_times, (n,) + base_times.shape).copy()
+    units = np.broadcast_to(base_units, (n,) + base_units.shape).copy()
+    for i, r, k in overrides:
+        values = np.array([_to_float(cell(row, i)) for row in rows])
+        given = ~np.isnan(values)
+        if k is None:
+            bad = given & ~(np.isfinite(values) & (values >= 0) & (values == np.round(values)))
+            message = "unit counts must be non-negative whole numbers"
+            units[given & ~bad, r] = values[given & ~bad]
+        else:
+            bad = given & ~(np.isfinite(values) & (values >= 0))
+            message = "process times must be non-negative numbers"
+            times[given & ~bad, r, k] = values[given & ~bad]
+        problems[bad & (problems == None)] = message
+
+    valid = problems == None
+    mixes[~valid] = 0
+    return mixes, demand, calculate_capacity_batch(mixes, times, units), problems
+
+
+def analyze_offices(path, resources_config=DEFAULT_RESOURCES_CONFIG, chunk_size=10_000, sheet=None):
+    """Stream an office table and return per-row capacity results as arrays.
+
+    Returns {"resource_names", "office", "scenario" (lists), "mix" (N, 3),
+    "demand", "system_capacity", "bottleneck" (arrays of length N), "errors"
+    (first few invalid rows) and "invalid_rows" (count)}. Invalid rows (bad
+    mix, negative or fractional unit counts, negative times or unparsable
+    numbers) are skipped.
+    """
+    resource_names, base_times, base_units = config_to_matrix(resources_config)
+    rows = iter_rows(path, sheet)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError(f"{path} is empty")
+    columns, overrides = parse_header(header, resources_config)
+
+    offices, scenarios = [], []
+    mix_parts, demand_parts, capacity_parts, bottleneck_parts = [], [], [], []
+    errors = []
+    invalid_rows = 0
+
+    def flush(chunk, lines):
+        nonlocal invalid_rows
+        try:
+            mixes, demand, batch, problems = evaluate_chunk(chunk, columns, overrides, base_times, base_units)
+        except (TypeError, ValueError) as exc:
+            if len(chunk) == 1:
+                invalid_rows += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"row {lines[0]}: {exc}")
+                return
+            # Re-run row by row to isolate the unparsable ones
+            for row, row_line in zip(chunk, lines):
+                flush([row], [row_line])
+            return
+        valid = problems == None
+        for j in np.flatnonzero(~valid):
+            invalid_rows += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"row {lines[j]}: {problems[j]}")
+        keep = np.flatnonzero(valid)
+        office_col, scenario_col = columns["office"], columns.get("scenario")
+        offices.extend(str(chunk[j][office_col]) for j in keep)
+        scenarios.extend(str(chunk[j][scenario_col] or "") if scenario_col is not None else "" for j in keep)
+        mix_parts.append(mixes[keep])
+        demand_parts.append(demand[keep])
+        capacity_parts.append(batch["system_capacity"][keep])
+        bottleneck_parts.append(batch["bottleneck"][keep])
+
+    chunk, lines = [], []
+    for line, row in enumerate(rows, start=2):
+        if not any(value not in (None, "") for value in row):
+            continue
+        chunk.append(row)
+        lines.append(line)
+        if len(chunk) == chunk_size:
+            flush(chunk, lines)
+            chunk, lines = [], []
+    if chunk:
+        flush(chunk, lines)
+
+    return {
+        "resource_names": resource_names,
+        "office": offices,
+        "scenario": scenarios,
+        "mix": np.concatenate(mix_parts) if mix_parts else np.empty((0, 3)),
+        "demand": np.concatenate(demand_parts) if demand_parts else np.empty(0),
+        "system_capacity": np.concatenate(capacity_parts) if capacity_parts else np.empty(0),
+        "bottleneck": np.concatenate(bottleneck_parts) if bottleneck_parts else np.empty(0, dtype=int),
+        "errors": errors,
+        "invalid_rows": invalid_rows,
+    }
+
+
+def rank_offices(result, rank_by="system_capacity"):
+    """Row order for the ranked table: lowest capacity first, or highest utilization first"""
+    if rank_by == "utilization":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            utilization = np.nan_to_num(result["demand"] / result["system_capacity"], nan=-np.inf)
+        return np.argsort(-utilization, kind="stable")
+    return np.argsort(result["system_capacity"], kind="stable")
+
+
+def write_ranked_csv(result, out, order, top=None):
+    writer = csv.DictWriter(out, fieldnames=RANKED_FIELDS)
+    writer.writeheader()
+    names = result["resource_names"]
+    for rank, i in enumerate(order[:top] if top else order, start=1):
+        capacity = result["system_capacity"][i]
+        demand = result["demand"][i]
+        has_demand = not np.isnan(demand)
+        writer.writerow({
+            "rank": rank,
+            "office": result["office"][i],
+            "scenario": result["scenario"][i],
+            "p1": result["mix"][i, 0],
+            "p2": result["mix"][i, 1],
+            "p3": result["mix"][i, 2],
+            "demand": demand if has_demand else "",
+            "system_capacity": f"{capacity:.4f}",
+            "bottleneck": names[result["bottleneck"][i]],
+            "utilization_pct": f"{demand / capacity * 100:.2f}" if has_demand and capacity > 0 else "",
+            "feasible": bool(demand <= capacity) if has_demand else "",
+        })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank many DMV office configurations by capacity")
+    parser.add_argument("path", help="CSV or Excel (.xlsx) file, one office scenario per row")
+    parser.add_argument("--sheet", help="worksheet name for Excel input (default: first sheet)")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="rows evaluated per vectorized batch")
+    parser.add_argument("--rank-by", choices=["system_capacity", "utilization"], default="system_capacity",
+                        help="lowest capacity first, or highest demand/capacity first")
+    parser.add_argument("--top", type=int, help="only write the first N ranked rows")
+    parser.add_argument("--out", help="output CSV path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        result = analyze_offices(args.path, chunk_size=args.chunk_size, sheet=args.sheet)
+    except (OSError, ValueError, KeyError) as exc:
+        parser.error(str(exc))
+
+    for error in result["errors"]:
+        print(f"warning: {error}", file=sys.stderr)
+    if result["invalid_rows"] > len(result["errors"]):
+        print(f"warning: {result['invalid_rows']} invalid rows skipped in total", file=sys.stderr)
+
+    order = rank_offices(result, args.rank_by)
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            write_ranked_csv(result, f, order, args.top)
+    else:
+        write_ranked_csv(result, sys.stdout, order, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
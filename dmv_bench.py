@@ -0,0 +1,454 @@
+"""Reproducible benchmarks for capacity math, figures, app reruns and simulation.
+
+Every benchmark is a factory registered with @benchmark(name): it does its
+setup (inputs, warm caches, an AppTest instance) and returns the zero-argument
+callable to time. Each callable is run in timeit-style samples of `number`
+calls, with `number` chosen so one sample takes at least --min-time seconds,
+and per-call times are reported. Inputs use fixed seeds, and surfaces and the
+scenario store go to a temporary directory unless DMV_SURFACE_DIR /
+DMV_STORE_PATH are set, so runs are comparable between commits.
+
+Results are one JSON document with the environment (commit, Python and
+package versions, CPU count) and, per benchmark, min / median / mean / max
+seconds per call. --compare checks a run against an earlier one and exits
+with status 1 when any benchmark got slower than --threshold.
+
+Usage:
+    python dmv_bench.py --out bench_output.txt
+    python dmv_bench.py -k app -k sim --quick
+    python dmv_bench.py --compare baseline.json --threshold 1.25
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from dmv_core import (
+    DEFAULT_DEMAND, DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG, calculate_capacity, calculate_capacity_batch, config_to_matrix
+)
+
+APP_PATH = Path(__file__).with_name("dmv_app.py")
+VISUALIZATIONS_TAB = "📈 Visualizations"
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark factory; names are "<group>:<case>" so -k can select groups"""
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+def _mix_sweep():
+    """Every whole-percent mix, as the sliders allow"""
+    p1, p2 = np.meshgrid(np.arange(101), np.arange(101), indexing="ij")
+    valid = p1 + p2 <= 100
+    return np.stack([p1[valid], p2[valid], 100 - p1[valid] - p2[valid]], axis=1) / 100
+
+
+# ============================================================================
+# CAPACITY MATH
+# ============================================================================
+@benchmark("core:calculate_capacity")
+def bench_calculate_capacity():
+    p1, p2, p3 = DEFAULT_MIX
+    return lambda: calculate_capacity(p1, p2, p3, DEFAULT_RESOURCES_CONFIG)
+
+
+@benchmark("core:batch_slider_sweep")
+def bench_batch_slider_sweep():
+    _, times, units = config_to_matrix(DEFAULT_RESOURCES_CONFIG)
+    mixes = _mix_sweep()
+    return lambda: calculate_capacity_batch(mixes, times, units)
+
+
+@benchmark("core:batch_1m_mixes")
+def bench_batch_1m_mixes():
+    _, times, units = config_to_matrix(DEFAULT_RESOURCES_CONFIG)
+    mixes = np.random.default_rng(0).dirichlet((8, 1, 2), size=1_000_000)
+    return lambda: calculate_capacity_batch(mixes, times, units)
+
+
+@benchmark("surface:compute")
+def bench_surface_compute():
+    from dmv_surface import compute_surface
+    return lambda: compute_surface(DEFAULT_RESOURCES_CONFIG)
+
+
+@benchmark("surface:results_lookup")
+def bench_surface_lookup():
+    from dmv_surface import load_surface
+    surface = load_surface(DEFAULT_RESOURCES_CONFIG)
+    return lambda: surface.results(76, 9)
+
+
+@benchmark("regions:bottleneck_map")
+def bench_bottleneck_map():
+    from dmv_regions import BottleneckMap
+
+    def build():
+        bottleneck_map = BottleneckMap.from_config(DEFAULT_RESOURCES_CONFIG)
+        return bottleneck_map.regions(), bottleneck_map.capacity_grid()
+    return build
+
+
+@benchmark("queueing:wait_curves")
+def bench_wait_curves():
+    from dmv_queueing import pool_visit_profile, queue_curves
+    results = calculate_capacity(*DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG)
+    t_agg = [data["t_agg"] for data in results.values()]
+    units = [data["num_resources"] for data in results.values()]
+    visits, cs2 = pool_visit_profile(DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG)
+    demands = np.arange(0, 201)
+    return lambda: queue_curves(demands, t_agg, units, visits, cs2)
+
+
+@benchmark("api:evaluate_10k_uncached")
+def bench_api_evaluate():
+    from dmv_api import CapacityAPI
+    rng = np.random.default_rng(0)
+    payload = {"scenarios": [{"mix": mix, "demand": float(demand)}
+                             for mix, demand in zip(rng.dirichlet((8, 1, 2), size=10_000).tolist(),
+                                                    rng.integers(10, 80, size=10_000))]}
+    return lambda: CapacityAPI().evaluate(payload)
+
+
+# ============================================================================
+# FIGURES
+# ============================================================================
+@benchmark("figures:capacity")
+def bench_capacity_figure():
+    from dmv_charts import build_capacity_figure
+    from dmv_core import find_bottleneck
+    results = calculate_capacity(*DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG)
+    bottleneck_name = find_bottleneck(results)[0]
+    return lambda: build_capacity_figure(results, bottleneck_name)
+
+
+@benchmark("figures:mix")
+def bench_mix_figure():
+    from dmv_charts import build_mix_figure
+    return lambda: build_mix_figure(76, 9, 15)
+
+
+@benchmark("figures:utilization")
+def bench_utilization_figure():
+    import pandas as pd
+    from dmv_charts import build_utilization_figure
+    from dmv_core import calculate_utilization
+    results = calculate_capacity(*DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG)
+    util_df = pd.DataFrame(calculate_utilization(results, DEFAULT_DEMAND))
+    return lambda: build_utilization_figure(util_df, DEFAULT_DEMAND)
+
+
+@benchmark("figures:wait_curves")
+def bench_wait_curve_figure():
+    from dmv_charts import build_wait_curve_figure
+    from dmv_queueing import pool_visit_profile, queue_curves
+    results = calculate_capacity(*DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG)
+    visits, cs2 = pool_visit_profile(DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG)
+    demands = np.arange(0, 201)
+    curves = queue_curves(demands, [d["t_agg"] for d in results.values()],
+                          [d["num_resources"] for d in results.values()], visits, cs2)
+    return lambda: build_wait_curve_figure(demands, curves["wait"], list(results), DEFAULT_DEMAND)
+
+
+@benchmark("figures:bottleneck_map")
+def bench_bottleneck_map_figure():
+    from dmv_charts import build_bottleneck_map_figure
+    from dmv_regions import BottleneckMap
+    bottleneck_map = BottleneckMap.from_config(DEFAULT_RESOURCES_CONFIG)
+    regions = bottleneck_map.regions()
+    grid_values, capacity_grid, _ = bottleneck_map.capacity_grid()
+    return lambda: build_bottleneck_map_figure(grid_values, capacity_grid, regions, 76, 9)
+
+
+@benchmark("figures:demand_profile")
+def bench_profile_figure():
+    from dmv_charts import build_profile_figure
+    from dmv_demand import DEFAULT_HOURLY_PROFILE, DemandProfile
+    profile_result = DemandProfile(DEFAULT_HOURLY_PROFILE, 48.0).evaluate()
+    return lambda: build_profile_figure(profile_result)
+
+
+@benchmark("figures:multiday")
+def bench_multiday_figure():
+    from dmv_charts import build_multiday_figure
+    from dmv_multiday import analytic_multiday, demand_schedule, simulate_multiday
+    schedule = demand_schedule(DEFAULT_DEMAND, 120, 0.2, 29)
+    analytic = analytic_multiday(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, schedule)
+    simulated = simulate_multiday(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, schedule, n_runs=200, seed=0)
+    return lambda: build_multiday_figure(analytic, simulated, 2, 29)
+
+
+@benchmark("figures:long_series")
+def bench_long_series_figure():
+    # A million-point sweep per resource; the figure carries about MAX_LINE_POINTS points per line
+    from dmv_charts import build_wait_curve_figure
+    demands = np.linspace(0, 200, 1_000_000)
+    wait = np.random.default_rng(0).exponential(5.0, size=(len(demands), len(DEFAULT_RESOURCES_CONFIG)))
+    return lambda: build_wait_curve_figure(demands, wait, list(DEFAULT_RESOURCES_CONFIG), DEFAULT_DEMAND)
+
+
+@benchmark("figures:point_cloud")
+def bench_point_cloud_figure():
+    from dmv_charts import build_point_cloud_figure
+    from dmv_uncertainty import run_uncertainty
+    samples = run_uncertainty(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, n_samples=1_000_000, seed=0,
+                              keep_samples=1_000_000)["samples"]
+    pool_capacity = samples["pool_capacity"]
+    return lambda: build_point_cloud_figure(pool_capacity[:, 0], pool_capacity[:, 1], "Pool capacity samples",
+                                            "First pool (per hour)", "Second pool (per hour)")
+
+
+# ============================================================================
+# SIMULATION
+# ============================================================================
+@benchmark("sim:simulate_day")
+def bench_simulate_day():
+    from dmv_sim import simulate_day, summarize_simulation
+    return lambda: summarize_simulation(simulate_day(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, DEFAULT_DEMAND, seed=0))
+
+
+@benchmark("sim:replications_50_in_process")
+def bench_replications():
+    from dmv_sim import run_replications
+    # One in-process worker measures the simulation itself, not process start-up
+    executor = ThreadPoolExecutor(max_workers=1)
+    return lambda: run_replications(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, DEFAULT_DEMAND, n_replications=50,
+                                    seed=0, executor=executor)
+
+
+@benchmark("sim:compare_configs_crn")
+def bench_compare_configs():
+    from dmv_experiment import compare_configs
+    more_eye_clerks = copy.deepcopy(DEFAULT_RESOURCES_CONFIG)
+    more_eye_clerks["Eye Exam Clerks"]["num_resources"] += 1
+    variants = {"today": DEFAULT_RESOURCES_CONFIG, "+1 eye clerk": more_eye_clerks}
+    executor = ThreadPoolExecutor(max_workers=1)
+    return lambda: compare_configs(variants, DEFAULT_MIX, DEFAULT_DEMAND, max_replications=20, seed=0,
+                                   executor=executor)
+
+
+@benchmark("sim:multiday_analytic_year")
+def bench_multiday_analytic():
+    from dmv_multiday import analytic_multiday
+    return lambda: analytic_multiday(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, DEFAULT_DEMAND, n_days=365)
+
+
+@benchmark("sim:multiday_200_runs_year")
+def bench_multiday_simulated():
+    from dmv_multiday import simulate_multiday
+    return lambda: simulate_multiday(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, DEFAULT_DEMAND, n_days=365,
+                                     n_runs=200, seed=0)
+
+
+@benchmark("sim:uncertainty_100k")
+def bench_uncertainty():
+    from dmv_uncertainty import run_uncertainty
+    return lambda: run_uncertainty(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, n_samples=100_000, seed=0)
+
+
+@benchmark("sim:optimize_staffing")
+def bench_staffing():
+    from dmv_staffing import optimize_staffing
+    return lambda: optimize_staffing(DEFAULT_RESOURCES_CONFIG, DEFAULT_MIX, 60, max_total_wait=3.0)
+
+
+# ============================================================================
+# APP RERUNS (Streamlit's in-process AppTest harness)
+# ============================================================================
+def _app_test():
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(str(APP_PATH), default_timeout=120)
+
+
+def _sidebar_slider(app_test, label):
+    """The sidebar slider whose label starts with `label`; main-area sliders come first in app_test.slider"""
+    return next(s for s in app_test.sidebar.slider if s.label.startswith(label))
+
+
+def _slider_rerun(app_test, tab=None):
+    """A rerun after moving the Type 1 slider between two values, as a user dragging it would cause"""
+    values = iter([70, 76] * 1_000_000)
+
+    def rerun():
+        _sidebar_slider(app_test, "Type 1").set_value(next(values))
+        if tab is not None:
+            # AppTest does not keep the selected tab across widget changes
+            app_test.session_state["main_tabs"] = tab
+        app_test.run()
+        if app_test.exception:
+            raise RuntimeError(f"dmv_app.py raised: {app_test.exception[0].message}")
+    return rerun
+
+
+@benchmark("app:first_run")
+def bench_app_first_run():
+    def first_run():
+        app_test = _app_test().run()
+        if app_test.exception:
+            raise RuntimeError(f"dmv_app.py raised: {app_test.exception[0].message}")
+    return first_run
+
+
+@benchmark("app:slider_rerun")
+def bench_app_slider_rerun():
+    return _slider_rerun(_app_test().run())
+
+
+@benchmark("app:slider_rerun_visualizations")
+def bench_app_visualizations_rerun():
+    app_test = _app_test().run()
+    app_test.session_state["main_tabs"] = VISUALIZATIONS_TAB
+    app_test.run()
+    return _slider_rerun(app_test, VISUALIZATIONS_TAB)
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+def time_callable(func, repeat=5, min_time=0.2):
+    """Per-call seconds of `repeat` samples, each running func enough times to take at least min_time"""
+    func()  # warm-up, also catches errors before timing
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return number, samples
+
+
+def environment():
+    import pandas
+    import plotly
+    import streamlit
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    cwd=Path(__file__).parent, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {"numpy": np.__version__, "pandas": pandas.__version__, "plotly": plotly.__version__,
+                     "streamlit": streamlit.__version__},
+    }
+
+
+def run_benchmarks(names, repeat=5, min_time=0.2, log=None):
+    """Run the named benchmarks and return {name: stats}; a failing benchmark records its error"""
+    results = {}
+    for name in names:
+        try:
+            number, samples = time_callable(BENCHMARKS[name](), repeat, min_time)
+        except Exception as exc:  # keep going so one broken path does not hide the others
+            results[name] = {"error": f"{type(exc).__name__}: {exc}"}
+        else:
+            results[name] = {
+                "number": number,
+                "repeat": len(samples),
+                "min": min(samples),
+                "median": statistics.median(samples),
+                "mean": statistics.fmean(samples),
+                "max": max(samples),
+            }
+        if log is not None:
+            stats = results[name]
+            log.write(f"{name:40s} " + (f"{stats['median'] * 1000:12.3f} ms" if "error" not in stats
+                                         else f"ERROR {stats['error']}") + "\n")
+    return results
+
+
+def compare_runs(current, baseline, threshold=1.25, stat="min"):
+    """Rows (name, baseline s, current s, ratio, regressed) for benchmarks present in both runs"""
+    rows = []
+    for name, stats in current["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None or "error" in stats or "error" in before:
+            continue
+        ratio = stats[stat] / before[stat] if before[stat] > 0 else float("inf")
+        rows.append((name, before[stat], stats[stat], ratio, ratio > threshold))
+    return rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark capacity math, figures, app reruns and simulation")
+    parser.add_argument("-k", dest="patterns", action="append", default=[],
+                        help="Only run benchmarks whose name contains this text (repeatable)")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed samples per benchmark (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per sample (default: 0.2)")
+    parser.add_argument("--quick", action="store_true", help="3 samples of at least 0.05 s, for smoke runs")
+    parser.add_argument("--out", help="Write the JSON results here instead of standard output")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Slowdown ratio (of the fastest sample) counted as a regression (default: 1.25)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    names = [name for name in BENCHMARKS if not args.patterns or any(p in name for p in args.patterns)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if args.quick:
+        args.repeat, args.min_time = 3, 0.05
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Keep benchmark runs away from the user's cached surfaces and saved scenarios
+        os.environ.setdefault("DMV_SURFACE_DIR", scratch)
+        os.environ.setdefault("DMV_STORE_PATH", str(Path(scratch) / "scenarios.sqlite3"))
+        report = {"environment": environment(), "settings": {"repeat": args.repeat, "min_time": args.min_time},
+                  "benchmarks": run_benchmarks(names, args.repeat, args.min_time, log=sys.stderr)}
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+
+    failed = [name for name, stats in report["benchmarks"].items() if "error" in stats]
+    regressed = []
+    if args.compare:
+        rows = compare_runs(report, json.loads(Path(args.compare).read_text()), args.threshold)
+        print(f"\n{'benchmark':40s} {'before ms':>12s} {'after ms':>12s} {'ratio':>7s}", file=sys.stderr)
+        for name, before, after, ratio, slower in rows:
+            print(f"{name:40s} {before * 1000:12.3f} {after * 1000:12.3f} {ratio:7.2f}"
+                  f"{'  REGRESSION' if slower else ''}", file=sys.stderr)
+        regressed = [row[0] for row in rows if row[4]]
+    return 1 if failed or regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
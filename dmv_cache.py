@@ -0,0 +1,77 @@
+"""Bounded LRU cache for capacity results, tables and figures.
+
+Streamlit reruns dmv_app.py from the top on every widget change, and many
+sessions ask for the same default or near-default scenarios. The app keeps a
+single LRUCache per server process (via st.cache_resource) and keys entries
+by scenario, so a rerun only rebuilds what actually changed. Like dmv_core,
+this module has no UI dependencies.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+def config_key(resources_config):
+    """Stable short hash of a resources_config dict, usable as part of a cache key"""
+    canonical = json.dumps(resources_config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class LRUCache:
+    """Thread-safe mapping with a size bound and least-recently-used eviction.
+
+    Cached values are shared between sessions and must be treated as
+    read-only by callers.
+    """
+
+    def __init__(self, maxsize=256):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute() and storing its result on a miss"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            # compute() runs outside the lock so a slow build never blocks other sessions;
+            # two sessions missing the same key at once simply both build it
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,478 @@
+"""Plotly figure builders for the Visualizations tab.
+
+Each builder depends only on its arguments, so the app can cache the
+returned figures per scenario and reuse them across reruns and sessions.
+
+Long series and large grids are reduced before they are put in a figure,
+so the JSON sent to the browser and the time to draw it stay bounded
+however long the sweep or simulation was: lines keep the minimum and
+maximum of each bucket of consecutive points (peaks and gaps survive),
+heatmaps are averaged over blocks of cells, and point clouds become a
+density heatmap of counts. Traces with more than WEBGL_POINT_THRESHOLD
+points are drawn with WebGL (Scattergl) instead of SVG.
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+# Scatter traces with more points than this are drawn with WebGL
+WEBGL_POINT_THRESHOLD = 1000
+
+# Line traces are reduced to about this many points (two per bucket)
+MAX_LINE_POINTS = 2000
+
+# Point clouds with more points than this are sent as a density heatmap
+MAX_SCATTER_POINTS = 20_000
+
+# Heatmaps are coarsened to at most this many cells; also the density grid
+MAX_HEATMAP_CELLS = 200 * 200
+
+
+# ============================================================================
+# LARGE SERIES
+# ============================================================================
+def minmax_indices(y, max_points=MAX_LINE_POINTS):
+    """Indices of the points to keep so a line of len(y) points has about max_points.
+
+    Consecutive points are split into max_points // 2 buckets and the lowest
+    and highest point of each bucket are kept, in their original order, so
+    spikes are not averaged away. A bucket containing NaN (a gap in the
+    line) also keeps its first NaN, so gaps stay visible.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    size = -(-n // max(max_points // 2, 1))
+    n_buckets = -(-n // size)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(n_buckets, size)
+    missing = np.isnan(blocks)
+    offsets = np.arange(n_buckets) * size
+    low = np.where(missing, np.inf, blocks).argmin(axis=1) + offsets
+    high = np.where(missing, -np.inf, blocks).argmax(axis=1) + offsets
+    gaps = missing & (np.arange(n_buckets * size) < n).reshape(n_buckets, size)
+    has_gap = gaps.any(axis=1)
+    first_gap = gaps.argmax(axis=1)[has_gap] + offsets[has_gap]
+    return np.unique(np.concatenate([low, high, first_gap]))
+
+
+def line_trace(x, y, customdata=None, max_points=MAX_LINE_POINTS, **kwargs):
+    """Scatter trace for a line, min/max downsampled above max_points and WebGL above WEBGL_POINT_THRESHOLD"""
+    y = np.asarray(y, dtype=float)
+    if len(y) > max_points:
+        keep = minmax_indices(y, max_points)
+        x, y = np.asarray(x)[keep], y[keep]
+        if customdata is not None:
+            customdata = np.asarray(customdata)[keep]
+    trace_type = go.Scattergl if len(y) > WEBGL_POINT_THRESHOLD else go.Scatter
+    return trace_type(x=x, y=y, customdata=customdata, **kwargs)
+
+
+def band_trace(x, low, high, max_points=MAX_LINE_POINTS, **kwargs):
+    """Filled band between low and high, each edge reduced to at most max_points // 2 buckets.
+
+    A bucket keeps its first x, its lowest low and its highest high, so the
+    band never gets narrower than the data.
+    """
+    x, low, high = np.asarray(x), np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+    if len(x) > max_points // 2:
+        starts = np.arange(0, len(x), -(-len(x) // max(max_points // 2, 1)))
+        x, low, high = x[starts], np.minimum.reduceat(low, starts), np.maximum.reduceat(high, starts)
+    trace_type = go.Scattergl if 2 * len(x) > WEBGL_POINT_THRESHOLD else go.Scatter
+    return trace_type(x=np.concatenate([x, x[::-1]]), y=np.concatenate([high, low[::-1]]), fill='toself', **kwargs)
+
+
+def _block_centers(values, factor):
+    """Mean of each run of `factor` consecutive values (the last run may be shorter)"""
+    values = np.asarray(values, dtype=float)
+    starts = np.arange(0, len(values), factor)
+    return np.add.reduceat(values, starts) / np.diff(np.append(starts, len(values)))
+
+
+def coarsen_heatmap(x, y, z, max_cells=MAX_HEATMAP_CELLS):
+    """(x, y, z) of a heatmap averaged over square blocks of cells until z has at most max_cells.
+
+    z is (len(y), len(x)). NaN cells are left out of the block means; a
+    block of NaN stays NaN.
+    """
+    z = np.asarray(z, dtype=float)
+    factor = int(np.ceil(np.sqrt(z.size / max_cells)))
+    if factor <= 1:
+        return x, y, z
+    n_y, n_x = z.shape
+    padded = np.pad(z, ((0, -n_y % factor), (0, -n_x % factor)), constant_values=np.nan)
+    blocks = padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor)
+    valid = ~np.isnan(blocks)
+    counts = valid.sum(axis=(1, 3))
+    sums = np.where(valid, blocks, 0.0).sum(axis=(1, 3))
+    z = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return _block_centers(x, factor), _block_centers(y, factor), z
+
+
+def density_trace(x, y, max_cells=MAX_HEATMAP_CELLS, **kwargs):
+    """Heatmap of point counts on a square grid of at most max_cells, empty cells left blank"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    bins = max(int(np.sqrt(max_cells)), 1)
+    counts, x_edges, y_edges = np.histogram2d(x[finite], y[finite], bins=bins)
+    return go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=np.where(counts > 0, counts, np.nan).T,
+        **kwargs
+    )
+
+
+def point_cloud_trace(x, y, max_points=MAX_SCATTER_POINTS, **kwargs):
+    """Markers for every point, with WebGL above WEBGL_POINT_THRESHOLD; a density heatmap above max_points"""
+    if len(x) > max_points:
+        return density_trace(x, y, colorscale='Viridis', colorbar=dict(title="Points"),
+                             hovertemplate='%{x:.3g}, %{y:.3g}<br>Points: %{z}<extra></extra>')
+    trace_type = go.Scattergl if len(x) > WEBGL_POINT_THRESHOLD else go.Scatter
+    return trace_type(x=x, y=y, mode='markers', **kwargs)
+
+
+# ============================================================================
+# FIGURES
+# ============================================================================
+
+
+def build_capacity_figure(results, bottleneck_name):
+    """Bar chart of resource pool capacities with the system capacity line"""
+    capacity_list = [results[r]['pool_capacity'] for r in results.keys()
+                    if results[r]['pool_capacity'] != float('inf')]
+    resource_names = [r for r in results.keys()
+                     if results[r]['pool_capacity'] != float('inf')]
+
+    # Color code: green for non-bottleneck, red for bottleneck
+    colors = ['#e74c3c' if r == bottleneck_name else '#2ecc71'
+             for r in resource_names]
+
+    fig_capacity = go.Figure(data=[
+        go.Bar(
+            x=resource_names,
+            y=capacity_list,
+            marker=dict(
+                color=colors,
+                line=dict(color='black', width=2)
+            ),
+            text=[f"{c:.1f}" for c in capacity_list],
+            textposition='outside',
+            hovertemplate='<b>%{x}</b><br>Capacity: %{y:.2f} licenses/hr<extra></extra>'
+        )
+    ])
+
+    system_cap = min(capacity_list)
+    fig_capacity.add_hline(
+        y=system_cap,
+        line_dash="dash",
+        line_color="red",
+        line_width=2,
+        annotation_text=f"System Capacity: {system_cap:.2f}/hr",
+        annotation_position="right",
+        annotation_font_size=12
+    )
+
+    fig_capacity.update_layout(
+        title="Resource Pool Capacity (licenses/hour)",
+        xaxis_title="Resource",
+        yaxis_title="Capacity (licenses/hour)",
+        height=500,
+        hovermode='x',
+        template='plotly_white',
+        showlegend=False
+    )
+    return fig_capacity
+
+
+def build_mix_figure(p1, p2, p3):
+    """Pie chart of the product mix (percentages)"""
+    fig_mix = go.Figure(data=[go.Pie(
+        labels=['Type 1<br>(Proper docs, pass exam)',
+                'Type 2<br>(Fail exam)',
+                'Type 3<br>(No proper docs)'],
+        values=[p1, p2, p3],
+        marker=dict(colors=['#2ecc71', '#f39c12', '#e74c3c']),
+        textinfo='label+percent+value',
+        hovertemplate='<b>%{label}</b><br>%{percent}<br>(%{value}%)<extra></extra>'
+    )])
+
+    fig_mix.update_layout(
+        title="Product Mix Distribution",
+        height=500,
+        template='plotly_white'
+    )
+    return fig_mix
+
+
+def build_utilization_figure(util_df, demand):
+    """Color-coded utilization bars for every resource at the given demand"""
+    fig_util = go.Figure(data=[
+        go.Bar(
+            x=util_df["Resource"],
+            y=util_df["Utilization %"],
+            marker=dict(
+                color=util_df["Utilization %"],
+                colorscale=['#2ecc71', '#f39c12', '#e74c3c'],
+                cmin=0,
+                cmax=150,
+                showscale=True,
+                colorbar=dict(title="Utilization %"),
+                line=dict(color='black', width=1.5)
+            ),
+            text=[f"{u:.1f}%" for u in util_df["Utilization %"]],
+            textposition='outside',
+            hovertemplate='<b>%{x}</b><br>Utilization: %{y:.1f}%<extra></extra>'
+        )
+    ])
+
+    fig_util.add_hline(
+        y=100,
+        line_dash="dash",
+        line_color="red",
+        line_width=2,
+        annotation_text="Full Capacity (100%)",
+        annotation_position="right"
+    )
+
+    fig_util.update_layout(
+        title=f"Resource Utilization at {demand} applicants/hour",
+        xaxis_title="Resource",
+        yaxis_title="Utilization (%)",
+        height=500,
+        hovermode='x',
+        template='plotly_white'
+    )
+    return fig_util
+
+
+def build_wait_curve_figure(demands, wait, resource_names, demand):
+    """Expected queue wait (minutes) versus demand for every resource pool"""
+    fig_wait = go.Figure()
+    for i, resource_name in enumerate(resource_names):
+        # Unstable (>= 100% utilization) points are left as gaps in the line
+        wait_curve = np.where(np.isinf(wait[:, i]), np.nan, wait[:, i])
+        fig_wait.add_trace(line_trace(
+            demands,
+            wait_curve,
+            mode='lines',
+            name=resource_name,
+            hovertemplate='<b>' + resource_name + '</b><br>Demand: %{x:.0f} appl/hr<br>Wait: %{y:.2f} min<extra></extra>'
+        ))
+
+    fig_wait.add_vline(
+        x=demand,
+        line_dash="dash",
+        line_color="gray",
+        annotation_text=f"Demand: {demand}/hr",
+        annotation_position="top left"
+    )
+
+    fig_wait.update_layout(
+        title="Expected Queue Wait vs. Demand (Erlang C / Allen-Cunneen)",
+        xaxis_title="Applicants per hour",
+        yaxis_title="Expected wait in queue (minutes)",
+        yaxis_range=[0, 30],
+        height=450,
+        template='plotly_white'
+    )
+    return fig_wait
+
+
+def build_profile_figure(profile_result):
+    """Arrivals per interval against capacity, with the backlog carried between intervals"""
+    over = profile_result["arrivals"] + profile_result["carried_in"] > profile_result["capacity"]
+    fig_profile = go.Figure()
+    fig_profile.add_trace(go.Bar(
+        x=profile_result["start"],
+        y=profile_result["arrivals"],
+        name="Arrivals",
+        marker=dict(
+            color=['#e74c3c' if o else '#2ecc71' for o in over],
+            line=dict(color='black', width=1)
+        ),
+        hovertemplate='<b>%{x}</b><br>Arrivals: %{y:.0f}<extra></extra>'
+    ))
+    fig_profile.add_trace(line_trace(
+        profile_result["start"],
+        profile_result["capacity"],
+        mode='lines',
+        name="Capacity",
+        line=dict(color='black', dash='dash', shape='hv'),
+        hovertemplate='<b>%{x}</b><br>Capacity: %{y:.1f}<extra></extra>'
+    ))
+    fig_profile.add_trace(line_trace(
+        profile_result["start"],
+        profile_result["backlog"],
+        mode='lines+markers',
+        name="Queue carried over",
+        line=dict(color='#f39c12', width=3),
+        hovertemplate='<b>%{x}</b><br>Queue at end: %{y:.1f}<extra></extra>'
+    ))
+
+    fig_profile.update_layout(
+        title="Arrivals, Capacity and Carried-Over Queue by Interval",
+        xaxis_title="Interval start",
+        yaxis_title="Applicants",
+        height=450,
+        hovermode='x unified',
+        template='plotly_white'
+    )
+    return fig_profile
+
+
+def build_bottleneck_map_figure(grid_values, capacity_grid, regions, p1, p2):
+    """System capacity heatmap over (Type 1 %, Type 2 %) with the exact bottleneck regions outlined"""
+    # Fine grids are averaged down to MAX_HEATMAP_CELLS cells
+    x, y, z = coarsen_heatmap(grid_values * 100, grid_values * 100, capacity_grid)
+    fig_map = go.Figure(go.Heatmap(
+        x=x,
+        y=y,
+        z=z,
+        colorscale='RdYlGn',
+        colorbar=dict(title="Capacity/hr"),
+        hovertemplate='Type 1: %{x:.0f}%<br>Type 2: %{y:.0f}%<br>Capacity: %{z:.1f}/hr<extra></extra>'
+    ))
+
+    for resource_name, polygon in regions.items():
+        if len(polygon) == 0:
+            continue
+        outline = polygon * 100
+        centroid = outline.mean(axis=0)
+        fig_map.add_trace(go.Scatter(
+            x=list(outline[:, 0]) + [outline[0, 0]],
+            y=list(outline[:, 1]) + [outline[0, 1]],
+            mode='lines',
+            line=dict(color='black', width=2),
+            hoverinfo='skip',
+            showlegend=False
+        ))
+        fig_map.add_annotation(
+            x=centroid[0], y=centroid[1],
+            text=f"<b>{resource_name}</b>",
+            showarrow=False,
+            bgcolor='rgba(255,255,255,0.7)'
+        )
+
+    fig_map.add_trace(go.Scatter(
+        x=[p1], y=[p2],
+        mode='markers',
+        marker=dict(symbol='x', size=14, color='black', line=dict(color='white', width=2)),
+        name="Current mix",
+        hovertemplate='Current mix<br>Type 1: %{x}%<br>Type 2: %{y}%<extra></extra>'
+    ))
+
+    fig_map.update_layout(
+        title="Bottleneck Regions over the Product Mix (Type 3 = rest)",
+        xaxis_title="Type 1 (%)",
+        yaxis_title="Type 2 (%)",
+        xaxis_range=[0, 100],
+        yaxis_range=[0, 100],
+        height=500,
+        template='plotly_white',
+        showlegend=False
+    )
+    return fig_map
+
+
+def build_multiday_figure(analytic, simulated, highlight, shock_day=None):
+    """Daily utilization per resource (expected), with the simulated 5-95% band for one resource"""
+    days = np.arange(1, analytic["load"].shape[0] + 1)
+    fig_days = go.Figure()
+
+    name = analytic["resource_names"][highlight]
+    utilization = simulated["utilization"][:, :, highlight] * 100
+    low, high = np.percentile(utilization, [5, 95], axis=0)
+    fig_days.add_trace(band_trace(
+        days,
+        low,
+        high,
+        fillcolor='rgba(231, 76, 60, 0.2)',
+        line=dict(width=0),
+        name=f"{name} (simulated 5–95%)",
+        hoverinfo='skip'
+    ))
+
+    for i, resource_name in enumerate(analytic["resource_names"]):
+        fig_days.add_trace(line_trace(
+            days,
+            analytic["utilization"][:, i] * 100,
+            mode='lines',
+            name=resource_name,
+            line=dict(width=3 if i == highlight else 1.5),
+            hovertemplate='<b>' + resource_name + '</b><br>Day %{x}<br>Utilization: %{y:.1f}%<extra></extra>'
+        ))
+
+    fig_days.add_hline(y=100, line_dash="dash", line_color="red", line_width=1)
+    if shock_day is not None:
+        fig_days.add_vline(x=shock_day + 1, line_dash="dot", line_color="gray",
+                           annotation_text="Demand change", annotation_position="top left")
+
+    fig_days.update_layout(
+        title="Daily Utilization with Return Visits on Later Days",
+        xaxis_title="Operating day",
+        yaxis_title="Utilization (%)",
+        height=450,
+        hovermode='x unified',
+        template='plotly_white'
+    )
+    return fig_days
+
+
+def build_plan_figure(rolled, scenario_names):
+    """Demand per period against each staffing scenario's capacity, for a rolled-up long-range plan"""
+    periods = rolled["periods"].astype("datetime64[D]").astype(str)
+    fig_plan = go.Figure()
+    demand_hover = '<b>%{x}</b><br>Demand: %{y:,.0f} applicants<extra></extra>'
+    if len(periods) > WEBGL_POINT_THRESHOLD:
+        # Bars have no WebGL version; thousands of periods (a daily rollup) become a filled line
+        fig_plan.add_trace(line_trace(periods, rolled["demand"], name="Demand", fill='tozeroy',
+                                      line=dict(color='#bdc3c7'), hovertemplate=demand_hover))
+    else:
+        fig_plan.add_trace(go.Bar(
+            x=periods,
+            y=rolled["demand"],
+            name="Demand",
+            marker=dict(color='#bdc3c7'),
+            hovertemplate=demand_hover
+        ))
+    for s, scenario_name in enumerate(scenario_names):
+        fig_plan.add_trace(line_trace(
+            periods,
+            rolled["capacity"][s],
+            mode='lines',
+            name=scenario_name,
+            line=dict(width=3 if s == 0 else 1.5, shape='hv'),
+            customdata=rolled["unmet"][s],
+            hovertemplate='<b>' + scenario_name + '</b><br>%{x}<br>Capacity: %{y:,.0f}'
+                          '<br>Unmet: %{customdata:,.0f}<extra></extra>'
+        ))
+
+    fig_plan.update_layout(
+        title="Demand vs. Capacity per Period by Staffing Scenario",
+        xaxis_title="Period",
+        yaxis_title="Applicants",
+        height=450,
+        hovermode='x unified',
+        template='plotly_white'
+    )
+    return fig_plan
+
+
+def build_point_cloud_figure(x, y, title, xaxis_title, yaxis_title):
+    """Scatter of paired samples (e.g. Monte Carlo draws), as a density heatmap when there are too many to send"""
+    fig_cloud = go.Figure(point_cloud_trace(
+        x, y,
+        marker=dict(size=4, opacity=0.5, color='#2980b9'),
+        hovertemplate='%{x:.3g}, %{y:.3g}<extra></extra>'
+    ))
+    fig_cloud.update_layout(
+        title=title,
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        height=450,
+        template='plotly_white',
+        showlegend=False
+    )
+    return fig_cloud
@@ -0,0 +1,133 @@
+"""Command-line entry point for headless capacity runs.
+
+Examples:
+    python dmv_cli.py                                 # default office and mix
+    python dmv_cli.py --mix 0.80 0.05 0.15 --demand 50
+    python dmv_cli.py scenarios.json --format csv > results.csv
+
+Only dmv_core (and therefore NumPy) is imported, never Streamlit, Plotly or
+pandas, so a run over hundreds of scenario files starts quickly.
+"""
+import argparse
+import csv
+import json
+import sys
+
+from dmv_core import (
+    DEFAULT_DEMAND,
+    DEFAULT_MIX,
+    DEFAULT_RESOURCES_CONFIG,
+    calculate_capacity,
+    calculate_utilization,
+    find_bottleneck,
+    load_config,
+    validate_mix,
+)
+
+CSV_FIELDS = [
+    "scenario", "p1", "p2", "p3", "demand", "system_capacity", "bottleneck", "feasible",
+    "resource", "num_resources", "t_agg", "capacity_per_hour", "pool_capacity", "utilization_pct",
+]
+
+
+def _json_number(value):
+    """JSON has no infinity, so unbounded capacities are written as null"""
+    return None if value == float('inf') else value
+
+
+def analyze_scenario(name, mix, demand, resources_config):
+    """Capacity, bottleneck and utilization for one scenario as a JSON-ready dict"""
+    p1, p2, p3 = mix
+    results = calculate_capacity(p1, p2, p3, resources_config)
+    bottleneck_name, bottleneck_data = find_bottleneck(results)
+    system_capacity = bottleneck_data['pool_capacity']
+    utilization = {row["Resource"]: row["Utilization %"] for row in calculate_utilization(results, demand)}
+
+    return {
+        "scenario": name,
+        "mix": {"p1": p1, "p2": p2, "p3": p3},
+        "demand": demand,
+        "system_capacity": _json_number(system_capacity),
+        "bottleneck": bottleneck_name,
+        "feasible": demand <= system_capacity,
+        "resources": {
+            resource_name: {
+                "num_resources": data['num_resources'],
+                "t_agg": data['t_agg'],
+                "capacity_per_hour": _json_number(data['capacity_per_hour']),
+                "pool_capacity": _json_number(data['pool_capacity']),
+                "utilization_pct": utilization.get(resource_name),
+            }
+            for resource_name, data in results.items()
+        },
+    }
+
+
+def write_json(reports, out):
+    json.dump(reports, out, indent=2)
+    out.write("\n")
+
+
+def write_csv(reports, out):
+    """One row per (scenario, resource) pair"""
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for report in reports:
+        for resource_name, data in report["resources"].items():
+            writer.writerow({
+                "scenario": report["scenario"],
+                **report["mix"],
+                "demand": report["demand"],
+                "system_capacity": report["system_capacity"],
+                "bottleneck": report["bottleneck"],
+                "feasible": report["feasible"],
+                "resource": resource_name,
+                **data,
+            })
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="DMV license renewal capacity analysis (headless)")
+    parser.add_argument("configs", nargs="*", help="JSON scenario files (see dmv_core.load_config)")
+    parser.add_argument("--mix", nargs=3, type=float, metavar=("P1", "P2", "P3"),
+                        help="product mix proportions, overriding the config files")
+    parser.add_argument("--demand", type=float, help="applicants per hour, overriding the config files")
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="output format (default: json)")
+    return parser
+
+
+def collect_scenarios(args):
+    """Yield (name, mix, demand, resources_config) for every scenario requested on the command line"""
+    if not args.configs:
+        yield "default", tuple(args.mix or DEFAULT_MIX), args.demand if args.demand is not None else DEFAULT_DEMAND, DEFAULT_RESOURCES_CONFIG
+        return
+
+    for path in args.configs:
+        resources_config, scenarios = load_config(path)
+        for scenario in scenarios:
+            name = scenario["name"] if len(args.configs) == 1 else f"{path}:{scenario['name']}"
+            mix = tuple(args.mix) if args.mix else scenario["mix"]
+            demand = args.demand if args.demand is not None else scenario["demand"]
+            yield name, mix, demand, resources_config
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        if args.mix:
+            validate_mix(*args.mix)
+        reports = [analyze_scenario(*scenario) for scenario in collect_scenarios(args)]
+    except (OSError, ValueError, KeyError) as exc:
+        parser.error(str(exc))
+
+    if args.format == "csv":
+        write_csv(reports, sys.stdout)
+    else:
+        write_json(reports, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
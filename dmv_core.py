@@ -0,0 +1,228 @@
+"""Capacity math for the DMV license renewal model.
+
+This module has no UI dependencies (no Streamlit, Plotly or pandas) so batch
+jobs and the command-line tool can import it cheaply. The Streamlit app in
+dmv_app.py builds its tables and charts on top of these functions.
+"""
+import json
+import math
+
+import numpy as np
+
+# ============================================================================
+# RESOURCE CONFIGURATION
+# ============================================================================
+APPLICANT_TYPES = ["Type 1", "Type 2", "Type 3"]
+
+DEFAULT_MIX = (0.76, 0.09, 0.15)
+
+DEFAULT_DEMAND = 45
+
+DEFAULT_RESOURCES_CONFIG = {
+    "Review Clerks": {
+        "Type 1": 2.5,
+        "Type 2": 2.5,
+        "Type 3": 2.5,  # All applicants need document review
+        "num_resources": 2,
+        "description": "Review documents for violations and restrictions"
+    },
+    "Cashiers": {
+        "Type 1": 1.0,
+        "Type 2": 1.0,
+        "Type 3": 0.0,  # Type 3 leaves at review stage
+        "num_resources": 2,
+        "description": "Process license renewal payment"
+    },
+    "Eye Exam Clerks": {
+        "Type 1": 2.0,
+        "Type 2": 4.0,  # Fails once (2 min), returns to pass (2 min) = 4 min total
+        "Type 3": 0.0,  # Type 3 leaves at review stage
+        "num_resources": 2,
+        "visits": {"Type 2": 2},  # Type 2 time is split over the failed and the passing visit
+        "description": "Conduct vision screening test"
+    },
+    "Photo/Printing Machines": {
+        "Type 1": 3.0,
+        "Type 2": 3.0,
+        "Type 3": 0.0,  # Type 3 leaves at review stage
+        "num_resources": 4,
+        "description": "Take photo and print license"
+    },
+}
+
+
+def validate_mix(p1, p2, p3, tolerance=1e-6):
+    """Raise ValueError unless the three proportions are non-negative and sum to 1"""
+    if min(p1, p2, p3) < 0:
+        raise ValueError(f"Product mix proportions must be non-negative, got {(p1, p2, p3)}")
+    if abs(p1 + p2 + p3 - 1) > tolerance:
+        raise ValueError(f"Product mix proportions must sum to 1, got {p1 + p2 + p3:.6f}")
+
+
+def load_config(path):
+    """Read a JSON scenario file and return (resources_config, scenarios).
+
+    The file may contain a "resources" object in the resources_config format
+    (the default office is used when it is missing) and either a single
+    "mix"/"demand" pair or a "scenarios" list of {"name", "mix", "demand"}
+    objects. Mixes are [p1, p2, p3] proportions summing to 1.
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+
+    resources_config = raw.get("resources", DEFAULT_RESOURCES_CONFIG)
+    scenarios = raw.get("scenarios")
+    if scenarios is None:
+        scenarios = [{"name": "default", "mix": raw.get("mix", DEFAULT_MIX), "demand": raw.get("demand", DEFAULT_DEMAND)}]
+
+    parsed = []
+    for i, scenario in enumerate(scenarios):
+        p1, p2, p3 = (float(p) for p in scenario.get("mix", DEFAULT_MIX))
+        validate_mix(p1, p2, p3)
+        parsed.append({
+            "name": str(scenario.get("name", f"scenario_{i + 1}")),
+            "mix": (p1, p2, p3),
+            "demand": float(scenario.get("demand", DEFAULT_DEMAND)),
+        })
+    return resources_config, parsed
+
+
+# ============================================================================
+# CAPACITY CALCULATION FUNCTIONS
+# ============================================================================
+def config_to_matrix(resources_config, applicant_types=APPLICANT_TYPES):
+    """Turn resources_config into resource names, a (resources x types) time matrix and unit counts"""
+    resource_names = list(resources_config.keys())
+    times = np.array(
+        [[info[t] for t in applicant_types] for info in resources_config.values()],
+        dtype=float
+    )
+    num_resources = np.array(
+        [info["num_resources"] for info in resources_config.values()],
+        dtype=float
+    )
+    return resource_names, times, num_resources
+
+
+def calculate_capacity_batch(mixes, times, num_resources):
+    """Evaluate the product aggregation method for many product mixes in one call.
+
+    mixes is an (M, K) array of type proportions (one row per mix), times is the
+    (R, K) matrix from config_to_matrix and num_resources has length R. To
+    evaluate a different configuration per mix (e.g. many offices), pass times
+    as (M, R, K) and num_resources as (M, R) instead.
+    Returns a dict of arrays: t_agg, capacity_per_hour and pool_capacity are
+    (M, R); bottleneck (index into the resources) and system_capacity are (M,).
+    """
+    mixes = np.atleast_2d(np.asarray(mixes, dtype=float))
+    times = np.asarray(times, dtype=float)
+
+    # T_agg = p1*T1 + p2*T2 + p3*T3, accumulated type by type so every mix
+    # gets exactly the same floating point result as the scalar formula
+    t_agg = np.zeros((mixes.shape[0], times.shape[-2]))
+    for k in range(times.shape[-1]):
+        t_agg += mixes[:, k, np.newaxis] * times[..., k]
+    return capacity_from_t_agg(t_agg, num_resources)
+
+
+def capacity_from_t_agg(t_agg, num_resources):
+    """Capacities and bottleneck from (M, R) aggregate times; see calculate_capacity_batch for the result"""
+    num_resources = np.asarray(num_resources, dtype=float)
+
+    # C_eff = 60 / T_agg, infinite for resources the mix never visits
+    capacity_per_hour = np.full_like(t_agg, np.inf)
+    np.divide(60, t_agg, out=capacity_per_hour, where=t_agg > 0)
+    pool_capacity = capacity_per_hour * num_resources
+
+    # argmin keeps the first resource on ties, like min() over the dict
+    bottleneck = np.argmin(pool_capacity, axis=1)
+    system_capacity = pool_capacity[np.arange(pool_capacity.shape[0]), bottleneck]
+
+    return {
+        "t_agg": t_agg,
+        "capacity_per_hour": capacity_per_hour,
+        "pool_capacity": pool_capacity,
+        "bottleneck": bottleneck,
+        "system_capacity": system_capacity,
+    }
+
+
+def calculate_capacity(p1, p2, p3, resources_config):
+    """Calculate capacity metrics for each resource using product aggregation method"""
+    resource_names, times, num_resources = config_to_matrix(resources_config)
+    batch = calculate_capacity_batch([[p1, p2, p3]], times, num_resources)
+
+    results = {}
+    for i, resource_name in enumerate(resource_names):
+        resource_info = resources_config[resource_name]
+        results[resource_name] = {
+            "t1": resource_info["Type 1"],
+            "t2": resource_info["Type 2"],
+            "t3": resource_info["Type 3"],
+            "t_agg": float(batch["t_agg"][0, i]),
+            "capacity_per_hour": float(batch["capacity_per_hour"][0, i]),
+            "num_resources": resource_info["num_resources"],
+            "pool_capacity": float(batch["pool_capacity"][0, i]),
+            "description": resource_info["description"]
+        }
+
+    return results
+
+
+def find_bottleneck(results):
+    """Return the (resource_name, data) pair with the lowest pool capacity"""
+    return min(results.items(), key=lambda x: x[1]['pool_capacity'])
+
+
+def calculate_utilization(results, demand):
+    """Utilization of every resource pool that does work, at the given demand (applicants/hr)"""
+    utilization_data = []
+    for resource_name, data in results.items():
+        if data['pool_capacity'] != float('inf') and data['pool_capacity'] > 0:
+            util = (demand / data['pool_capacity']) * 100
+            utilization_data.append({
+                "Resource": resource_name,
+                "Pool Capacity": data['pool_capacity'],
+                "Demand": demand,
+                "Utilization %": util
+            })
+    return utilization_data
+
+
+def _finite_or_none(values):
+    """JSON has no infinity, so unbounded capacities are written as null"""
+    return [v if v != float('inf') else None for v in values]
+
+
+def scenario_reports(batch, mixes, demand, resource_names, units):
+    """dmv_cli.analyze_scenario-style dicts (without the name) for a calculate_capacity_batch result"""
+    pool = batch["pool_capacity"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        utilization = np.where(np.isfinite(pool) & (pool > 0), demand[:, np.newaxis] / pool * 100, np.nan)
+    system_capacity = batch["system_capacity"]
+    rows = zip(
+        mixes.tolist(), demand.tolist(), _finite_or_none(system_capacity.tolist()),
+        batch["bottleneck"].tolist(), (demand <= system_capacity).tolist(), batch["t_agg"].tolist(),
+        batch["capacity_per_hour"].tolist(), pool.tolist(), utilization.tolist()
+    )
+    units = [int(u) if u.is_integer() else u for u in units.tolist()]
+    reports = []
+    for mix, d, capacity, bottleneck, feasible, t_agg, per_hour, pool_row, util_row in rows:
+        reports.append({
+            "mix": {"p1": mix[0], "p2": mix[1], "p3": mix[2]},
+            "demand": d,
+            "system_capacity": capacity,
+            "bottleneck": resource_names[bottleneck],
+            "feasible": feasible,
+            "resources": {
+                name: {
+                    "num_resources": units[r],
+                    "t_agg": t_agg[r],
+                    "capacity_per_hour": per_hour[r] if per_hour[r] != float('inf') else None,
+                    "pool_capacity": pool_row[r] if pool_row[r] != float('inf') else None,
+                    "utilization_pct": None if math.isnan(util_row[r]) else util_row[r],
+                }
+                for r, name in enumerate(resource_names)
+            },
+        })
+    return reports
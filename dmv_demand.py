@@ -0,0 +1,113 @@
+"""Time-of-day demand profiles with interval-by-interval feasibility.
+
+Instead of one constant demand, arrivals are given per interval (hourly or
+finer). Each interval can serve at most system capacity x interval length
+applicants; anything beyond that is carried into the next interval as
+backlog. The carried backlog follows the Lindley recursion
+
+    b_i = max(0, b_{i-1} + arrivals_i - capacity_i)
+
+which DemandProfile evaluates in vectorized form and recomputes only from the
+first interval that changed. Only NumPy is needed.
+"""
+import numpy as np
+
+# Arrivals per hour from 8:00 to 16:00: a peak at opening and another at lunch
+DEFAULT_HOURLY_PROFILE = [60, 45, 35, 40, 60, 55, 35, 30]
+
+
+def lindley_backlog(net_inflow, initial_backlog=0.0, axis=0):
+    """Backlog after every interval given per-interval arrivals minus capacity.
+
+    Closed form of b_i = max(0, b_{i-1} + d_i): with S the running sum of d,
+    b_i = S_i - min(-b_0, min_{j<=i} S_j). For arrays the intervals run along
+    `axis` and every other position is an independent queue.
+    """
+    running = np.cumsum(net_inflow, axis=axis)
+    return running - np.minimum(np.minimum.accumulate(running, axis=axis), -np.asarray(initial_backlog))
+
+
+class DemandProfile:
+    """Arrival rates per interval and the backlog they build against capacity.
+
+    arrival_rates are applicants per hour in each interval; capacity is the
+    system capacity per hour, either one value or one per interval (e.g. when
+    staffing changes over the day). Edits through set_rate / set_capacity
+    mark the profile dirty from that interval on, and evaluate() only
+    recomputes the intervals from the earliest edit onward.
+    """
+
+    def __init__(self, arrival_rates, capacity, interval_minutes=60, start_hour=8.0, initial_backlog=0.0):
+        self.arrival_rates = np.array(arrival_rates, dtype=float)
+        n = len(self.arrival_rates)
+        self.capacity = np.broadcast_to(np.asarray(capacity, dtype=float), (n,)).copy()
+        self.interval_minutes = interval_minutes
+        self.start_hour = start_hour
+        self.initial_backlog = float(initial_backlog)
+        self.backlog = np.zeros(n)
+        self.recomputed = 0
+        self._dirty_from = 0
+
+    def __len__(self):
+        return len(self.arrival_rates)
+
+    def set_rate(self, index, rate):
+        if self.arrival_rates[index] != rate:
+            self.arrival_rates[index] = rate
+            self._dirty_from = min(self._dirty_from, index)
+
+    def set_rates(self, rates):
+        """Replace all rates, marking dirty only from the first one that actually differs"""
+        rates = np.asarray(rates, dtype=float)
+        changed = np.flatnonzero(rates != self.arrival_rates)
+        if len(changed):
+            self.arrival_rates[:] = rates
+            self._dirty_from = min(self._dirty_from, int(changed[0]))
+
+    def set_capacity(self, index, capacity):
+        if self.capacity[index] != capacity:
+            self.capacity[index] = capacity
+            self._dirty_from = min(self._dirty_from, index)
+
+    def interval_starts(self):
+        """Start time of every interval as 'HH:MM' labels"""
+        minutes = self.start_hour * 60 + self.interval_minutes * np.arange(len(self))
+        return [f"{int(m // 60):02d}:{int(m % 60):02d}" for m in minutes]
+
+    def evaluate(self):
+        """Per-interval arrivals, capacity, served, backlog and utilization, plus the end-of-day queue.
+
+        Counts are applicants per interval. "utilization" is arrivals over
+        capacity in the interval itself, "load" also includes the backlog
+        carried in from earlier intervals.
+        """
+        hours = self.interval_minutes / 60
+        arrivals = self.arrival_rates * hours
+        capacity = self.capacity * hours
+
+        start = self._dirty_from
+        if start < len(self):
+            carried_in = self.initial_backlog if start == 0 else self.backlog[start - 1]
+            self.backlog[start:] = lindley_backlog(arrivals[start:] - capacity[start:], carried_in)
+            self.recomputed = len(self) - start
+            self._dirty_from = len(self)
+        else:
+            self.recomputed = 0
+
+        carried = np.concatenate([[self.initial_backlog], self.backlog[:-1]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            utilization = np.where(capacity > 0, arrivals / capacity, np.inf)
+            load = np.where(capacity > 0, (arrivals + carried) / capacity, np.inf)
+
+        return {
+            "start": self.interval_starts(),
+            "arrivals": arrivals,
+            "capacity": capacity,
+            "carried_in": carried,
+            "served": arrivals + carried - self.backlog,
+            "backlog": self.backlog.copy(),
+            "utilization": utilization,
+            "load": load,
+            "end_of_day_queue": float(self.backlog[-1]) if len(self) else self.initial_backlog,
+            "total_arrivals": float(arrivals.sum()),
+        }
@@ -0,0 +1,328 @@
+"""Fit the product mix, process times and hourly arrivals from station visit logs.
+
+A visit log has one record per station visit with the columns "type"
+(e.g. "Type 2"), "station" (a resource name), "check_in" and "check_out"
+(ISO timestamps or epoch seconds), as CSV with a header row or as JSONL.
+Every applicant visits the entry station (by default the first resource,
+Review Clerks) exactly once, so records there count applicants: they give
+the mix shares and the arrivals per hour of day.
+
+Logs are read in chunks of lines and folded into running statistics (visit
+count, mean and variance per type and station, merged with Chan's parallel
+update), so memory does not grow with the number of records. The estimator
+state, including how far each file has been read, can be saved as JSON; a
+later run picks up only the new files and the lines appended since.
+
+Usage:
+    python dmv_estimate.py logs/*.csv --state fit_state.json --out fitted.json
+
+fitted.json holds "resources", "mix" and "demand" and can be passed to
+dmv_cli.py like any scenario file.
+"""
+import argparse
+import copy
+import csv
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from dmv_core import APPLICANT_TYPES, DEFAULT_RESOURCES_CONFIG
+
+REQUIRED_FIELDS = ("type", "station", "check_in", "check_out")
+
+# Average visits per applicant from which a station counts as visited more than once
+REPEAT_VISIT_THRESHOLD = 1.5
+
+
+def parse_timestamps(values):
+    """Seconds since the epoch for ISO timestamps or epoch numbers (naive, i.e. local office time)"""
+    values = np.asarray(values)
+    try:
+        return values.astype(float)
+    except ValueError:
+        stamps = np.array([v[:-1] if v.endswith("Z") else v for v in values], dtype="datetime64[s]")
+        return np.where(np.isnat(stamps), np.nan, stamps.astype("int64").astype(float))
+
+
+class VisitLogEstimator:
+    """Single-pass estimates of mix, per-type per-station times and hourly arrival rates"""
+
+    def __init__(self, entry_station=None, base_config=DEFAULT_RESOURCES_CONFIG):
+        self.base_config = base_config
+        self.entry_station = entry_station or next(iter(base_config))
+        self.types = list(APPLICANT_TYPES)
+        self.stations = list(base_config)
+        shape = (len(self.types), len(self.stations))
+        self.count = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.applicants = np.zeros(len(self.types))
+        self.hourly_arrivals = np.zeros(24)
+        self.days = set()
+        self.skipped = 0
+        self.files = {}
+
+    # ------------------------------------------------------------------
+    # Folding in records
+    # ------------------------------------------------------------------
+    def _indices(self, names, labels):
+        """Index of every label in `names`, appending labels seen for the first time"""
+        unique, inverse = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        lookup = []
+        for label in unique:
+            if label not in names:
+                names.append(label)
+            lookup.append(names.index(label))
+        return np.array(lookup, dtype=int)[inverse]
+
+    def _grow(self):
+        shape = (len(self.types), len(self.stations))
+        if self.count.shape != shape:
+            pad = [(0, shape[0] - self.count.shape[0]), (0, shape[1] - self.count.shape[1])]
+            self.count, self.mean, self.m2 = (np.pad(a, pad) for a in (self.count, self.mean, self.m2))
+            self.applicants = np.pad(self.applicants, (0, shape[0] - len(self.applicants)))
+
+    def update(self, types, stations, check_in, check_out):
+        """Fold one chunk of visit records (equal-length sequences) into the running estimates"""
+        if len(types) == 0:
+            return
+        start, end = parse_timestamps(check_in), parse_timestamps(check_out)
+        minutes = (end - start) / 60
+        valid = np.isfinite(minutes) & (minutes >= 0)
+        self.skipped += int((~valid).sum())
+        if not valid.any():
+            return
+        t = self._indices(self.types, np.asarray(types)[valid])
+        s = self._indices(self.stations, np.asarray(stations)[valid])
+        self._grow()
+        minutes, start = minutes[valid], start[valid]
+
+        # Chunk statistics per (type, station) cell, then Chan's merge with the running ones
+        n_cells = self.count.size
+        cell = t * len(self.stations) + s
+        n = np.bincount(cell, minlength=n_cells).astype(float)
+        total = np.bincount(cell, weights=minutes, minlength=n_cells)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            chunk_mean = np.where(n > 0, total / n, 0)
+        chunk_m2 = np.bincount(cell, weights=(minutes - chunk_mean[cell]) ** 2, minlength=n_cells)
+
+        count, mean, m2 = self.count.ravel(), self.mean.ravel(), self.m2.ravel()
+        merged = count + n
+        seen = n > 0
+        delta = chunk_mean[seen] - mean[seen]
+        mean[seen] += delta * n[seen] / merged[seen]
+        m2[seen] += chunk_m2[seen] + delta ** 2 * count[seen] * n[seen] / merged[seen]
+        count[:] = merged
+
+        # Applicants and arrival hours from the entry station
+        entry = s == self.stations.index(self.entry_station) if self.entry_station in self.stations else np.zeros(len(s), bool)
+        self.applicants += np.bincount(t[entry], minlength=len(self.types))
+        seconds = start[entry]
+        self.hourly_arrivals += np.bincount((seconds // 3600 % 24).astype(int), minlength=24)
+        self.days.update(np.unique(seconds // 86400).astype(int).tolist())
+
+    def _read_chunks(self, path, chunk_size):
+        """Yield (records, end offset, header) for complete lines from the stored offset on"""
+        key = str(Path(path).resolve())
+        progress = self.files.get(key, {"offset": 0, "header": None})
+        if os.path.getsize(path) < progress["offset"]:
+            raise ValueError(f"{path} is shorter than when it was last read; it was truncated or replaced")
+        is_jsonl = Path(path).suffix.lower() in (".jsonl", ".ndjson")
+
+        with open(path, "rb") as f:
+            f.seek(progress["offset"])
+            offset = progress["offset"]
+            lines = []
+            for raw in f:
+                # A line without its newline is still being written; leave it for the next run
+                if not raw.endswith(b"\n"):
+                    break
+                offset += len(raw)
+                line = raw.decode("utf-8-sig" if offset == len(raw) else "utf-8").rstrip("\r\n")
+                if not line.strip():
+                    continue
+                if not is_jsonl and progress["header"] is None:
+                    progress["header"] = next(csv.reader([line]))
+                    continue
+                lines.append(line)
+                if len(lines) == chunk_size:
+                    yield self._parse_lines(lines, is_jsonl, progress["header"], path), offset, progress["header"]
+                    lines = []
+            yield self._parse_lines(lines, is_jsonl, progress["header"], path), offset, progress["header"]
+
+    def _parse_lines(self, lines, is_jsonl, header, path):
+        if not lines:
+            return {field: [] for field in REQUIRED_FIELDS}
+        if is_jsonl:
+            rows = [json.loads(line) for line in lines]
+            return {field: [row.get(field) for row in rows] for field in REQUIRED_FIELDS}
+        missing = [field for field in REQUIRED_FIELDS if field not in (header or [])]
+        if missing:
+            raise ValueError(f"{path} is missing column(s) {missing}")
+        columns = [header.index(field) for field in REQUIRED_FIELDS]
+        rows = list(csv.reader(io.StringIO("\n".join(lines))))
+        return {field: [row[i] if i < len(row) else "" for row in rows] for field, i in zip(REQUIRED_FIELDS, columns)}
+
+    def ingest(self, path, chunk_size=100_000, checkpoint=None):
+        """Stream one CSV or JSONL log from where the previous run stopped; returns the number of records read.
+
+        With a checkpoint path the state is saved after every chunk, so an
+        interrupted run resumes without counting any record twice.
+        """
+        read = 0
+        for records, offset, header in self._read_chunks(path, chunk_size):
+            try:
+                self.update(records["type"], records["station"], records["check_in"], records["check_out"])
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"{path}: {exc}") from exc
+            read += len(records["type"])
+            self.files[str(Path(path).resolve())] = {"offset": offset, "header": header}
+            if checkpoint:
+                self.save(checkpoint)
+        return read
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+    def estimates(self):
+        """Mix shares, per-(type, station) visit statistics and hourly arrival rates"""
+        total = self.applicants.sum()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variance = np.where(self.count > 1, self.m2 / (self.count - 1), 0.0)
+            visits_per_applicant = np.where(self.applicants[:, np.newaxis] > 0, self.count / self.applicants[:, np.newaxis], 0.0)
+        n_days = max(len(self.days), 1)
+        return {
+            "applicants": int(total),
+            "days": len(self.days),
+            "mix": {t: float(self.applicants[k] / total) if total else 0.0 for k, t in enumerate(self.types)},
+            "visits": {
+                (t, s): {
+                    "count": int(self.count[k, i]),
+                    "mean": float(self.mean[k, i]),
+                    "variance": float(variance[k, i]),
+                    "per_applicant": float(visits_per_applicant[k, i]),
+                }
+                for k, t in enumerate(self.types) for i, s in enumerate(self.stations) if self.count[k, i]
+            },
+            "hourly_arrivals": self.hourly_arrivals / n_days,
+            "skipped_records": self.skipped,
+        }
+
+    def to_resources_config(self):
+        """The base config with process times (total minutes per applicant) and repeat visits from the logs.
+
+        Unit counts and descriptions are kept from the base config; stations
+        that are not in it get one unit.
+        """
+        config = copy.deepcopy(self.base_config)
+        for i, station in enumerate(self.stations):
+            info = config.setdefault(station, {"num_resources": 1, "description": ""})
+            info.pop("visits", None)
+            for k, applicant_type in enumerate(self.types):
+                if applicant_type not in APPLICANT_TYPES:
+                    continue
+                applicants = self.applicants[k]
+                per_applicant = self.count[k, i] / applicants if applicants else 0.0
+                info[applicant_type] = round(float(per_applicant * self.mean[k, i]), 4)
+                if per_applicant >= REPEAT_VISIT_THRESHOLD:
+                    info.setdefault("visits", {})[applicant_type] = int(round(per_applicant))
+        return config
+
+    def fitted_scenario(self):
+        """{"resources", "mix", "demand"} in the dmv_core.load_config format"""
+        shares = np.array([self.estimates()["mix"].get(t, 0.0) for t in APPLICANT_TYPES])
+        open_hours = np.count_nonzero(self.hourly_arrivals)
+        demand = self.hourly_arrivals.sum() / max(len(self.days), 1) / max(open_hours, 1)
+        return {
+            "resources": self.to_resources_config(),
+            "mix": (shares / shares.sum()).tolist() if shares.sum() else list(shares),
+            "demand": round(float(demand), 3),
+        }
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def to_state(self):
+        return {
+            "entry_station": self.entry_station,
+            "base_config": self.base_config,
+            "types": self.types,
+            "stations": self.stations,
+            "count": self.count.tolist(),
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+            "applicants": self.applicants.tolist(),
+            "hourly_arrivals": self.hourly_arrivals.tolist(),
+            "days": sorted(self.days),
+            "skipped": self.skipped,
+            "files": self.files,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        estimator = cls(state["entry_station"], state["base_config"])
+        estimator.types = state["types"]
+        estimator.stations = state["stations"]
+        estimator.count = np.array(state["count"], dtype=float)
+        estimator.mean = np.array(state["mean"], dtype=float)
+        estimator.m2 = np.array(state["m2"], dtype=float)
+        estimator.applicants = np.array(state["applicants"], dtype=float)
+        estimator.hourly_arrivals = np.array(state["hourly_arrivals"], dtype=float)
+        estimator.days = set(state["days"])
+        estimator.skipped = state["skipped"]
+        estimator.files = state["files"]
+        return estimator
+
+    def save(self, path):
+        """Write the state as JSON through a temporary file, so a crash never leaves a half-written state"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_state(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_state(json.load(f))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit product mix and process times from DMV visit logs")
+    parser.add_argument("logs", nargs="+", help="CSV or JSONL visit logs (type, station, check_in, check_out)")
+    parser.add_argument("--state", help="estimator state file; resumes from it and is updated after every chunk")
+    parser.add_argument("--entry-station", help="station every applicant visits once (default: first resource)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="records folded in per chunk")
+    parser.add_argument("--out", help="write the fitted scenario JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.state and os.path.exists(args.state):
+        estimator = VisitLogEstimator.load(args.state)
+    else:
+        estimator = VisitLogEstimator(args.entry_station)
+
+    try:
+        for path in args.logs:
+            read = estimator.ingest(path, args.chunk_size, checkpoint=args.state)
+            print(f"{path}: {read} new records", file=sys.stderr)
+    except (OSError, ValueError, KeyError) as exc:
+        parser.error(str(exc))
+
+    if estimator.skipped:
+        print(f"warning: {estimator.skipped} records with missing or negative durations skipped", file=sys.stderr)
+
+    scenario = estimator.fitted_scenario()
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(scenario, f, indent=2)
+    else:
+        json.dump(scenario, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
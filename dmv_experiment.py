@@ -0,0 +1,153 @@
+"""Simulation experiments comparing alternative resource configurations.
+
+"Add one eye exam clerk" versus "add one photo machine" is a question about
+the difference between two simulated configurations, and that difference
+is much less noisy when both see the same day. compare_configs therefore
+runs every variant of a replication from the same seed (common random
+numbers: identical arrivals, applicant types and service draws, see
+dmv_sim.simulate_day), and optionally averages each replication over an
+antithetic pair of days (uniforms U and 1 - U, see
+dmv_sim.InverseTransformSampler). With a target half-width it runs
+replications in batches and stops as soon as every confidence interval of
+interest is narrow enough, instead of guessing a replication count up
+front. Like dmv_sim, this module only needs NumPy.
+"""
+import math
+
+import numpy as np
+
+from dmv_sim import (InverseTransformSampler, confidence_interval, make_process_pool, replication_metrics,
+                     simulate_day, summarize_simulation)
+
+# The stopping rule never looks at fewer replications than this: with only a
+# handful, the sample standard deviation itself is too noisy to trust
+MIN_SEQUENTIAL_REPLICATIONS = 10
+
+
+def _simulate_metrics(resources_config, mix, demand, seed_sequence, antithetic, sim_kwargs):
+    """Metrics of one replication; with antithetic=True the average over a mirrored pair of days"""
+    if not antithetic:
+        return replication_metrics(summarize_simulation(simulate_day(
+            resources_config, mix, demand, seed=np.random.default_rng(seed_sequence), **sim_kwargs
+        )))
+    pair = [
+        replication_metrics(summarize_simulation(simulate_day(
+            resources_config, mix, demand,
+            seed=InverseTransformSampler(np.random.default_rng(seed_sequence), mirrored=mirrored), **sim_kwargs
+        )))
+        for mirrored in (False, True)
+    ]
+    return {name: (pair[0][name] + pair[1][name]) / 2 for name in pair[0]}
+
+
+def _run_experiment_chunk(variants, mix, demand, seeds, common_random_numbers, antithetic, sim_kwargs):
+    """Worker entry point: one {variant: metrics} row per seed"""
+    rows = []
+    for seed in seeds:
+        row = {}
+        for v, (name, resources_config) in enumerate(variants.items()):
+            # Without common random numbers every variant gets its own stream under this replication's seed
+            stream = seed if common_random_numbers else np.random.SeedSequence(
+                seed.entropy, spawn_key=seed.spawn_key + (v,)
+            )
+            row[name] = _simulate_metrics(resources_config, mix, demand, stream, antithetic, sim_kwargs)
+        rows.append(row)
+    return rows
+
+
+def _next_batch(n, half_width, target, batch_size, max_replications):
+    """Replications to add: the projected shortfall from half-width ~ 1/sqrt(n), at least batch_size, at most n"""
+    projected = math.ceil(n * ((half_width / target) ** 2 - 1)) if math.isfinite(half_width) else batch_size
+    return min(max(projected, batch_size), max(n, batch_size), max_replications - n)
+
+
+def compare_configs(variants, mix, demand, metric="mean_time_in_system", baseline=None,
+                    common_random_numbers=True, antithetic=False, target_half_width=None,
+                    min_replications=10, max_replications=1000, batch_size=10, seed=None,
+                    executor=None, max_workers=None, confidence=0.95, **sim_kwargs):
+    """Simulate several resources_config variants and compare `metric` against a baseline.
+
+    variants maps names to resources configs; baseline defaults to the first.
+    metric is any key of dmv_sim.replication_metrics, e.g. "mean_time_in_system"
+    or "Eye Exam Clerks/mean_wait". One replication is one simulated day per
+    variant (two with antithetic=True, averaged into one observation).
+
+    Without target_half_width exactly max_replications are run. With it,
+    min_replications are run first (never fewer than
+    MIN_SEQUENTIAL_REPLICATIONS unless max_replications is smaller) and more
+    are added in batches until the confidence half-width of every difference
+    to the baseline (or of the metric itself when there is only one variant)
+    is at most target_half_width, or max_replications is reached. Extra
+    keyword arguments go to simulate_day; the executor is used as in
+    run_replications.
+
+    Returns {"baseline", "replications", "simulated_days", "converged",
+    "metrics": {variant: {name: per-replication array}},
+    "summary": {variant: {name: confidence_interval(...)}},
+    "differences": {variant: confidence_interval of variant - baseline, per replication}}.
+    """
+    names = list(variants)
+    if not names:
+        raise ValueError("Need at least one resources_config variant")
+    baseline = names[0] if baseline is None else baseline
+    if baseline not in variants:
+        raise ValueError(f"Baseline {baseline!r} is not one of the variants")
+    if target_half_width is not None and target_half_width <= 0:
+        raise ValueError("target_half_width must be positive")
+    min_replications = max(2, min(max(min_replications, MIN_SEQUENTIAL_REPLICATIONS), max_replications))
+
+    root = np.random.SeedSequence(seed)
+    own_executor = executor is None
+    if own_executor:
+        executor = make_process_pool(max_workers)
+    workers = getattr(executor, "_max_workers", None) or 1
+
+    def run(n):
+        seeds = root.spawn(n)
+        chunk_size = max(1, math.ceil(n / workers))
+        futures = [executor.submit(_run_experiment_chunk, variants, mix, demand, seeds[i:i + chunk_size],
+                                   common_random_numbers, antithetic, sim_kwargs)
+                   for i in range(0, n, chunk_size)]
+        return [row for future in futures for row in future.result()]
+
+    def watched_intervals(rows):
+        """Confidence intervals that the stopping rule looks at"""
+        values = {name: np.array([row[name][metric] for row in rows]) for name in names}
+        if len(names) == 1:
+            return {baseline: confidence_interval(values[baseline], confidence)}
+        return {name: confidence_interval(values[name] - values[baseline], confidence)
+                for name in names if name != baseline}
+
+    try:
+        rows = run(max_replications if target_half_width is None else min_replications)
+        converged = None
+        while target_half_width is not None:
+            widest = max(ci["half_width"] for ci in watched_intervals(rows).values())
+            converged = widest <= target_half_width
+            if converged or len(rows) >= max_replications:
+                break
+            rows += run(_next_batch(len(rows), widest, target_half_width, batch_size, max_replications))
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    metrics = {name: {key: np.array([row[name][key] for row in rows]) for key in rows[0][name]} for name in names}
+    return {
+        "baseline": baseline,
+        "metric": metric,
+        "replications": len(rows),
+        "simulated_days": len(rows) * len(names) * (2 if antithetic else 1),
+        "converged": converged,
+        "metrics": metrics,
+        "summary": {name: {key: confidence_interval(values, confidence) for key, values in metrics[name].items()}
+                    for name in names},
+        "differences": {name: confidence_interval(metrics[name][metric] - metrics[baseline][metric], confidence)
+                        for name in names if name != baseline},
+    }
+
+
+def sequential_replications(resources_config, mix, demand, metric="mean_time_in_system", target_half_width=0.5,
+                            **kwargs):
+    """Replicate one configuration until the confidence half-width of `metric` reaches the target"""
+    return compare_configs({"config": resources_config}, mix, demand, metric=metric,
+                           target_half_width=target_half_width, **kwargs)
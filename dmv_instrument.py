@@ -0,0 +1,153 @@
+"""Opt-in timing and profiling of app reruns.
+
+The app creates one RunRecorder per rerun and wraps each stage (config load,
+compute, table building, figure building, rendering) in recorder.stage(name).
+When the recorder is disabled, stage() hands back a shared no-op context
+manager, so the instrumented hot path costs one method call per stage.
+
+Enabled recorders keep (stage, seconds) pairs for the debug panel and emit
+them as one structured JSON log line per rerun on the "dmv.perf" logger. A
+profiler hook (cProfile by default, any object with start()/stop() -> str via
+register_profiler) can be attached to a single rerun. No UI dependencies.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import uuid
+
+logger = logging.getLogger("dmv.perf")
+
+# Environment variable that turns instrumentation on for every session
+DEBUG_ENV_VAR = "DMV_DEBUG"
+
+
+def debug_enabled_from_env():
+    return os.environ.get(DEBUG_ENV_VAR, "") not in ("", "0", "false", "False")
+
+
+class _NullStage:
+    """Context manager that does nothing; shared by every disabled recorder"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.append((self.name, time.perf_counter() - self.start))
+        return False
+
+
+class RunRecorder:
+    """Stage timings for one rerun"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.run_id = uuid.uuid4().hex[:12] if enabled else None
+        self.timings = []
+        self._started = time.perf_counter()
+
+    def stage(self, name):
+        """Context manager timing the enclosed block under `name` (no-op when disabled)"""
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self.timings, name)
+
+    def elapsed(self):
+        """Wall time since the recorder was created, in seconds"""
+        return time.perf_counter() - self._started
+
+    def as_rows(self):
+        """Timings as table rows in milliseconds, in the order the stages ran"""
+        return [{"Stage": name, "ms": seconds * 1000} for name, seconds in self.timings]
+
+    def log(self, **context):
+        """Write all timings as one structured JSON line on the dmv.perf logger"""
+        if not self.enabled:
+            return
+        logger.info(json.dumps({
+            "event": "rerun_timings",
+            "run_id": self.run_id,
+            "total_ms": round(self.elapsed() * 1000, 3),
+            "stages": [{"stage": name, "ms": round(seconds * 1000, 3)} for name, seconds in self.timings],
+            **context,
+        }, default=str))
+
+
+# ============================================================================
+# PROFILER HOOKS
+# ============================================================================
+class CProfileHook:
+    """Deterministic profile of one rerun, reported as the top entries by cumulative time"""
+
+    def __init__(self, top=40):
+        self.top = top
+        self._profile = None
+
+    def start(self):
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+        return out.getvalue()
+
+
+class PyinstrumentHook:
+    """Sampling profile of one rerun; needs the optional pyinstrument package"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self._profiler = None
+
+    def start(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError as exc:
+            raise ImportError("The pyinstrument profiler hook needs `pip install pyinstrument`") from exc
+        self._profiler = Profiler(interval=self.interval)
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+        return self._profiler.output_text(unicode=True, color=False)
+
+
+PROFILERS = {
+    "cprofile": CProfileHook,
+    "pyinstrument": PyinstrumentHook,
+}
+
+
+def register_profiler(name, factory):
+    """Make a profiler available by name; factory() must return an object with start() and stop() -> str"""
+    PROFILERS[name] = factory
+
+
+def make_profiler(name="cprofile"):
+    if name not in PROFILERS:
+        raise ValueError(f"Unknown profiler '{name}', expected one of {sorted(PROFILERS)}")
+    return PROFILERS[name]()
@@ -0,0 +1,277 @@
+"""Concurrent-session load test of dmv_app.py, entirely in-process and offline.
+
+Each simulated session is one Streamlit AppTest (its own session state and
+widget tree) driven by its own thread, as a supervisor would: moving the
+product mix sliders, changing the demand input on the Visualizations tab
+and now and then pressing Reset. Sessions share the process, so they share
+st.cache_resource objects (scenario cache, capacity surface, store) exactly
+like sessions on one server do.
+
+AppTest swaps process-wide state (the Runtime singleton, config options)
+for the length of a run, so runs of different sessions cannot overlap: a
+session waits for the run lock, as reruns on a one-process server wait for
+the GIL. Rerun latency is measured from the user's action to the finished
+rerun, so it includes that wait; "run_ms" is the script run alone.
+
+For every session count in --sessions the harness starts that many
+sessions, lets each perform --actions reruns, and reports rerun latency
+percentiles, throughput (reruns per second of wall time) and resident
+memory: the process RSS is sampled in the background, and the peak above
+the RSS before the sessions started, divided by the session count, is the
+memory per session. Every level runs in a fresh Python process (after one
+warm-up session there), so memory freed by an earlier level cannot be
+reused and hide a later level's cost. Because of the run lock, p95
+latency grows with the session count by queueing, by design. Needs Linux
+(/proc) for RSS.
+
+Usage:
+    python dmv_load.py --sessions 1 4 16 32 --actions 20 --out load.json
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+APP_PATH = Path(__file__).with_name("dmv_app.py")
+VISUALIZATIONS_TAB = "📈 Visualizations"
+
+# Relative frequency of user actions
+ACTION_WEIGHTS = {"mix": 6, "demand": 3, "reset": 1}
+
+RSS_SAMPLE_SECONDS = 0.02
+
+# Held for every AppTest run, see the module docstring
+RUN_LOCK = threading.Lock()
+
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class RSSSampler:
+    """Background thread recording the highest RSS seen while it runs"""
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return False
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+class Session:
+    """One simulated user: an AppTest plus the actions that user takes"""
+
+    def __init__(self, seed, visualizations):
+        from streamlit.testing.v1 import AppTest
+
+        self.rng = random.Random(seed)
+        # Half of the users work on the Visualizations tab, where the demand input lives
+        self.tab = VISUALIZATIONS_TAB if visualizations else None
+        self.app_test = AppTest.from_file(str(APP_PATH), default_timeout=300)
+        self.timings = []   # (action, seconds from action to finished rerun, seconds running)
+        self.errors = []
+
+    def _run(self, action):
+        if self.tab is not None:
+            # AppTest does not keep the selected tab across widget changes
+            self.app_test.session_state["main_tabs"] = self.tab
+        requested = time.perf_counter()
+        with RUN_LOCK:
+            start = time.perf_counter()
+            self.app_test.run()
+            done = time.perf_counter()
+        self.timings.append((action, done - requested, done - start))
+        if self.app_test.exception:
+            self.errors.append(f"{action}: {self.app_test.exception[0].message}")
+
+    def _sidebar_slider(self, label):
+        # Main-area sliders come first in app_test.slider, so pick the sidebar one by label
+        return next(s for s in self.app_test.sidebar.slider if s.label.startswith(label))
+
+    def start(self):
+        self._run("first_run")
+
+    def act(self):
+        actions = list(ACTION_WEIGHTS)
+        action = self.rng.choices(actions, weights=list(ACTION_WEIGHTS.values()))[0]
+        if action == "demand" and self.tab is None:
+            action = "mix"
+        if action == "mix":
+            p1 = self.rng.randint(40, 95)
+            self._sidebar_slider("Type 1").set_value(p1)
+            self._sidebar_slider("Type 2").set_value(self.rng.randint(0, min(30, 100 - p1)))
+        elif action == "demand":
+            demand_inputs = [w for w in self.app_test.number_input if w.key == "demand"]
+            if not demand_inputs:
+                action = "mix"
+                p2 = self._sidebar_slider("Type 2").value
+                self._sidebar_slider("Type 1").set_value(self.rng.randint(40, min(95, 100 - p2)))
+            else:
+                demand_inputs[0].set_value(self.rng.randrange(5, 105, 5))
+        else:
+            next(b for b in self.app_test.button if "Reset" in b.label).click()
+        self._run(action)
+
+    def drive(self, n_actions, think_time=0.0):
+        try:
+            for _ in range(n_actions):
+                if think_time > 0:
+                    time.sleep(self.rng.expovariate(1 / think_time))
+                self.act()
+        except Exception as exc:  # a crashed session is reported, not fatal to the run
+            self.errors.append(f"{type(exc).__name__}: {exc}")
+
+
+def run_level(n_sessions, n_actions, seed=0, think_time=0.0):
+    """Start n_sessions sessions, drive them concurrently, and return the level's statistics
+
+    Between actions a session pauses for an exponential think time with the
+    given mean (seconds); with 0 every session reruns back to back.
+    """
+    gc.collect()
+    rss_before = current_rss()
+    with RSSSampler() as sampler:
+        sessions = [Session(seed + i, visualizations=i % 2 == 1) for i in range(n_sessions)]
+        # Sessions open one after another, as people arrive; only their later reruns overlap
+        for session in sessions:
+            session.start()
+        threads = [threading.Thread(target=session.drive, args=(n_actions, think_time)) for session in sessions]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+    timings = [timing for session in sessions for timing in session.timings]
+    reruns = [timing for timing in timings if timing[0] != "first_run"]
+    latencies = [latency for _, latency, _ in reruns]
+    run_times = [run for _, _, run in reruns]
+    first_runs = [run for action, _, run in timings if action == "first_run"]
+    by_action = {}
+    for action, latency, _ in reruns:
+        by_action.setdefault(action, []).append(latency)
+    errors = [error for session in sessions for error in session.errors]
+
+    result = {
+        "sessions": n_sessions,
+        "reruns": len(reruns),
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "wall_seconds": wall,
+        "throughput_per_second": len(reruns) / wall if wall > 0 else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000 if latencies else None,
+            "p95": percentile(latencies, 95) * 1000 if latencies else None,
+            "max": max(latencies) * 1000 if latencies else None,
+            "mean": statistics.fmean(latencies) * 1000 if latencies else None,
+        },
+        "run_ms": {
+            "p50": percentile(run_times, 50) * 1000 if run_times else None,
+            "p95": percentile(run_times, 95) * 1000 if run_times else None,
+        },
+        "latency_p50_ms_by_action": {action: percentile(values, 50) * 1000 for action, values in by_action.items()},
+        "first_run_p50_ms": percentile(first_runs, 50) * 1000 if first_runs else None,
+        "rss_before_mb": rss_before / 2 ** 20,
+        "rss_peak_mb": sampler.peak / 2 ** 20,
+        "rss_per_session_mb": (sampler.peak - rss_before) / n_sessions / 2 ** 20,
+    }
+    del sessions, threads
+    gc.collect()
+    return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Drive many concurrent in-process sessions through dmv_app.py")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Session counts to test, in order (default: 1 2 4 8 16)")
+    parser.add_argument("--actions", type=int, default=20, help="Reruns per session (default: 20)")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="Mean pause between a session's actions in seconds (default: 0, back to back)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON results here instead of standard output")
+    parser.add_argument("--single-level", type=int, help=argparse.SUPPRESS)
+    return parser
+
+
+def run_level_in_subprocess(n_sessions, n_actions, seed, think_time):
+    """run_level in a fresh interpreter, so earlier levels leave no memory behind to reuse"""
+    command = [sys.executable, str(Path(__file__).resolve()), "--single-level", str(n_sessions),
+               "--actions", str(n_actions), "--seed", str(seed), "--think", str(think_time)]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, check=True, text=True)
+    return json.loads(completed.stdout)
+
+
+def main(argv=None):
+    from dmv_bench import environment
+
+    args = build_parser().parse_args(argv)
+
+    if args.single_level is not None:
+        # Child process of the loop below: warm up, run one level, print it as JSON
+        Session(args.seed, visualizations=True).start()
+        print(json.dumps(run_level(args.single_level, args.actions, args.seed, args.think)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Keep load tests away from the user's cached surfaces and saved scenarios
+        os.environ.setdefault("DMV_SURFACE_DIR", scratch)
+        os.environ.setdefault("DMV_STORE_PATH", str(Path(scratch) / "scenarios.sqlite3"))
+        levels = []
+        print(f"{'sessions':>8s} {'reruns':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'reruns/s':>9s} "
+              f"{'peak RSS MB':>12s} {'MB/session':>11s} {'errors':>7s}", file=sys.stderr)
+        for n_sessions in args.sessions:
+            level = run_level_in_subprocess(n_sessions, args.actions, args.seed, args.think)
+            levels.append(level)
+            latency = level["latency_ms"]
+            print(f"{n_sessions:8d} {level['reruns']:7d} {latency['p50'] or 0:9.1f} {latency['p95'] or 0:9.1f} "
+                  f"{level['throughput_per_second']:9.2f} {level['rss_peak_mb']:12.1f} "
+                  f"{level['rss_per_session_mb']:11.2f} {level['errors']:7d}", file=sys.stderr)
+        print("Reruns of all sessions take turns (one run lock), so p95 latency includes queueing behind "
+              "other sessions and grows with the session count by design", file=sys.stderr)
+
+    text = json.dumps({"environment": environment(), "actions_per_session": args.actions,
+                       "think_seconds": args.think, "levels": levels,
+                       "notes": ["Each level runs in a fresh process after one warm-up session",
+                                 "Runs are serialized by a run lock: latency_ms includes the wait for other "
+                                 "sessions' reruns, run_ms is the script run alone"]},
+                      indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+    return 1 if any(level["errors"] for level in levels) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Day-by-day load with failed applicants returning on later days.
+
+dmv_core folds the Type 2 eye-exam return into the same day (4.0 minutes at
+Eye Exam Clerks). Here each route is split at its first repeated station:
+work up to and including the failed visit happens on the arrival day, the
+rest (the passing eye exam and the photo) on the day the applicant comes
+back. Return delays in operating days follow a given distribution, and a
+returning applicant can fail again with probability `refail` and come back
+once more.
+
+Only aggregated state is carried between days: a ring buffer of expected (or,
+when simulating, counted) returns per future day and type. The analytic mode
+propagates expected counts; the simulated mode draws Poisson arrivals,
+multinomial types and delays and gamma-distributed daily work for many
+independent runs at once. Work beyond a day's capacity carries over as a
+backlog (Lindley recursion, see dmv_demand). A year takes milliseconds.
+Only NumPy is needed.
+"""
+import numpy as np
+
+from dmv_demand import lindley_backlog
+from dmv_sim import DAY_MINUTES, build_routes
+
+# Type 2 applicants come back with an eye report after three days
+DEFAULT_RETURN_DELAY = {3: 1.0}
+
+
+def split_routes(resources_config):
+    """First-day and return-day work per type: (first_work, return_work, first_visits, return_visits), each (K, R).
+
+    Work is in minutes per applicant and visits are visit counts. A type
+    returns if its route visits some station twice; the return starts at the
+    second visit.
+    """
+    n_resources = len(resources_config)
+    routes = build_routes(resources_config)
+    shape = (len(routes), n_resources)
+    first_work, return_work = np.zeros(shape), np.zeros(shape)
+    first_visits, return_visits = np.zeros(shape), np.zeros(shape)
+    for k, (stations, mean_times) in enumerate(routes):
+        split = len(stations)
+        for i, station in enumerate(stations):
+            if station in stations[:i]:
+                split = i
+                break
+        for i, (station, minutes) in enumerate(zip(stations, mean_times)):
+            work, visits = (first_work, first_visits) if i < split else (return_work, return_visits)
+            work[k, station] += minutes
+            visits[k, station] += 1
+    return first_work, return_work, first_visits, return_visits
+
+
+def delay_pmf(return_delay):
+    """Probabilities of returning after 1..L operating days, from {days: probability} or a list indexed by days"""
+    if isinstance(return_delay, dict):
+        pmf = np.zeros(max(return_delay) + 1)
+        for days, p in return_delay.items():
+            pmf[days] = p
+    else:
+        pmf = np.asarray(return_delay, dtype=float)
+    if len(pmf) < 2 or pmf[0] != 0 or (pmf < 0).any() or abs(pmf.sum() - 1) > 1e-9:
+        raise ValueError("Return delays must be at least one day and their probabilities must sum to 1")
+    return pmf / pmf.sum()
+
+
+def demand_schedule(base_demand, n_days, shock=0.0, shock_day=0, shock_days=None):
+    """Daily demand (applicants/hr): base_demand, times (1 + shock) from shock_day for shock_days days (or for good)"""
+    demand = np.full(n_days, float(base_demand))
+    end = n_days if shock_days is None else min(n_days, shock_day + shock_days)
+    demand[shock_day:end] *= 1 + shock
+    return demand
+
+
+def _daily_result(resources_config, new_arrivals, returns, load, hours):
+    """Utilization and carried-over backlog for daily work loads (..., days, R)"""
+    units = np.array([info["num_resources"] for info in resources_config.values()], dtype=float)
+    capacity_minutes = units * hours * 60
+    return {
+        "resource_names": list(resources_config),
+        "new_arrivals": new_arrivals,
+        "returns": returns,
+        "load": load,
+        "utilization": load / capacity_minutes,
+        "backlog": lindley_backlog(load - capacity_minutes, axis=-2),
+    }
+
+
+def analytic_multiday(resources_config, mix, daily_demand, n_days=None, hours=DAY_MINUTES / 60,
+                      return_delay=DEFAULT_RETURN_DELAY, refail=0.0):
+    """Expected daily arrivals, returns, work and utilization.
+
+    daily_demand is applicants per hour, one value or one per day (see
+    demand_schedule). Starts from an empty office (no returns pending), so
+    the first days show the ramp-up. Returns {"resource_names",
+    "new_arrivals" (D,), "returns" (D,), "load" (D, R) minutes of work,
+    "utilization" (D, R), "backlog" (D, R) minutes carried into the next day}.
+    """
+    daily_demand = np.asarray(daily_demand, dtype=float)
+    if n_days is None:
+        n_days = daily_demand.size
+    daily_demand = np.broadcast_to(daily_demand, (n_days,))
+    first_work, return_work, _, _ = split_routes(resources_config)
+    mix = np.asarray(mix, dtype=float)
+    returning = return_work.any(axis=1)
+    pmf = delay_pmf(return_delay)
+
+    new_arrivals = daily_demand * hours
+    failures = np.outer(new_arrivals, mix * returning)
+
+    # Ring buffer of expected returns by day offset and type
+    pending = np.zeros((len(pmf), len(mix)))
+    returns = np.zeros((n_days, len(mix)))
+    for day in range(n_days):
+        slot = day % len(pmf)
+        returns[day] = pending[slot]
+        pending[slot] = 0
+        scheduled = failures[day] + refail * returns[day]
+        for days_ahead in np.flatnonzero(pmf):
+            pending[(day + days_ahead) % len(pmf)] += pmf[days_ahead] * scheduled
+
+    load = new_arrivals[:, np.newaxis] * (mix @ first_work) + returns @ return_work
+    return _daily_result(resources_config, new_arrivals, returns.sum(axis=1), load, hours)
+
+
+def steady_state_load(resources_config, mix, demand, hours=DAY_MINUTES / 60, refail=0.0):
+    """Long-run daily work (minutes) per resource at constant demand; independent of the delay distribution"""
+    first_work, return_work, _, _ = split_routes(resources_config)
+    mix = np.asarray(mix, dtype=float)
+    returning = return_work.any(axis=1)
+    new_arrivals = demand * hours
+    # Every failure returns 1 / (1 - refail) times on average
+    returns = new_arrivals * mix * returning / (1 - refail)
+    return new_arrivals * (mix @ first_work) + returns @ return_work
+
+
+def simulate_multiday(resources_config, mix, daily_demand, n_days=None, hours=DAY_MINUTES / 60,
+                      return_delay=DEFAULT_RETURN_DELAY, refail=0.0, service_cv=1.0, n_runs=1, seed=None):
+    """Stochastic daily loads for n_runs independent runs, simulated together.
+
+    Each day has Poisson arrivals, multinomial applicant types and return
+    delays, binomial repeat failures and, per (type, resource), a gamma
+    total of that day's visit times (the sum of n gamma visits with the given
+    CV). Returns the same keys as analytic_multiday with a leading runs axis.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    daily_demand = np.asarray(daily_demand, dtype=float)
+    if n_days is None:
+        n_days = daily_demand.size
+    daily_demand = np.broadcast_to(daily_demand, (n_days,))
+    first_work, return_work, first_visits, return_visits = split_routes(resources_config)
+    mix = np.asarray(mix, dtype=float) / np.sum(mix)
+    returning = return_work.any(axis=1)
+    pmf = delay_pmf(return_delay)
+    n_types, n_resources = first_work.shape
+
+    # Mean minutes per visit, and the gamma shape of one visit
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first_mean = np.where(first_visits > 0, first_work / first_visits, 0)
+        return_mean = np.where(return_visits > 0, return_work / return_visits, 0)
+    shape = 1 / service_cv ** 2 if service_cv > 0 else None
+
+    def day_work(counts, visits, mean):
+        """(runs, R) total minutes for counts (runs, K) applicants making `visits` visits of `mean` minutes"""
+        n_visits = counts[:, :, np.newaxis] * visits
+        if shape is None:
+            return (n_visits * mean).sum(axis=1)
+        return rng.gamma(n_visits * shape, mean / shape).sum(axis=1)
+
+    pending = np.zeros((n_runs, len(pmf), n_types), dtype=np.int64)
+    new_arrivals = np.zeros((n_runs, n_days), dtype=np.int64)
+    returns = np.zeros((n_runs, n_days), dtype=np.int64)
+    load = np.zeros((n_runs, n_days, n_resources))
+    for day in range(n_days):
+        slot = day % len(pmf)
+        back = pending[:, slot].copy()
+        pending[:, slot] = 0
+
+        arrivals = rng.poisson(daily_demand[day] * hours, size=n_runs)
+        counts = rng.multinomial(arrivals, mix)
+        failed_again = rng.binomial(back, refail) if refail > 0 else np.zeros_like(back)
+        delays = rng.multinomial(counts * returning + failed_again, pmf)
+        for days_ahead in np.flatnonzero(pmf):
+            pending[:, (day + days_ahead) % len(pmf)] += delays[..., days_ahead]
+
+        new_arrivals[:, day] = arrivals
+        returns[:, day] = back.sum(axis=1)
+        load[:, day] = day_work(counts, first_visits, first_mean) + day_work(back, return_visits, return_mean)
+
+    return _daily_result(resources_config, new_arrivals, returns, load, hours)
+
+
+def settling_day(series, target, tolerance=0.01, start=0):
+    """First day from `start` after which `series` stays within `tolerance` (relative) of `target`, or None"""
+    series = np.asarray(series, dtype=float)[start:]
+    outside = np.flatnonzero(np.abs(series - target) > tolerance * abs(target))
+    if len(outside) == 0:
+        return start
+    if outside[-1] == len(series) - 1:
+        return None
+    return start + int(outside[-1]) + 1
@@ -0,0 +1,225 @@
+"""Long-range capacity plan: daily demand forecasts over several years against many staffing scenarios.
+
+demand_forecast turns a base daily volume into a dated series with
+weekday and monthly factors, annual growth, renewal waves (Gaussian bumps
+around given dates), weekends and holidays (closed days, whose demand can
+move to the next open day). plan_capacity then evaluates the product
+aggregation method for every (staffing scenario, day) pair at once: the mix
+may drift day by day, so aggregate times are (days, resources), and unit
+counts are (scenarios, resources). Everything is array arithmetic over
+(scenarios, days, resources); ten years by fifty scenarios take a few tens
+of milliseconds. rollup sums the daily plan into weeks, months or years for
+charts. Only NumPy is needed.
+"""
+import numpy as np
+
+from dmv_core import config_to_matrix
+from dmv_demand import lindley_backlog
+from dmv_sim import DAY_MINUTES
+
+# (month, day) closures every year
+DEFAULT_ANNUAL_HOLIDAYS = ((1, 1), (7, 4), (12, 25))
+
+# Saturday and Sunday, with Monday = 0
+DEFAULT_CLOSED_WEEKDAYS = (5, 6)
+
+
+def forecast_dates(start, n_days):
+    """n_days consecutive calendar days from start (a date string or np.datetime64)"""
+    return np.datetime64(start, "D") + np.arange(n_days)
+
+
+def weekdays(dates):
+    """Day of the week of datetime64[D] dates, Monday = 0"""
+    return (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+
+
+def _next_open_day(open_days):
+    """For every day, the index of the same or next open day (len(open_days) if there is none)"""
+    n = len(open_days)
+    candidates = np.where(open_days, np.arange(n), n)
+    return np.minimum.accumulate(candidates[::-1])[::-1]
+
+
+def demand_forecast(dates, base_daily, annual_growth=0.0, weekday_factors=None, monthly_factors=None,
+                    renewal_waves=(), holidays=(), annual_holidays=DEFAULT_ANNUAL_HOLIDAYS,
+                    closed_weekdays=DEFAULT_CLOSED_WEEKDAYS, hours=DAY_MINUTES / 60, shift_closed=True):
+    """Daily applicants and open hours for the given dates.
+
+    Demand is base_daily (applicants per open day) times (1 + annual_growth)
+    per year since the first date, times weekday_factors[weekday] (7 values,
+    Monday first) and monthly_factors[month - 1] (12 values), times
+    1 + sum of renewal waves. Each wave is {"peak": date, "width_days": s,
+    "amplitude": a} and adds a * exp(-(days from peak)^2 / (2 s^2)).
+    Closed weekdays have no demand. Holidays (dates, plus annual_holidays as
+    (month, day)) that fall on open weekdays get zero hours too; with
+    shift_closed their demand is added to the next open day, otherwise it is
+    dropped.
+
+    Returns {"dates", "demand" (D,), "hours" (D,)}.
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    elapsed_years = (dates - dates[0]).astype(float) / 365.25
+    demand = base_daily * (1 + annual_growth) ** elapsed_years
+
+    if weekday_factors is not None:
+        demand = demand * np.asarray(weekday_factors, dtype=float)[weekdays(dates)]
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12
+    if monthly_factors is not None:
+        demand = demand * np.asarray(monthly_factors, dtype=float)[months]
+    if renewal_waves:
+        peaks = np.array([np.datetime64(w["peak"], "D") for w in renewal_waves])
+        widths = np.array([w["width_days"] for w in renewal_waves], dtype=float)
+        amplitudes = np.array([w["amplitude"] for w in renewal_waves], dtype=float)
+        offsets = (dates[:, np.newaxis] - peaks).astype(float)
+        demand = demand * (1 + (amplitudes * np.exp(-0.5 * (offsets / widths) ** 2)).sum(axis=1))
+
+    weekend = np.isin(weekdays(dates), closed_weekdays)
+    holiday = np.isin(dates, np.asarray(holidays, dtype="datetime64[D]"))
+    if annual_holidays:
+        day_of_month = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+        month_day = (months + 1) * 100 + day_of_month
+        holiday |= np.isin(month_day, [m * 100 + d for m, d in annual_holidays])
+    holiday &= ~weekend
+    closed = weekend | holiday
+
+    # Nobody is expected on weekends; a holiday's applicants come on the next open day instead
+    demand = np.where(weekend, 0.0, demand)
+    if shift_closed:
+        target = _next_open_day(~closed)
+        kept = target < len(dates)
+        demand = np.bincount(target[kept], weights=demand[kept], minlength=len(dates))
+    else:
+        demand = np.where(closed, 0.0, demand)
+    return {"dates": dates, "demand": demand, "hours": np.where(closed, 0.0, float(hours))}
+
+
+def mix_trend(n_days, start_mix, end_mix=None):
+    """(n_days, K) product mix moving linearly from start_mix on the first day to end_mix on the last"""
+    start_mix = np.asarray(start_mix, dtype=float)
+    end_mix = start_mix if end_mix is None else np.asarray(end_mix, dtype=float)
+    weight = np.linspace(0, 1, n_days)[:, np.newaxis]
+    return (1 - weight) * start_mix + weight * end_mix
+
+
+def staffing_matrix(resources_config, staffing=None):
+    """(scenario names, (S, R) unit counts) from {name: {resource: units}} overrides of the config's counts"""
+    resource_names, _, units = config_to_matrix(resources_config)
+    if staffing is None:
+        return ["Current"], units[np.newaxis]
+    names = list(staffing)
+    matrix = np.tile(units, (len(names), 1))
+    for s, overrides in enumerate(staffing.values()):
+        for resource_name, count in overrides.items():
+            matrix[s, resource_names.index(resource_name)] = count
+    return names, matrix
+
+
+def plan_capacity(resources_config, mix, forecast, staffing=None, saturation=1.0):
+    """Day-by-day feasibility, bottlenecks, unmet demand and saturation for every staffing scenario.
+
+    mix is one (K,) mix or a (D, K) mix per day (see mix_trend). forecast is
+    the dict from demand_forecast (demand in applicants per day, hours open
+    per day). staffing is None (the config's unit counts) or {name: {resource:
+    units}}. A resource is saturated on a day when its work (that day's
+    applicants plus the backlog carried in from the day before) reaches
+    `saturation` times its available minutes; "utilization" counts the
+    backlog the same way.
+
+    Returns a dict with "dates", "scenario_names", "resource_names",
+    "demand" (D,), "hours" (D,) and, per scenario: "daily_capacity",
+    "feasible", "unmet", "cumulative_unmet", "backlog" (applicants carried
+    into the next day), "bottleneck" (resource index) and "bottleneck_changed"
+    (True on days the bottleneck differs from the day before), all (S, D);
+    "utilization" (S, D, R); "first_saturation" (S, R) day index or -1 and
+    "first_saturation_date" (S, R), NaT when never saturated.
+    """
+    resource_names, times, _ = config_to_matrix(resources_config)
+    scenario_names, units = staffing_matrix(resources_config, staffing)
+    demand = np.asarray(forecast["demand"], dtype=float)
+    hours = np.broadcast_to(np.asarray(forecast["hours"], dtype=float), demand.shape)
+    n_days = len(demand)
+    mix = np.broadcast_to(np.asarray(mix, dtype=float), (n_days, times.shape[1]))
+
+    # T_agg per day and resource, accumulated type by type like calculate_capacity_batch
+    t_agg = np.zeros((n_days, len(resource_names)))
+    for k in range(times.shape[1]):
+        t_agg += mix[:, k, np.newaxis] * times[:, k]
+
+    capacity_per_hour = np.full_like(t_agg, np.inf)
+    np.divide(60, t_agg, out=capacity_per_hour, where=t_agg > 0)
+    pool_capacity = capacity_per_hour * units[:, np.newaxis, :]                    # (S, D, R) per hour
+    bottleneck = np.argmin(pool_capacity, axis=2)
+    system_capacity = np.take_along_axis(pool_capacity, bottleneck[..., np.newaxis], axis=2)[..., 0]
+    daily_capacity = np.where(hours > 0, system_capacity * hours, 0.0)
+
+    shortfall = demand - daily_capacity
+    unmet = np.maximum(shortfall, 0.0)
+    backlog = lindley_backlog(shortfall, axis=1)
+
+    # Work in minutes (the day's applicants plus those carried in from the day before)
+    # against minutes available; closed days count as idle, their backlog waits for the next open day
+    carried_in = np.concatenate([np.zeros((len(units), 1)), backlog[:, :-1]], axis=1)       # (S, D)
+    work = (demand + carried_in)[..., np.newaxis] * t_agg                                    # (S, D, R)
+    available = units[:, np.newaxis, :] * hours[:, np.newaxis] * 60                         # (S, D, R)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        utilization = np.where((work > 0) & (available > 0), work / available, 0.0)
+    saturated = utilization >= saturation
+    first_saturation = np.where(saturated.any(axis=1), saturated.argmax(axis=1), -1)
+    dates = np.asarray(forecast["dates"], dtype="datetime64[D]")
+
+    return {
+        "dates": dates,
+        "scenario_names": scenario_names,
+        "resource_names": resource_names,
+        "units": units,
+        "demand": demand,
+        "hours": hours,
+        "daily_capacity": daily_capacity,
+        "feasible": shortfall <= 0,
+        "unmet": unmet,
+        "cumulative_unmet": np.cumsum(unmet, axis=1),
+        "backlog": backlog,
+        "bottleneck": bottleneck,
+        "bottleneck_changed": np.concatenate(
+            [np.zeros((len(units), 1), dtype=bool), bottleneck[:, 1:] != bottleneck[:, :-1]], axis=1
+        ),
+        "utilization": utilization,
+        "first_saturation": first_saturation,
+        "first_saturation_date": np.where(first_saturation >= 0, dates[np.maximum(first_saturation, 0)],
+                                          np.datetime64("NaT", "D")),
+    }
+
+
+def bottleneck_changes(plan, scenario=0):
+    """[(date, previous resource, new resource), ...] for one scenario"""
+    days = np.flatnonzero(plan["bottleneck_changed"][scenario])
+    bottleneck = plan["bottleneck"][scenario]
+    names = plan["resource_names"]
+    return [(plan["dates"][d], names[bottleneck[d - 1]], names[bottleneck[d]]) for d in days]
+
+
+def rollup(plan, period="M"):
+    """Sum the daily plan into periods ("W", "M" or "Y" as NumPy datetime units).
+
+    Returns {"periods" (P,) datetime64, "demand" and "open_days" (P,),
+    per scenario "capacity", "unmet", "infeasible_days" and
+    "cumulative_unmet" at the period's end (S, P), and "peak_utilization"
+    over the period's open days (S, P, R)}.
+    """
+    dates = plan["dates"]
+    keys = dates.astype(f"datetime64[{period}]")
+    # Dates are consecutive, so each period is one contiguous run starting where the key changes
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    ends = np.append(starts[1:], len(dates)) - 1
+    open_utilization = np.where(plan["hours"][:, np.newaxis] > 0, plan["utilization"], 0.0)
+    return {
+        "periods": keys[starts],
+        "demand": np.add.reduceat(plan["demand"], starts),
+        "open_days": np.add.reduceat((plan["hours"] > 0).astype(int), starts),
+        "capacity": np.add.reduceat(plan["daily_capacity"], starts, axis=1),
+        "unmet": np.add.reduceat(plan["unmet"], starts, axis=1),
+        "infeasible_days": np.add.reduceat((~plan["feasible"]).astype(int), starts, axis=1),
+        "peak_utilization": np.maximum.reduceat(open_utilization, starts, axis=1),
+        "cumulative_unmet": plan["cumulative_unmet"][:, ends],
+    }
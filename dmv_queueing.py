@@ -0,0 +1,105 @@
+"""Analytic queueing approximations for the resource pools.
+
+Each pool is treated as a c-server queue fed by the applicants that visit it.
+Erlang C gives the exact M/M/c waiting time; the Allen-Cunneen approximation
+scales it by (ca^2 + cs^2) / 2 for general arrival and service variability.
+Everything is vectorized over a whole range of demand values, so wait-vs-demand
+curves come out of a single call without simulating. Only NumPy is needed.
+"""
+import numpy as np
+
+from dmv_core import APPLICANT_TYPES
+
+
+def pool_visit_profile(mix, resources_config, type_cv=1.0):
+    """Visits per applicant and squared CV of the visit time at every pool, for a mix.
+
+    A pool with "visits" entries is visited that many times by the type, each
+    visit taking an equal share of the type's time. Per-type visit times are
+    assumed to have coefficient of variation type_cv; the pool sees a mixture
+    of types, whose squared CV is returned as cs2.
+    Returns (visits_per_applicant, cs2), both arrays of length R.
+    """
+    mix = np.asarray(mix, dtype=float)
+    visits = np.zeros(len(resources_config))
+    cs2 = np.ones(len(resources_config))
+    for r, info in enumerate(resources_config.values()):
+        weights = []
+        means = []
+        for k, applicant_type in enumerate(APPLICANT_TYPES):
+            total_time = info[applicant_type]
+            if total_time > 0 and mix[k] > 0:
+                n_visits = info.get("visits", {}).get(applicant_type, 1)
+                weights.append(mix[k] * n_visits)
+                means.append(total_time / n_visits)
+        if not weights:
+            continue
+        weights = np.array(weights)
+        means = np.array(means)
+        visits[r] = weights.sum()
+        w = weights / visits[r]
+        mean = w @ means
+        second_moment = w @ ((1 + type_cv ** 2) * means ** 2)
+        cs2[r] = second_moment / mean ** 2 - 1
+    return visits, cs2
+
+
+def erlang_c(offered_load, servers):
+    """Probability that an arrival waits in an M/M/c queue, vectorized.
+
+    offered_load (a = lambda / mu) broadcasts against servers (c). The Erlang
+    B recurrence is run up to the largest c and frozen per element once its
+    own c is reached, which is numerically stable for large loads.
+    """
+    a, c = np.broadcast_arrays(np.asarray(offered_load, dtype=float), np.asarray(servers))
+    erlang_b = np.ones(a.shape)
+    for k in range(1, int(c.max(initial=0)) + 1):
+        erlang_b = np.where(k <= c, a * erlang_b / (k + a * erlang_b), erlang_b)
+
+    rho = np.divide(a, c, out=np.full(a.shape, np.inf), where=c > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prob_wait = erlang_b / (1 - rho * (1 - erlang_b))
+    return np.where(rho < 1, prob_wait, 1.0)
+
+
+def queue_curves(demands, t_agg, num_resources, visits_per_applicant=None, cs2=1.0, ca2=1.0):
+    """Expected wait and queue length for every pool across a range of demand values.
+
+    demands is a 1-D array of applicant arrival rates (per hour); t_agg and
+    num_resources are the per-pool values from calculate_capacity (length R).
+    visits_per_applicant and cs2 come from pool_visit_profile; without them
+    every applicant is treated as one visit of t_agg minutes with exponential
+    service. Returns a dict of (D, R) arrays: utilization (fraction),
+    prob_wait, wait (minutes in queue, Allen-Cunneen) and queue_length (Lq);
+    pools at or above 100% utilization, including pools with no servers that
+    get work, get infinite wait and queue length.
+    """
+    demands = np.asarray(demands, dtype=float)[:, np.newaxis]
+    t_agg = np.asarray(t_agg, dtype=float)
+    servers = np.asarray(num_resources)
+    visits = np.ones_like(t_agg) if visits_per_applicant is None else np.asarray(visits_per_applicant, dtype=float)
+
+    # Per-visit service time (minutes) and visit arrival rate (per minute)
+    service_time = np.divide(t_agg, visits, out=np.zeros_like(t_agg), where=visits > 0)
+    visit_rate = demands * visits / 60
+    offered_load = visit_rate * service_time
+    # A pool with no servers but some work can never keep up: infinite utilization, so it is unstable
+    utilization = np.divide(offered_load, servers, out=np.where(offered_load > 0, np.inf, 0.0), where=servers > 0)
+
+    prob_wait = erlang_c(offered_load, servers)
+    stable = utilization < 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wait_mmc = np.where(
+            stable & (offered_load > 0),
+            prob_wait * service_time / (servers * (1 - utilization)),
+            0.0
+        )
+    wait = np.where(stable, wait_mmc * (np.asarray(ca2) + np.asarray(cs2)) / 2, np.inf)
+    queue_length = np.where(stable, visit_rate * wait, np.inf)
+
+    return {
+        "utilization": utilization,
+        "prob_wait": np.where(offered_load > 0, prob_wait, 0.0),
+        "wait": wait,
+        "queue_length": queue_length,
+    }
@@ -0,0 +1,162 @@
+"""Exact bottleneck regions over the product-mix simplex.
+
+Pool r's capacity is 60 * units_r / (p . T_r), so the bottleneck (lowest
+pool capacity) is the resource with the largest load p . a_r, where
+a_r = T_r / (60 * units_r) is the unit-hours one applicant of each type
+needs. Loads are linear in the mix p, so resource r is the bottleneck on the
+convex polygon where p . (a_r - a_s) >= 0 for every other s, and every region
+boundary is a straight line. BottleneckMap clips the mix triangle by those
+half-planes to get the exact regions, answers point queries with the
+precomputed load matrix and finds where the bottleneck changes along any
+straight path through the simplex. Only NumPy is needed.
+"""
+import numpy as np
+
+from dmv_core import config_to_matrix
+
+# Regions with a smaller area (in (p1, p2) units) only touch a boundary line
+MIN_REGION_AREA = 1e-12
+
+# Relative difference below which two loads count as tied
+TIE_TOLERANCE = 1e-12
+
+# The mix triangle in (p1, p2) coordinates; p3 = 1 - p1 - p2
+SIMPLEX = np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+
+
+def _clip(polygon, coef, const):
+    """Part of a convex polygon where coef . x + const >= 0 (Sutherland-Hodgman, one edge)"""
+    if len(polygon) == 0:
+        return polygon
+    values = polygon @ coef + const
+    kept = []
+    for i in range(len(polygon)):
+        j = (i + 1) % len(polygon)
+        if values[i] >= 0:
+            kept.append(polygon[i])
+        if (values[i] >= 0) != (values[j] >= 0):
+            kept.append(polygon[i] + values[i] / (values[i] - values[j]) * (polygon[j] - polygon[i]))
+    return np.array(kept).reshape(-1, 2)
+
+
+def polygon_area(polygon):
+    if len(polygon) < 3:
+        return 0.0
+    x, y = polygon[:, 0], polygon[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+class BottleneckMap:
+    """Bottleneck regions and point queries for one resource configuration.
+
+    times is the (R, K) matrix from config_to_matrix (or a routing model's
+    workload transposed) and num_resources has length R. Point queries and
+    breakpoints work for any K; regions() needs K = 3. set_resource updates
+    one resource's row of the load matrix in place; the regions are re-clipped
+    on the next regions() call only if some load actually changed.
+    """
+
+    def __init__(self, resource_names, times, num_resources):
+        self.resource_names = list(resource_names)
+        self.times = np.array(times, dtype=float)
+        self.num_resources = np.array(num_resources, dtype=float)
+        if (self.num_resources <= 0).any():
+            raise ValueError("Every resource pool needs at least one unit")
+        self.load = self.times / (60 * self.num_resources[:, np.newaxis])
+        self._regions = None
+
+    @classmethod
+    def from_config(cls, resources_config):
+        return cls(*config_to_matrix(resources_config))
+
+    def set_resource(self, r, times=None, num_resources=None):
+        """Change one resource's process times and/or unit count (r is an index or a name)"""
+        if isinstance(r, str):
+            r = self.resource_names.index(r)
+        if times is not None:
+            self.times[r] = times
+        if num_resources is not None:
+            if num_resources <= 0:
+                raise ValueError("Every resource pool needs at least one unit")
+            self.num_resources[r] = num_resources
+        load = self.times[r] / (60 * self.num_resources[r])
+        if not np.array_equal(load, self.load[r]):
+            self.load[r] = load
+            self._regions = None
+
+    def query(self, mixes):
+        """Bottleneck index and system capacity (applicants/hr) for one (K,) mix or (M, K) mixes"""
+        mixes = np.asarray(mixes, dtype=float)
+        loads = mixes @ self.load.T
+        peak = loads.max(axis=-1)
+        # Loads equal up to rounding are ties, which go to the first resource
+        bottleneck = np.argmax(loads >= peak[..., np.newaxis] * (1 - TIE_TOLERANCE), axis=-1)
+        with np.errstate(divide="ignore"):
+            return bottleneck, np.where(peak > 0, 1 / peak, np.inf)
+
+    def regions(self):
+        """Polygon (vertices in (p1, p2) coordinates) on which each resource is the bottleneck.
+
+        Returns {name: (V, 2) array}; resources that are never the bottleneck
+        get an empty array. On ties the first resource wins, as in find_bottleneck.
+        """
+        if self.load.shape[1] != 3:
+            raise ValueError("Bottleneck regions can only be drawn for three applicant types")
+        if self._regions is None:
+            self._regions = {}
+            for r, name in enumerate(self.resource_names):
+                polygon = SIMPLEX
+                for s in range(len(self.resource_names)):
+                    if s == r:
+                        continue
+                    d = self.load[r] - self.load[s]
+                    if not d.any():
+                        if s < r:
+                            polygon = SIMPLEX[:0]
+                        continue
+                    # p . d >= 0 with p3 = 1 - p1 - p2
+                    polygon = _clip(polygon, d[:2] - d[2], d[2])
+                self._regions[name] = polygon if polygon_area(polygon) > MIN_REGION_AREA else SIMPLEX[:0]
+        return self._regions
+
+    def breakpoints(self, start, end):
+        """Where the bottleneck changes along the straight path from mix `start` to mix `end`.
+
+        Returns a list of {"resource", "t_from", "t_to", "mix_from", "mix_to"}
+        segments covering t in [0, 1], where mix(t) = start + t * (end - start).
+        """
+        start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+        intercept, slope = self.load @ start, self.load @ (end - start)
+
+        # Upper envelope of the lines intercept + slope * t, walked left to right
+        order = np.lexsort((np.arange(len(slope)), -slope, -intercept))
+        current, t = order[0], 0.0
+        segments = []
+        while True:
+            steeper = np.flatnonzero(slope > slope[current])
+            crossing = (intercept[current] - intercept[steeper]) / (slope[steeper] - slope[current])
+            ahead = crossing > t
+            if not ahead.any() or crossing[ahead].min() >= 1:
+                segments.append((current, t, 1.0))
+                break
+            t_next = crossing[ahead].min()
+            candidates = steeper[ahead][crossing[ahead] == t_next]
+            segments.append((current, t, t_next))
+            current, t = candidates[np.argmax(slope[candidates])], t_next
+
+        return [{
+            "resource": self.resource_names[r],
+            "t_from": t_from,
+            "t_to": t_to,
+            "mix_from": start + t_from * (end - start),
+            "mix_to": start + t_to * (end - start),
+        } for r, t_from, t_to in segments]
+
+    def capacity_grid(self, step=0.01):
+        """System capacity and bottleneck on a (p1, p2) grid, NaN / -1 outside the simplex (for heatmaps)"""
+        values = np.round(np.arange(0, 1 + step / 2, step), 10)
+        p1, p2 = np.meshgrid(values, values, indexing="xy")
+        p3 = 1 - p1 - p2
+        inside = p3 >= -1e-9
+        bottleneck, capacity = self.query(np.stack([p1, p2, np.clip(p3, 0, None)], axis=-1))
+        return values, np.where(inside, capacity, np.nan), np.where(inside, bottleneck, -1)
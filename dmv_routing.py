@@ -0,0 +1,266 @@
+"""Generalized capacity model: K applicant types, N resource pools, routing with rework.
+
+The original model (dmv_core.DEFAULT_RESOURCES_CONFIG) fixes three applicant
+types and stores one total time per (resource, type). Here each type has a
+route: an ordered list of steps, each at a resource with a time per visit. A
+step can send the applicant back (rework, e.g. re-queueing after missing
+documents) or out of the office (e.g. a failed knowledge test) with given
+probabilities. A route spec is JSON-friendly:
+
+    "Knowledge Test": [
+        ["Review Clerks", 2.5],
+        {"resource": "Knowledge Test Kiosks", "minutes": 20.0, "exit": 0.35},
+        {"resource": "Document Verification Clerks", "minutes": 6.0, "rework": 0.2},
+        ["Photo/Printing Machines", 3.0]
+    ]
+
+"rework" repeats the step itself, or step "rework_to" (an earlier step index)
+if given. Expected visits per step come from the traffic equations
+v = e_0 (I - Q)^-1 of every route's step transition matrix Q, solved for all
+types in one stacked np.linalg.solve. Folding steps onto resources gives a
+visits matrix V and a workload matrix W (K x N, minutes per applicant), and
+for any number of mixes the aggregate time is one matrix product mixes @ W.
+
+The three-type renewal office is the "renewal" preset; model_from_resources_config
+converts any config in the original format, and the app's capacity surface
+(dmv_surface) is built from that model. The app's sliders and dmv_core's
+(p1, p2, p3) functions still assume three types. Only NumPy is needed.
+"""
+import json
+
+import numpy as np
+
+from dmv_core import APPLICANT_TYPES, DEFAULT_MIX, DEFAULT_RESOURCES_CONFIG, capacity_from_t_agg
+
+
+def _renewal_preset():
+    """The three-type renewal office as routes, derived from DEFAULT_RESOURCES_CONFIG so the two never drift.
+
+    The config lists resources in the order applicants visit them; a
+    resource with several visits (the Type 2 eye exam: failed, then passed
+    with an eye report) becomes that many consecutive steps sharing its time.
+    Type 3 applicants leave after review because they have no later work.
+    """
+    model = model_from_resources_config(DEFAULT_RESOURCES_CONFIG)
+    routes = {}
+    for k, type_name in enumerate(model["types"]):
+        routes[type_name] = [
+            [resource_name, float(model["workload"][k, n] / model["visits"][k, n])]
+            for n, resource_name in enumerate(model["resource_names"])
+            for _ in range(int(model["visits"][k, n]))
+        ]
+    resources = {
+        name: {"num_resources": info["num_resources"], "description": info["description"]}
+        for name, info in DEFAULT_RESOURCES_CONFIG.items()
+    }
+    return {"types": model["types"], "mix": list(DEFAULT_MIX), "resources": resources, "routes": routes}
+
+
+def _full_service_preset():
+    renewal = _renewal_preset()
+    # Steps shared with a renewal take the same minutes as a Type 1 renewal
+    minutes = dict(renewal["routes"]["Type 1"])
+    resources = dict(renewal["resources"])
+    resources.update({
+        "Document Verification Clerks": {"num_resources": 2, "description": "Verify REAL ID and out-of-state documents"},
+        "Knowledge Test Kiosks": {"num_resources": 6, "description": "Computer-based knowledge test"},
+        "Road Test Examiners": {"num_resources": 3, "description": "Behind-the-wheel driving test"},
+    })
+    routes = {f"Renewal ({label})": renewal["routes"][t]
+              for t, label in zip(APPLICANT_TYPES, ["pass", "fail eye exam", "no docs"])}
+    routes.update({
+        "Knowledge Test": [
+            ["Review Clerks", minutes["Review Clerks"]],
+            ["Cashiers", minutes["Cashiers"]],
+            ["Eye Exam Clerks", minutes["Eye Exam Clerks"]],
+            {"resource": "Knowledge Test Kiosks", "minutes": 20.0, "exit": 0.35},
+            ["Photo/Printing Machines", minutes["Photo/Printing Machines"]],
+        ],
+        "Road Test": [
+            ["Review Clerks", minutes["Review Clerks"]],
+            {"resource": "Road Test Examiners", "minutes": 25.0, "exit": 0.3},
+            ["Cashiers", minutes["Cashiers"]],
+            ["Photo/Printing Machines", minutes["Photo/Printing Machines"]],
+        ],
+        "REAL ID": [
+            ["Review Clerks", minutes["Review Clerks"]],
+            {"resource": "Document Verification Clerks", "minutes": 6.0, "rework": 0.2},
+            ["Cashiers", minutes["Cashiers"]],
+            ["Eye Exam Clerks", minutes["Eye Exam Clerks"]],
+            ["Photo/Printing Machines", minutes["Photo/Printing Machines"]],
+        ],
+        "Out-of-State Transfer": [
+            ["Review Clerks", minutes["Review Clerks"]],
+            {"resource": "Document Verification Clerks", "minutes": 8.0, "rework": 0.15},
+            {"resource": "Eye Exam Clerks", "minutes": minutes["Eye Exam Clerks"], "rework": 0.1},
+            ["Cashiers", 1.5],
+            ["Photo/Printing Machines", minutes["Photo/Printing Machines"]],
+        ],
+    })
+    return {
+        "types": list(routes),
+        "mix": [0.45, 0.05, 0.1, 0.12, 0.08, 0.15, 0.05],
+        "resources": resources,
+        "routes": routes,
+    }
+
+
+def _parse_step(step, resource_index, type_name, i):
+    if isinstance(step, dict):
+        resource, minutes = step["resource"], step["minutes"]
+        rework, exit_p = float(step.get("rework", 0.0)), float(step.get("exit", 0.0))
+        rework_to = int(step.get("rework_to", i))
+    else:
+        (resource, minutes), rework, exit_p, rework_to = step, 0.0, 0.0, i
+    if resource not in resource_index:
+        raise ValueError(f"{type_name} step {i} uses unknown resource '{resource}'")
+    if minutes < 0:
+        raise ValueError(f"{type_name} step {i} has a negative time")
+    if rework < 0 or exit_p < 0 or rework + exit_p > 1 or rework >= 1:
+        raise ValueError(f"{type_name} step {i} needs 0 <= rework < 1, exit >= 0 and rework + exit <= 1")
+    if not 0 <= rework_to <= i:
+        raise ValueError(f"{type_name} step {i} can only rework to itself or an earlier step")
+    return resource_index[resource], float(minutes), rework, exit_p, rework_to
+
+
+def route_matrices(routes, types, resource_names):
+    """Step-level arrays for all routes, padded to the longest route.
+
+    Returns (step_resource, step_minutes, transitions) where step_resource and
+    step_minutes are (K, S) (resource -1 marks padding) and transitions is the
+    (K, S, S) matrix of step-to-step probabilities; leaving the office is the
+    missing probability mass in each row.
+    """
+    resource_index = {name: n for n, name in enumerate(resource_names)}
+    n_steps = max((len(routes[t]) for t in types), default=0)
+    step_resource = np.full((len(types), n_steps), -1)
+    step_minutes = np.zeros((len(types), n_steps))
+    transitions = np.zeros((len(types), n_steps, n_steps))
+
+    for k, type_name in enumerate(types):
+        route = routes[type_name]
+        for i, step in enumerate(route):
+            r, minutes, rework, exit_p, rework_to = _parse_step(step, resource_index, type_name, i)
+            step_resource[k, i] = r
+            step_minutes[k, i] = minutes
+            transitions[k, i, rework_to] += rework
+            if i + 1 < len(route):
+                transitions[k, i, i + 1] += 1 - rework - exit_p
+    return step_resource, step_minutes, transitions
+
+
+def expected_step_visits(transitions):
+    """Expected visits to every step per applicant, (K, S), from the traffic equations v = e_0 (I - Q)^-1"""
+    n_types, n_steps, _ = transitions.shape
+    if n_steps == 0:
+        return np.zeros((n_types, 0))
+    entry = np.zeros((n_types, n_steps, 1))
+    entry[:, 0, 0] = 1
+    # v (I - Q) = e_0  <=>  (I - Q)^T v^T = e_0^T, for every type at once
+    system = np.eye(n_steps) - np.swapaxes(transitions, 1, 2)
+    return np.linalg.solve(system, entry)[..., 0]
+
+
+def build_model(spec):
+    """Turn a model spec (see PRESETS) into matrices.
+
+    Returns {"types", "resource_names", "descriptions", "num_resources" (N,),
+    "visits" (K, N) expected visits per applicant, "workload" (K, N) expected
+    minutes per applicant, "mix" (K,)}. Raises ValueError on bad specs.
+    """
+    types = list(spec["types"])
+    resource_names = list(spec["resources"])
+    if not types or not resource_names:
+        raise ValueError("A model needs at least one applicant type and one resource")
+    missing = [t for t in types if t not in spec["routes"]]
+    if missing:
+        raise ValueError(f"No route given for {missing}")
+
+    step_resource, step_minutes, transitions = route_matrices(spec["routes"], types, resource_names)
+    step_visits = expected_step_visits(transitions)
+
+    # Fold steps onto resources with a one-hot (K, S, N) incidence array
+    incidence = (step_resource[..., np.newaxis] == np.arange(len(resource_names))).astype(float)
+    visits = np.einsum("ks,ksn->kn", step_visits, incidence)
+    workload = np.einsum("ks,ksn->kn", step_visits * step_minutes, incidence)
+
+    mix = np.asarray(spec.get("mix", np.full(len(types), 1 / len(types))), dtype=float)
+    if mix.shape != (len(types),):
+        raise ValueError(f"Mix needs one share per type ({len(types)}), got {mix.shape[0]}")
+
+    return {
+        "types": types,
+        "resource_names": resource_names,
+        "descriptions": [spec["resources"][name].get("description", "") for name in resource_names],
+        "num_resources": np.array([spec["resources"][name]["num_resources"] for name in resource_names], dtype=float),
+        "visits": visits,
+        "workload": workload,
+        "mix": mix,
+    }
+
+
+def model_from_resources_config(resources_config, applicant_types=APPLICANT_TYPES, mix=None):
+    """Matrix model for a config in the original {resource: {type: minutes, ...}} format.
+
+    Times there are totals per applicant, so they become the workload directly;
+    a resource's "visits" entry splits that total over several visits.
+    """
+    resource_names = list(resources_config)
+    if not resource_names:
+        raise ValueError("A model needs at least one resource")
+    workload = np.array([[info[t] for info in resources_config.values()] for t in applicant_types], dtype=float)
+    visits = np.array(
+        [[info.get("visits", {}).get(t, 1) for info in resources_config.values()] for t in applicant_types],
+        dtype=float
+    ) * (workload > 0)
+    return {
+        "types": list(applicant_types),
+        "resource_names": resource_names,
+        "descriptions": [info.get("description", "") for info in resources_config.values()],
+        "num_resources": np.array([info["num_resources"] for info in resources_config.values()], dtype=float),
+        "visits": visits,
+        "workload": workload,
+        "mix": np.asarray(DEFAULT_MIX if mix is None else mix, dtype=float),
+    }
+
+
+PRESETS = {
+    "renewal": _renewal_preset(),
+    "full_service": _full_service_preset(),
+}
+
+
+def load_model(path):
+    """Read a model spec from JSON and build it"""
+    with open(path, encoding="utf-8") as f:
+        return build_model(json.load(f))
+
+
+def evaluate_model(model, mixes=None, num_resources=None):
+    """Capacity and bottleneck for one or many mixes, as matrix operations.
+
+    mixes is (M, K) or (K,) (default: the model's own mix); num_resources
+    overrides the unit counts, (N,) or (M, N) for a staffing plan per mix.
+    Returns the same arrays as dmv_core.calculate_capacity_batch.
+    """
+    mixes = np.atleast_2d(np.asarray(model["mix"] if mixes is None else mixes, dtype=float))
+    units = model["num_resources"] if num_resources is None else num_resources
+    return capacity_from_t_agg(mixes @ model["workload"], units)
+
+
+def calculate_model_capacity(model, mix=None):
+    """Per-resource results for one mix, like dmv_core.calculate_capacity but for any number of types"""
+    mix = model["mix"] if mix is None else np.asarray(mix, dtype=float)
+    batch = evaluate_model(model, mix)
+    results = {}
+    for n, resource_name in enumerate(model["resource_names"]):
+        results[resource_name] = {
+            "times": {t: float(model["workload"][k, n]) for k, t in enumerate(model["types"])},
+            "visits": {t: float(model["visits"][k, n]) for k, t in enumerate(model["types"])},
+            "t_agg": float(batch["t_agg"][0, n]),
+            "capacity_per_hour": float(batch["capacity_per_hour"][0, n]),
+            "num_resources": float(model["num_resources"][n]),
+            "pool_capacity": float(batch["pool_capacity"][0, n]),
+            "description": model["descriptions"][n],
+        }
+    return results
@@ -0,0 +1,404 @@
+"""Discrete-event simulation of the four-station license renewal flow.
+
+The product aggregation method in dmv_core only gives a throughput ceiling.
+This simulator replays one operating day applicant by applicant to estimate
+waiting times, queue lengths and time in system at each resource pool.
+
+Routing comes straight from resources_config: an applicant type visits, in
+config order, every resource where its process time is positive (so Type 3
+leaves after review). A resource may list "visits" per type; the process time
+is then split evenly over that many visits, which is how the Type 2 eye exam
+failure and return is modelled. Like dmv_core, this module only needs NumPy.
+"""
+import functools
+import heapq
+import math
+from collections import deque
+from statistics import NormalDist
+
+import numpy as np
+
+from dmv_core import APPLICANT_TYPES
+
+# Event kinds on the heap
+ARRIVE = 0
+FINISH = 1
+
+# Length of an operating day in minutes (8 hours)
+DAY_MINUTES = 480
+
+
+def build_routes(resources_config):
+    """Per applicant type, the sequence of station indices visited and the mean time of each visit (minutes)"""
+    routes = []
+    for applicant_type in APPLICANT_TYPES:
+        stations = []
+        mean_times = []
+        for station, info in enumerate(resources_config.values()):
+            total_time = info[applicant_type]
+            if total_time > 0:
+                visits = info.get("visits", {}).get(applicant_type, 1)
+                stations += [station] * visits
+                mean_times += [total_time / visits] * visits
+        routes.append((tuple(stations), np.array(mean_times)))
+    return routes
+
+
+def sample_service_times(rng, mean_times, size, service_cv):
+    """Gamma-distributed visit times with the given means and coefficient of variation (cv=1 is exponential)"""
+    if service_cv == 0:
+        return np.broadcast_to(mean_times, (size, len(mean_times))).copy()
+    shape = 1 / service_cv ** 2
+    return rng.gamma(shape, mean_times * service_cv ** 2, size=(size, len(mean_times)))
+
+
+class InverseTransformSampler:
+    """Stand-in for np.random.Generator that draws every variate from one uniform by inverse transform.
+
+    With mirrored=True each uniform U is replaced by 1 - U, so two samplers
+    built on identically seeded generators give an antithetic pair of days.
+    Only the draws simulate_day makes are supported. Gamma shapes must be
+    whole numbers (service_cv of 1, 0.5, ...), as a sum of exponentials.
+    """
+
+    def __init__(self, rng, mirrored=False):
+        self.rng = rng
+        self.mirrored = mirrored
+
+    def uniform(self, size):
+        u = self.rng.random(size)
+        # Keep mirrored uniforms below 1 so logarithms stay finite
+        return np.minimum(1 - u, 1 - 2 ** -53) if self.mirrored else u
+
+    def exponential(self, scale=1.0, size=None):
+        return -np.asarray(scale) * np.log1p(-self.uniform(size))
+
+    def choice(self, a, size=None, p=None):
+        cdf = np.cumsum(p) / np.sum(p)
+        return np.minimum(np.searchsorted(cdf, self.uniform(size), side="right"), a - 1)
+
+    def gamma(self, shape, scale=1.0, size=None):
+        k = int(round(shape))
+        if k < 1 or abs(shape - k) > 1e-9:
+            raise ValueError(f"Inverse-transform gamma needs a whole-number shape, got {shape}")
+        size = (size,) if np.isscalar(size) else tuple(size)
+        return -np.asarray(scale) * np.log1p(-self.uniform(size + (k,))).sum(axis=-1)
+
+
+def simulate_day(resources_config, mix, demand, hours=DAY_MINUTES / 60, service_cv=1.0,
+                 return_delay=0.0, drain=True, seed=None):
+    """Simulate one day of the office and return raw per-visit and per-applicant records.
+
+    Applicants arrive as a Poisson stream at `demand` per hour for `hours`
+    hours, with types drawn from `mix` (p1, p2, p3). A repeat visit to the same
+    station (the Type 2 eye exam return) rejoins that queue after
+    `return_delay` minutes. With drain=True the office keeps serving until
+    everyone who arrived before closing is done.
+
+    Returns a dict of NumPy arrays (times in minutes): per station
+    "wait"/"service" lists of visit records, "queue_time" (time spent at each
+    queue length, per station), "busy_time", and per applicant "types",
+    "arrival" and "departure".
+
+    All random draws happen up front in a fixed order, so two calls with the
+    same seed and configs that differ only in units or process times see the
+    same arrivals, types and (scaled) service times: common random numbers.
+    """
+    rng = seed if isinstance(seed, (np.random.Generator, InverseTransformSampler)) else np.random.default_rng(seed)
+    resource_names = list(resources_config.keys())
+    servers = [info["num_resources"] for info in resources_config.values()]
+    n_stations = len(resource_names)
+    routes = build_routes(resources_config)
+    close_time = hours * 60
+
+    # Arrivals: cumulative exponential gaps, cut at closing time
+    expected = demand * hours
+    n_draw = int(expected + 10 * np.sqrt(expected + 1) + 10)
+    arrival = np.cumsum(rng.exponential(60 / demand, size=n_draw)) if demand > 0 else np.empty(0)
+    arrival = arrival[arrival < close_time]
+    n = len(arrival)
+    types = rng.choice(len(APPLICANT_TYPES), size=n, p=np.asarray(mix, dtype=float) / np.sum(mix))
+
+    # One row of pre-sampled visit times per applicant, padded to the longest route
+    max_len = max((len(stations) for stations, _ in routes), default=0)
+    service = np.zeros((n, max_len))
+    for k, (stations, mean_times) in enumerate(routes):
+        members = np.flatnonzero(types == k)
+        if len(stations) and len(members):
+            service[members, :len(stations)] = sample_service_times(rng, mean_times, len(members), service_cv)
+    route_of = [stations for stations, _ in routes]
+
+    step = np.zeros(n, dtype=np.int64)
+    departure = np.full(n, np.nan)
+    queue_entered = np.zeros(n)
+    queues = [deque() for _ in range(n_stations)]
+    busy = [0] * n_stations
+    waits = [[] for _ in range(n_stations)]
+    services = [[] for _ in range(n_stations)]
+    busy_time = np.zeros(n_stations)
+    queue_time = [[0.0] for _ in range(n_stations)]
+    last_change = [0.0] * n_stations
+
+    events = [(arrival[e], e, ARRIVE, e, 0) for e in range(n)]
+    heapq.heapify(events)
+    seq = n
+
+    def record_queue(station, now):
+        length = len(queues[station])
+        hist = queue_time[station]
+        if length >= len(hist):
+            hist.extend([0.0] * (length + 1 - len(hist)))
+        hist[length] += now - last_change[station]
+        last_change[station] = now
+
+    def start_service(entity, station, now):
+        nonlocal seq
+        duration = service[entity, step[entity]]
+        waits[station].append(now - queue_entered[entity])
+        services[station].append(duration)
+        busy[station] += 1
+        # Without draining, service running past closing is not office time
+        busy_time[station] += duration if drain else min(duration, close_time - now)
+        seq += 1
+        heapq.heappush(events, (now + duration, seq, FINISH, entity, station))
+
+    now = 0.0
+    while events:
+        now, _, kind, entity, station = heapq.heappop(events)
+        if not drain and now > close_time:
+            now = close_time
+            break
+
+        if kind == ARRIVE:
+            stations = route_of[types[entity]]
+            if not stations:
+                departure[entity] = now
+                continue
+            station = stations[step[entity]]
+            queue_entered[entity] = now
+            if busy[station] < servers[station]:
+                start_service(entity, station, now)
+            else:
+                record_queue(station, now)
+                queues[station].append(entity)
+            continue
+
+        # FINISH: free the server, pull the next applicant from this queue
+        busy[station] -= 1
+        if queues[station]:
+            record_queue(station, now)
+            start_service(queues[station].popleft(), station, now)
+
+        stations = route_of[types[entity]]
+        step[entity] += 1
+        if step[entity] == len(stations):
+            departure[entity] = now
+        else:
+            delay = return_delay if stations[step[entity]] == station else 0.0
+            seq += 1
+            heapq.heappush(events, (now + delay, seq, ARRIVE, entity, 0))
+
+    for station in range(n_stations):
+        record_queue(station, now)
+
+    return {
+        "resource_names": resource_names,
+        "num_resources": np.array(servers),
+        "horizon": now,
+        "types": types,
+        "arrival": arrival,
+        "departure": departure,
+        "wait": [np.array(w) for w in waits],
+        "service": [np.array(s) for s in services],
+        "busy_time": busy_time,
+        "queue_time": [np.array(q) for q in queue_time],
+    }
+
+
+def summarize_simulation(sim, percentiles=(50, 90, 95)):
+    """Per-station waiting time, queue length and utilization plus time-in-system statistics"""
+    horizon = sim["horizon"]
+    stations = {}
+    for i, resource_name in enumerate(sim["resource_names"]):
+        wait = sim["wait"][i]
+        queue_time = sim["queue_time"][i]
+        lengths = np.arange(len(queue_time))
+        stations[resource_name] = {
+            "visits": len(wait),
+            "mean_wait": float(wait.mean()) if len(wait) else 0.0,
+            **{f"p{p}_wait": float(np.percentile(wait, p)) if len(wait) else 0.0 for p in percentiles},
+            "max_wait": float(wait.max()) if len(wait) else 0.0,
+            "mean_queue": float(lengths @ queue_time / horizon) if horizon > 0 else 0.0,
+            "max_queue": int(np.flatnonzero(queue_time)[-1]) if queue_time.any() else 0,
+            "queue_length_dist": (queue_time / horizon).tolist() if horizon > 0 else [1.0],
+            "utilization": float(sim["busy_time"][i] / (sim["num_resources"][i] * horizon)) if horizon > 0 else 0.0,
+        }
+
+    done = ~np.isnan(sim["departure"])
+    time_in_system = sim["departure"][done] - sim["arrival"][done]
+    return {
+        "stations": stations,
+        "arrivals": len(sim["arrival"]),
+        "completed": int(done.sum()),
+        "mean_time_in_system": float(time_in_system.mean()) if len(time_in_system) else 0.0,
+        **{f"p{p}_time_in_system": float(np.percentile(time_in_system, p)) if len(time_in_system) else 0.0
+           for p in percentiles},
+        "horizon": horizon,
+    }
+
+
+# ============================================================================
+# REPLICATIONS
+# ============================================================================
+def replication_metrics(summary):
+    """Flatten one simulation summary into the scalar metrics tracked across replications"""
+    metrics = {
+        "throughput_per_hour": summary["completed"] / (summary["horizon"] / 60) if summary["horizon"] > 0 else 0.0,
+        "mean_time_in_system": summary["mean_time_in_system"],
+        "p95_time_in_system": summary["p95_time_in_system"],
+    }
+    for resource_name, station in summary["stations"].items():
+        for key in ("mean_wait", "p95_wait", "mean_queue", "utilization"):
+            metrics[f"{resource_name}/{key}"] = station[key]
+    return metrics
+
+
+def _run_replication_chunk(resources_config, mix, demand, seeds, sim_kwargs):
+    """Worker entry point: run one replication per seed and return their metric dicts"""
+    return [
+        replication_metrics(summarize_simulation(
+            simulate_day(resources_config, mix, demand, seed=np.random.default_rng(seed), **sim_kwargs)
+        ))
+        for seed in seeds
+    ]
+
+
+# Up to this many degrees of freedom t_critical inverts the exact t distribution
+EXACT_T_MAX_DF = 30
+
+
+def _t_central_probability(t, df):
+    """P(|T| < t) for Student's t with a whole number df of degrees of freedom (Abramowitz & Stegun 26.7.3-4)"""
+    theta = math.atan(t / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    if df % 2 == 1:
+        term = total = math.cos(theta) if df > 1 else 0.0
+        for j in range(1, (df - 1) // 2):
+            term *= cos2 * 2 * j / (2 * j + 1)
+            total += term
+        return 2 / math.pi * (theta + math.sin(theta) * total)
+    term = total = 1.0
+    for j in range(1, df // 2):
+        term *= cos2 * (2 * j - 1) / (2 * j)
+        total += term
+    return math.sin(theta) * total
+
+
+@functools.lru_cache(maxsize=1024)
+def t_critical(df, confidence=0.95):
+    """Two-sided Student t quantile.
+
+    Exact (bisection on the closed-form distribution) up to EXACT_T_MAX_DF
+    degrees of freedom, where the error of the Cornish-Fisher expansion of
+    the normal quantile matters; the expansion above that.
+    """
+    if df <= EXACT_T_MAX_DF and df == int(df):
+        df = int(df)
+        low, high = 0.0, 1.0
+        while _t_central_probability(high, df) < confidence:
+            low, high = high, high * 2
+        for _ in range(100):
+            middle = (low + high) / 2
+            if _t_central_probability(middle, df) < confidence:
+                low = middle
+            else:
+                high = middle
+        return high
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+
+
+def confidence_interval(samples, confidence=0.95):
+    """Mean, standard deviation and t-based confidence interval of a 1-D sample"""
+    samples = np.asarray(samples, dtype=float)
+    n = len(samples)
+    mean = float(samples.mean())
+    std = float(samples.std(ddof=1)) if n > 1 else 0.0
+    half_width = float(t_critical(n - 1, confidence) * std / np.sqrt(n)) if n > 1 else float('inf')
+    return {"mean": mean, "std": std, "half_width": half_width,
+            "ci_low": mean - half_width, "ci_high": mean + half_width, "n": n}
+
+
+def make_process_pool(max_workers=None):
+    """Process pool for replications, with workers started by a fork server where the platform has one.
+
+    Forking the caller directly is unsafe from a multithreaded process such
+    as the Streamlit server: a lock held by another thread at fork time stays
+    locked in the child. The fork server is a fresh single-threaded process
+    with this module preloaded; elsewhere workers are spawned.
+
+    Both re-import the caller's __main__ in every worker, and under
+    `streamlit run` that is the app script, so all workers are started here
+    with a blank __main__ in its place.
+    """
+    import multiprocessing
+    import sys
+    import time
+    import types
+    from concurrent.futures import ProcessPoolExecutor
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+    main_module = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        # Workers start on demand while none is idle; tasks that outlast the submissions start them all
+        warmups = [executor.submit(time.sleep, 0.1) for _ in range(executor._max_workers)]
+        for warmup in warmups:
+            warmup.result()
+    finally:
+        sys.modules["__main__"] = main_module
+    return executor
+
+
+def run_replications(resources_config, mix, demand, n_replications=200, seed=None,
+                     executor=None, max_workers=None, confidence=0.95, **sim_kwargs):
+    """Run independent replications of simulate_day across a process pool and merge them.
+
+    Every replication gets its own child of np.random.SeedSequence(seed), so
+    results are reproducible for a given seed regardless of how replications
+    are spread over workers. Pass an existing concurrent.futures executor to
+    reuse warm worker processes; otherwise a pool is created for this call.
+    Extra keyword arguments go to simulate_day.
+
+    Returns {"metrics": {name: array of per-replication values},
+    "summary": {name: confidence_interval(...)}, "replications": n}.
+    """
+    children = np.random.SeedSequence(seed).spawn(n_replications)
+    own_executor = executor is None
+    if own_executor:
+        executor = make_process_pool(max_workers)
+    workers = getattr(executor, "_max_workers", None) or 1
+
+    # A few chunks per worker keeps pickling overhead low while still balancing load
+    chunk_size = max(1, n_replications // (workers * 4))
+    chunks = [children[i:i + chunk_size] for i in range(0, n_replications, chunk_size)]
+    try:
+        futures = [executor.submit(_run_replication_chunk, resources_config, mix, demand, chunk, sim_kwargs)
+                   for chunk in chunks]
+        rows = [row for future in futures for row in future.result()]
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    metrics = {name: np.array([row[name] for row in rows]) for name in rows[0]} if rows else {}
+    return {
+        "replications": len(rows),
+        "metrics": metrics,
+        "summary": {name: confidence_interval(values, confidence) for name, values in metrics.items()},
+    }
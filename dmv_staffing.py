@@ -0,0 +1,121 @@
+"""Minimum-cost staffing for a target demand.
+
+Given a product mix, a target demand and per-unit costs, find the cheapest
+number of units per resource pool that keeps every pool under a utilization
+ceiling and, optionally, under per-pool and end-to-end queue wait ceilings.
+
+Every pool's utilization and wait depend only on its own unit count, so the
+search first builds a (pools x unit counts) table with one vectorized call to
+dmv_queueing. Counts below a pool's smallest feasible value are infeasible and
+counts past the point where its wait stops improving are dominated, so only
+the remaining band per pool is combined, in vectorized batches, and only when
+an end-to-end wait ceiling couples the pools.
+"""
+import numpy as np
+
+from dmv_core import calculate_capacity
+from dmv_queueing import pool_visit_profile, queue_curves
+
+
+def staffing_table(resources_config, mix, demand, max_units=20, type_cv=1.0):
+    """Utilization and expected wait (minutes) for every pool at 1..max_units units.
+
+    Returns (counts, utilization, wait, visits) where counts is 1..max_units,
+    utilization and wait are (R, max_units) arrays and visits is the number of
+    visits per applicant at each pool.
+    """
+    results = calculate_capacity(*mix, resources_config)
+    t_agg = np.array([data['t_agg'] for data in results.values()])
+    visits, cs2 = pool_visit_profile(mix, resources_config, type_cv)
+    counts = np.arange(1, max_units + 1)
+
+    # One "pool" per (resource, unit count) pair, evaluated in a single call
+    n_pools = len(t_agg)
+    curves = queue_curves(
+        [demand],
+        np.repeat(t_agg, max_units),
+        np.tile(counts, n_pools),
+        np.repeat(visits, max_units),
+        np.repeat(cs2, max_units)
+    )
+    utilization = curves["utilization"].reshape(n_pools, max_units)
+    wait = curves["wait"].reshape(n_pools, max_units)
+    return counts, utilization, wait, visits
+
+
+def optimize_staffing(resources_config, mix, demand, unit_costs=None, max_utilization=0.85,
+                      max_wait=None, max_total_wait=None, min_units=1, max_units=20,
+                      type_cv=1.0, wait_tolerance=1e-3, batch_size=200_000):
+    """Cheapest unit count per pool that meets the utilization and wait ceilings at `demand`.
+
+    unit_costs maps resource name to the cost of one unit (default 1 each).
+    max_wait caps the expected queue wait at every pool and max_total_wait
+    caps the expected total queue wait per applicant (minutes, summed over
+    visits). A unit that cuts a pool's wait by less than wait_tolerance
+    minutes is treated as dominated. Returns a dict with "feasible",
+    "staffing" ({name: units} or None), "cost", per-pool "utilization" and
+    "wait", "total_wait" and "candidates_evaluated".
+    """
+    resource_names = list(resources_config.keys())
+    costs = np.array([(unit_costs or {}).get(name, 1.0) for name in resource_names], dtype=float)
+    counts, utilization, wait, visits = staffing_table(resources_config, mix, demand, max_units, type_cv)
+
+    feasible = (utilization <= max_utilization) & (counts >= min_units)
+    if max_wait is not None:
+        feasible &= wait <= max_wait
+
+    # Per pool: the smallest feasible count, and the count after which adding
+    # units no longer meaningfully reduces wait (anything larger only adds cost)
+    candidates = []
+    for r in range(len(resource_names)):
+        ok = np.flatnonzero(feasible[r])
+        if len(ok) == 0:
+            return {"feasible": False, "staffing": None, "cost": None, "utilization": None,
+                    "wait": None, "total_wait": None, "candidates_evaluated": 0,
+                    "reason": f"{resource_names[r]} cannot meet the ceilings with up to {max_units} units"}
+        first = ok[0]
+        if max_total_wait is None or visits[r] == 0:
+            candidates.append(np.array([first]))
+            continue
+        improving = np.flatnonzero(np.diff(wait[r, ok]) < -wait_tolerance)
+        last = ok[improving[-1] + 1] if len(improving) else first
+        candidates.append(ok[ok <= last])
+
+    best = None
+    evaluated = 0
+    # Combine the bands over all pools but the first in one grid, then sweep the first pool's band in batches
+    rest = np.array(np.meshgrid(*candidates[1:], indexing="ij")).reshape(len(candidates) - 1, -1).T \
+        if len(candidates) > 1 else np.empty((1, 0), dtype=int)
+    rows_per_batch = max(1, batch_size // max(len(rest), 1))
+    for start in range(0, len(candidates[0]), rows_per_batch):
+        heads = candidates[0][start:start + rows_per_batch]
+        grid = np.hstack([np.repeat(heads, len(rest))[:, np.newaxis], np.tile(rest, (len(heads), 1))])
+        evaluated += len(grid)
+
+        cost = (counts[grid] * costs).sum(axis=1)
+        total_wait = (wait[np.arange(len(resource_names)), grid] * visits).sum(axis=1)
+        ok = np.ones(len(grid), dtype=bool) if max_total_wait is None else total_wait <= max_total_wait
+        if not ok.any():
+            continue
+        # Cheapest first, shortest total wait on ties
+        order = np.lexsort((total_wait[ok], cost[ok]))
+        i = np.flatnonzero(ok)[order[0]]
+        if best is None or (cost[i], total_wait[i]) < (best[1], best[2]):
+            best = (grid[i], cost[i], total_wait[i])
+
+    if best is None:
+        return {"feasible": False, "staffing": None, "cost": None, "utilization": None,
+                "wait": None, "total_wait": None, "candidates_evaluated": evaluated,
+                "reason": f"No staffing with up to {max_units} units per pool keeps total wait under {max_total_wait} min"}
+
+    choice, cost, total_wait = best
+    pools = np.arange(len(resource_names))
+    return {
+        "feasible": True,
+        "staffing": {name: int(counts[c]) for name, c in zip(resource_names, choice)},
+        "cost": float(cost),
+        "utilization": {name: float(u) for name, u in zip(resource_names, utilization[pools, choice])},
+        "wait": {name: float(w) for name, w in zip(resource_names, wait[pools, choice])},
+        "total_wait": float(total_wait),
+        "candidates_evaluated": evaluated,
+    }
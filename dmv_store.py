@@ -0,0 +1,291 @@
+"""Persistent local store of saved what-if scenarios.
+
+Scenarios (name, mix, demand, resource configuration and tags) live in one
+SQLite file next to the capacity surfaces, so they survive a sidebar reset
+and server restarts. Capacity results are stored once per distinct
+(config hash, mix, demand) and shared by every scenario that asks for it:
+saving a scenario that was already evaluated reuses the stored report,
+and everything new in a bulk save is evaluated in one
+calculate_capacity_batch call. Reports use the dmv_cli.py / dmv_api.py
+format. Scenarios are indexed by config hash and by tag, and compare()
+lines up capacity, bottleneck and utilization of any set of scenarios.
+Only the standard library's sqlite3 and NumPy are needed.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from dmv_cache import config_key
+from dmv_core import DEFAULT_RESOURCES_CONFIG, calculate_capacity_batch, config_to_matrix, scenario_reports, validate_mix
+
+STORE_PATH_ENV_VAR = "DMV_STORE_PATH"
+DEFAULT_STORE_PATH = Path.home() / ".cache" / "dmv_capacity" / "scenarios.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS configs (
+    config_key TEXT PRIMARY KEY,
+    resources TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    config_key TEXT NOT NULL,
+    p1 REAL NOT NULL, p2 REAL NOT NULL, p3 REAL NOT NULL,
+    demand REAL NOT NULL,
+    report TEXT NOT NULL,
+    PRIMARY KEY (config_key, p1, p2, p3, demand)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    config_key TEXT NOT NULL REFERENCES configs,
+    p1 REAL NOT NULL, p2 REAL NOT NULL, p3 REAL NOT NULL,
+    demand REAL NOT NULL,
+    system_capacity REAL,
+    bottleneck TEXT
+);
+CREATE INDEX IF NOT EXISTS scenarios_by_config ON scenarios (config_key);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    scenario_id INTEGER NOT NULL REFERENCES scenarios ON DELETE CASCADE,
+    PRIMARY KEY (tag, scenario_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_by_scenario ON tags (scenario_id);
+"""
+
+SCENARIO_COLUMNS = "s.id, s.name, s.created, s.config_key, s.p1, s.p2, s.p3, s.demand, s.system_capacity, s.bottleneck"
+
+
+def default_store_path():
+    return Path(os.environ.get(STORE_PATH_ENV_VAR) or DEFAULT_STORE_PATH)
+
+
+class ScenarioStore:
+    """Saved scenarios in one SQLite file; safe to share between threads (e.g. Streamlit sessions)"""
+
+    def __init__(self, path=None):
+        self.path = str(path) if path is not None else str(default_store_path())
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.computed = 0
+        self.reused = 0
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------------
+    # Saving
+    # ------------------------------------------------------------------------
+    def save(self, name, mix, demand, resources_config=DEFAULT_RESOURCES_CONFIG, tags=()):
+        """Save one scenario and return its id"""
+        return self.save_many([{"name": name, "mix": mix, "demand": demand, "tags": tags}], resources_config)[0]
+
+    def save_many(self, scenarios, resources_config=DEFAULT_RESOURCES_CONFIG, tags=()):
+        """Save many scenarios in one transaction and return their ids.
+
+        Each scenario is a dict with "name", "mix" (p1, p2, p3) and "demand",
+        and optionally its own "resources" config and extra "tags"; `tags` are
+        added to all of them. Results already in the store are reused, the
+        rest are evaluated together per config.
+        """
+        rows = []
+        for i, scenario in enumerate(scenarios):
+            mix = tuple(float(p) for p in scenario["mix"])
+            validate_mix(*mix)
+            config = scenario.get("resources", resources_config)
+            rows.append({
+                "name": str(scenario.get("name", f"scenario_{i + 1}")),
+                "config": config,
+                "key": (config_key(config),) + mix + (float(scenario["demand"]),),
+                "tags": sorted(set(tags) | set(scenario.get("tags", ()))),
+            })
+
+        with self._lock, self._conn:
+            reports = self._results([row["key"] for row in rows], {row["key"][0]: row["config"] for row in rows})
+            now = time.time()
+            ids = []
+            for row in rows:
+                report = reports[row["key"]]
+                cursor = self._conn.execute(
+                    "INSERT INTO scenarios (name, created, config_key, p1, p2, p3, demand, system_capacity, bottleneck) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (row["name"], now) + row["key"] + (report["system_capacity"], report["bottleneck"])
+                )
+                ids.append(cursor.lastrowid)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tags (tag, scenario_id) VALUES (?, ?)",
+                [(tag, scenario_id) for row, scenario_id in zip(rows, ids) for tag in row["tags"]]
+            )
+        return ids
+
+    def _results(self, keys, configs):
+        """Stored or newly computed reports for (config_key, p1, p2, p3, demand) keys; call inside a transaction"""
+        reports = {}
+        for key in set(keys):
+            found = self._conn.execute(
+                "SELECT report FROM results WHERE config_key = ? AND p1 = ? AND p2 = ? AND p3 = ? AND demand = ?", key
+            ).fetchone()
+            if found is not None:
+                reports[key] = json.loads(found[0])
+        self.reused += len(reports)
+
+        missing = {}
+        for key in set(keys) - set(reports):
+            missing.setdefault(key[0], []).append(key)
+        for key_of_config, config_keys in missing.items():
+            config = configs[key_of_config]
+            resource_names, times, units = config_to_matrix(config)
+            mixes = np.array([key[1:4] for key in config_keys])
+            demand = np.array([key[4] for key in config_keys])
+            batch = calculate_capacity_batch(mixes, times, units)
+            new = dict(zip(config_keys, scenario_reports(batch, mixes, demand, resource_names, units)))
+            self._conn.execute("INSERT OR IGNORE INTO configs (config_key, resources) VALUES (?, ?)",
+                               (key_of_config, json.dumps(config, sort_keys=True)))
+            self._conn.executemany("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                                   [key + (json.dumps(report),) for key, report in new.items()])
+            reports.update(new)
+            self.computed += len(new)
+        return reports
+
+    def lookup(self, mix, demand, resources_config=DEFAULT_RESOURCES_CONFIG):
+        """The stored report for this exact scenario, or None if it was never saved"""
+        key = (config_key(resources_config),) + tuple(float(p) for p in mix) + (float(demand),)
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT report FROM results WHERE config_key = ? AND p1 = ? AND p2 = ? AND p3 = ? AND demand = ?", key
+            ).fetchone()
+        return json.loads(found[0]) if found is not None else None
+
+    # ------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------
+    def _scenario_rows(self, where, params):
+        """Scenario dicts (without reports) with their tags"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {SCENARIO_COLUMNS}, (SELECT json_group_array(tag) FROM tags WHERE scenario_id = s.id) "
+                f"FROM scenarios s {where}", params
+            ).fetchall()
+        return [
+            {"id": row[0], "name": row[1], "created": row[2], "config_key": row[3], "mix": row[4:7],
+             "demand": row[7], "system_capacity": row[8], "bottleneck": row[9], "tags": sorted(json.loads(row[10]))}
+            for row in rows
+        ]
+
+    def query(self, tags=(), config_key=None, name=None, limit=None):
+        """Saved scenarios, newest first, that carry all `tags`, use the config with this hash and contain `name`"""
+        clauses, params = [], []
+        tags = sorted(set(tags))
+        if tags:
+            clauses.append(f"s.id IN (SELECT scenario_id FROM tags WHERE tag IN ({', '.join('?' * len(tags))}) "
+                           f"GROUP BY scenario_id HAVING COUNT(*) = ?)")
+            params += tags + [len(tags)]
+        if config_key is not None:
+            clauses.append("s.config_key = ?")
+            params.append(config_key)
+        if name:
+            clauses.append("instr(s.name, ?) > 0")
+            params.append(name)
+        where = ("WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY s.created DESC, s.id DESC"
+        if limit is not None:
+            where += " LIMIT ?"
+            params.append(int(limit))
+        return self._scenario_rows(where, params)
+
+    def tags(self):
+        """{tag: number of scenarios}"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT tag, COUNT(*) FROM tags GROUP BY tag ORDER BY tag").fetchall())
+
+    def load(self, ids):
+        """Full scenarios (with "report" and "resources") in the order of ids; unknown ids are skipped"""
+        ids = [int(i) for i in ids]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.id, r.report, c.resources FROM scenarios s "
+                "JOIN results r USING (config_key, p1, p2, p3, demand) JOIN configs c USING (config_key) "
+                "WHERE s.id IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+            ).fetchall()
+        details = {row[0]: (row[1], row[2]) for row in rows}
+        scenarios = {s["id"]: s for s in self._scenario_rows("WHERE s.id IN (SELECT value FROM json_each(?))",
+                                                               (json.dumps(ids),))}
+        loaded = []
+        for scenario_id in ids:
+            if scenario_id in details and scenario_id in scenarios:
+                report, resources = details[scenario_id]
+                loaded.append({**scenarios[scenario_id], "report": json.loads(report), "resources": json.loads(resources)})
+        return loaded
+
+    def delete(self, ids):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM scenarios WHERE id IN (SELECT value FROM json_each(?))",
+                               (json.dumps([int(i) for i in ids]),))
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+            stored = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"scenarios": count, "stored_results": stored, "computed": self.computed, "reused": self.reused}
+
+    # ------------------------------------------------------------------------
+    # Comparison
+    # ------------------------------------------------------------------------
+    def compare(self, ids, baseline=None):
+        """Side-by-side capacity, bottleneck and utilization of saved scenarios, with changes against a baseline.
+
+        baseline is a scenario id (default: the first). Returns {"scenarios"
+        (the loaded dicts), "resource_names", "demand", "system_capacity",
+        "capacity_change", "bottleneck", "bottleneck_changed", "feasible",
+        "utilization" (S, R) in percent and "utilization_change"}. Resources
+        missing from a scenario's config have NaN utilization.
+        """
+        scenarios = self.load(ids)
+        if not scenarios:
+            raise ValueError("None of the given scenario ids are stored")
+        position = {s["id"]: i for i, s in enumerate(scenarios)}
+        baseline = scenarios[0]["id"] if baseline is None else int(baseline)
+        if baseline not in position:
+            raise ValueError(f"Baseline scenario {baseline} is not among the compared scenarios")
+        base = position[baseline]
+
+        resource_names = list(dict.fromkeys(name for s in scenarios for name in s["report"]["resources"]))
+        reports = [s["report"] for s in scenarios]
+        capacity = np.array([r["system_capacity"] if r["system_capacity"] is not None else np.inf for r in reports])
+        utilization = np.array([
+            [np.nan if r["resources"].get(name, {}).get("utilization_pct") is None
+             else r["resources"][name]["utilization_pct"] for name in resource_names]
+            for r in reports
+        ])
+        bottleneck = [r["bottleneck"] for r in reports]
+        with np.errstate(invalid="ignore"):
+            capacity_change = capacity - capacity[base]
+        return {
+            "scenarios": scenarios,
+            "baseline": scenarios[base]["id"],
+            "resource_names": resource_names,
+            "demand": np.array([r["demand"] for r in reports]),
+            "system_capacity": capacity,
+            "capacity_change": capacity_change,
+            "bottleneck": bottleneck,
+            "bottleneck_changed": np.array([b != bottleneck[base] for b in bottleneck]),
+            "feasible": np.array([r["feasible"] for r in reports]),
+            "utilization": utilization,
+            "utilization_change": utilization - utilization[base],
+        }
@@ -0,0 +1,135 @@
+"""Precomputed capacity surface over every integer-percent product mix.
+
+The sliders move in whole percent, so for one resource configuration there
+are only 5,151 possible mixes (p1 + p2 <= 100). compute_surface converts the
+config to a dmv_routing model and evaluates all of them in one
+calculate_capacity_batch call on its workload, using exactly the same mixes
+(p / 100) as the app so every value is bit-identical to calculate_capacity.
+The result is one structured NumPy array indexed [p1, p2] and saved as
+surface-<config hash>.npy; load_surface memory-maps that file, so a fresh
+server process starts warm and all processes share the pages through the OS
+page cache. Lookups are then plain array indexing. Only NumPy is needed.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from dmv_cache import config_key
+from dmv_core import APPLICANT_TYPES, calculate_capacity_batch
+from dmv_routing import model_from_resources_config
+
+# Bump when the file layout changes so old files are ignored
+SURFACE_VERSION = 1
+
+# Where surfaces are stored unless a directory is given
+SURFACE_DIR_ENV_VAR = "DMV_SURFACE_DIR"
+DEFAULT_SURFACE_DIR = Path.home() / ".cache" / "dmv_capacity"
+
+
+def surface_dtype(n_resources):
+    return np.dtype([
+        ("t_agg", np.float64, (n_resources,)),
+        ("capacity_per_hour", np.float64, (n_resources,)),
+        ("pool_capacity", np.float64, (n_resources,)),
+        ("system_capacity", np.float64),
+        ("bottleneck", np.int8),
+    ])
+
+
+def compute_surface(resources_config):
+    """Capacity results for every (p1, p2) in whole percent, as a (101, 101) structured array.
+
+    Cells with p1 + p2 > 100 are not valid mixes; they hold NaN capacities
+    and bottleneck -1.
+    """
+    model = model_from_resources_config(resources_config)
+    num_resources = model["num_resources"]
+    p1, p2 = np.meshgrid(np.arange(101), np.arange(101), indexing="ij")
+    valid = p1 + p2 <= 100
+    mixes = np.stack([p1[valid], p2[valid], 100 - p1[valid] - p2[valid]], axis=1) / 100
+    # Per-type accumulation rather than mixes @ workload keeps results bit-identical to calculate_capacity
+    batch = calculate_capacity_batch(mixes, model["workload"].T, num_resources)
+
+    surface = np.zeros((101, 101), dtype=surface_dtype(len(num_resources)))
+    for field in ("t_agg", "capacity_per_hour", "pool_capacity", "system_capacity"):
+        surface[field] = np.nan
+        surface[field][valid] = batch[field]
+    surface["bottleneck"] = -1
+    surface["bottleneck"][valid] = batch["bottleneck"]
+    return surface
+
+
+def surface_path(resources_config, directory=None):
+    directory = Path(directory or os.environ.get(SURFACE_DIR_ENV_VAR) or DEFAULT_SURFACE_DIR)
+    return directory / f"surface-v{SURFACE_VERSION}-{config_key(resources_config)}.npy"
+
+
+def _write_atomic(path, surface):
+    """Write through a temporary file and rename, so readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, surface)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class CapacitySurface:
+    """O(1) capacity lookups for one resource configuration"""
+
+    def __init__(self, resources_config, surface, path=None):
+        self.resources_config = resources_config
+        self.resource_names = list(resources_config)
+        self.surface = surface
+        self.path = path
+
+    def lookup(self, p1, p2):
+        """The surface record (t_agg, capacity_per_hour, pool_capacity, system_capacity, bottleneck) at whole percents"""
+        if not (0 <= p1 <= 100 and 0 <= p2 <= 100 - p1):
+            raise ValueError(f"({p1}, {p2}) is not a whole-percent product mix")
+        return self.surface[p1, p2]
+
+    def results(self, p1, p2):
+        """Same dict as dmv_core.calculate_capacity(p1/100, p2/100, p3/100, config), from the surface"""
+        record = self.lookup(p1, p2)
+        results = {}
+        for i, resource_name in enumerate(self.resource_names):
+            resource_info = self.resources_config[resource_name]
+            results[resource_name] = {
+                "t1": resource_info[APPLICANT_TYPES[0]],
+                "t2": resource_info[APPLICANT_TYPES[1]],
+                "t3": resource_info[APPLICANT_TYPES[2]],
+                "t_agg": float(record["t_agg"][i]),
+                "capacity_per_hour": float(record["capacity_per_hour"][i]),
+                "num_resources": resource_info["num_resources"],
+                "pool_capacity": float(record["pool_capacity"][i]),
+                "description": resource_info["description"]
+            }
+        return results
+
+
+def load_surface(resources_config, directory=None):
+    """Memory-map the stored surface for this config, computing and saving it first if needed.
+
+    If the directory is not writable the surface is kept in memory instead.
+    """
+    path = surface_path(resources_config, directory)
+    expected = surface_dtype(len(resources_config))
+    try:
+        surface = np.load(path, mmap_mode="r")
+        if surface.dtype == expected and surface.shape == (101, 101):
+            return CapacitySurface(resources_config, surface, path)
+    except (OSError, ValueError):
+        pass
+
+    surface = compute_surface(resources_config)
+    try:
+        _write_atomic(path, surface)
+        return CapacitySurface(resources_config, np.load(path, mmap_mode="r"), path)
+    except OSError:
+        return CapacitySurface(resources_config, surface)
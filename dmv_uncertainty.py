@@ -0,0 +1,227 @@
+"""Monte Carlo uncertainty analysis of system capacity.
+
+The process times in resources_config are point estimates. Here each time
+and the product mix can be random: times are drawn from per-(resource, type)
+distributions and the mix from a Dirichlet distribution around the nominal
+mix. Capacity and bottleneck identity are evaluated for every draw with the
+same product aggregation formulas as dmv_core, in fixed-size chunks. Each
+chunk only updates running moments, bottleneck counts and fixed-size
+histograms (StreamingSummary), so memory does not grow with the number of
+samples; keeping the draws themselves is opt-in and capped. Only NumPy is
+needed.
+"""
+import numpy as np
+
+from dmv_core import APPLICANT_TYPES, config_to_matrix
+
+# Log-spaced histogram bins for capacities: percentiles are within about 0.1% of exact
+HISTOGRAM_EDGES = np.geomspace(1e-6, 1e9, 30_001)
+
+# Most draws run_uncertainty will hand back with keep_samples
+MAX_KEPT_SAMPLES = 1_000_000
+
+
+def sample_distribution(rng, spec, size):
+    """Draw `size` values from a distribution spec.
+
+    A plain number is a fixed value. Otherwise spec is a dict with "dist" one of
+    "triangular" (low, mode, high), "uniform" (low, high), "normal" (mean, sd;
+    truncated at 0 by redrawing negative values), "lognormal" (mean, cv) or
+    "gamma" (mean, cv).
+    """
+    if isinstance(spec, (int, float)):
+        return np.full(size, float(spec))
+
+    dist = spec["dist"]
+    if dist == "triangular":
+        return rng.triangular(spec["low"], spec["mode"], spec["high"], size)
+    if dist == "uniform":
+        return rng.uniform(spec["low"], spec["high"], size)
+    if dist == "normal":
+        if spec["mean"] <= 0:
+            raise ValueError("A normal time needs a positive mean")
+        values = rng.normal(spec["mean"], spec["sd"], size)
+        # With a positive mean at least half the draws are kept, so this ends after a few rounds
+        negative = np.flatnonzero(values < 0)
+        while len(negative):
+            values[negative] = rng.normal(spec["mean"], spec["sd"], len(negative))
+            negative = negative[values[negative] < 0]
+        return values
+    if dist == "lognormal":
+        sigma2 = np.log1p(spec["cv"] ** 2)
+        return rng.lognormal(np.log(spec["mean"]) - sigma2 / 2, np.sqrt(sigma2), size)
+    if dist == "gamma":
+        shape = 1 / spec["cv"] ** 2
+        return rng.gamma(shape, spec["mean"] / shape, size)
+    raise ValueError(f"Unknown distribution '{dist}'")
+
+
+def time_specs(resources_config, time_uncertainty):
+    """Distribution spec for every (resource, type) time, as an R x K nested list.
+
+    time_uncertainty may be None (all times fixed), a number (relative CV
+    applied as a lognormal to every positive time) or a {resource: {type: spec}}
+    dict overriding individual times; unlisted times stay fixed.
+    """
+    specs = []
+    for resource_name, info in resources_config.items():
+        row = []
+        for applicant_type in APPLICANT_TYPES:
+            point = info[applicant_type]
+            if isinstance(time_uncertainty, (int, float)) and point > 0 and time_uncertainty > 0:
+                row.append({"dist": "lognormal", "mean": point, "cv": float(time_uncertainty)})
+            elif isinstance(time_uncertainty, dict):
+                row.append(time_uncertainty.get(resource_name, {}).get(applicant_type, point))
+            else:
+                row.append(point)
+        specs.append(row)
+    return specs
+
+
+def sample_mixes(rng, mix, concentration, size):
+    """Dirichlet draws around `mix`; a larger concentration means less spread, None means a fixed mix"""
+    mix = np.asarray(mix, dtype=float)
+    if concentration is None:
+        return np.broadcast_to(mix, (size, len(mix)))
+    # Types with a zero share stay at zero (Dirichlet needs positive parameters)
+    draws = np.zeros((size, len(mix)))
+    active = mix > 0
+    draws[:, active] = rng.dirichlet(concentration * mix[active], size)
+    return draws
+
+
+class StreamingSummary:
+    """Mean, standard deviation and percentiles of values that arrive in chunks, in constant memory.
+
+    Moments of the finite values are merged chunk by chunk (Chan et al.);
+    percentiles come from a histogram on fixed edges, interpolated within the
+    bin, over all values (infinite ones in the top bin, as np.percentile
+    would count them).
+    """
+
+    def __init__(self, edges=HISTOGRAM_EDGES):
+        self.edges = edges
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+        self.n = 0
+        self.n_finite = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.counts += np.bincount(np.searchsorted(self.edges, values, side="right"), minlength=len(self.counts))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        finite = values[np.isfinite(values)]
+        if len(finite):
+            n, mean = len(finite), float(finite.mean())
+            total = self.n_finite + n
+            delta = mean - self.mean
+            self.m2 += float(((finite - mean) ** 2).sum()) + delta ** 2 * self.n_finite * n / total
+            self.mean += delta * n / total
+            self.n_finite = total
+
+    def percentile(self, p):
+        """Linear-interpolation percentile like np.percentile, to within one histogram bin"""
+        rank = p / 100 * (self.n - 1)
+        cumulative = np.cumsum(self.counts)
+        b = int(np.searchsorted(cumulative, rank, side="right"))
+        if b == 0:
+            return self.minimum
+        if b == len(self.edges):
+            return self.maximum
+        before = cumulative[b - 1]
+        low, high = self.edges[b - 1], self.edges[b]
+        value = low + (rank - before + 0.5) / self.counts[b] * (high - low)
+        return float(min(max(value, self.minimum), self.maximum))
+
+    def summary(self, percentiles):
+        if self.n_finite == 0:
+            return {"mean": float('inf'), "std": 0.0, **{f"p{p}": float('inf') for p in percentiles}}
+        return {
+            "mean": self.mean,
+            "std": float(np.sqrt(self.m2 / self.n_finite)),
+            **{f"p{p}": self.percentile(p) for p in percentiles},
+        }
+
+
+def run_uncertainty(resources_config, mix, time_uncertainty=0.2, mix_concentration=None,
+                    n_samples=1_000_000, chunk_size=100_000, seed=None, percentiles=(5, 50, 95), keep_samples=0):
+    """Sample process times and mixes, returning capacity percentiles and bottleneck probabilities.
+
+    See time_specs for time_uncertainty and sample_mixes for
+    mix_concentration. Work is done chunk_size draws at a time and each
+    chunk is folded into a StreamingSummary per capacity, so memory is about
+    chunk_size draws whatever n_samples is. With keep_samples > 0 the first
+    keep_samples draws (at most MAX_KEPT_SAMPLES) are also returned, as
+    float32 capacities and int8 bottleneck indices.
+
+    Returns {"n_samples", "system_capacity": stats, "pool_capacity":
+    {name: stats}, "bottleneck_probability": {name: p}, "samples": {...} or
+    None}, where stats holds mean, std and the requested percentiles.
+    """
+    if n_samples < 1:
+        raise ValueError("n_samples must be at least 1")
+    if keep_samples > MAX_KEPT_SAMPLES:
+        raise ValueError(f"keep_samples is at most {MAX_KEPT_SAMPLES}")
+    rng = np.random.default_rng(seed)
+    resource_names, point_times, num_resources = config_to_matrix(resources_config)
+    specs = time_specs(resources_config, time_uncertainty)
+    n_res, n_types = point_times.shape
+
+    system_summary = StreamingSummary()
+    pool_summaries = [StreamingSummary() for _ in range(n_res)]
+    counts = np.zeros(n_res, dtype=np.int64)
+    n_kept = min(keep_samples, n_samples)
+    samples = None
+    if n_kept > 0:
+        samples = {"system_capacity": np.empty(n_kept, dtype=np.float32),
+                   "pool_capacity": np.empty((n_kept, n_res), dtype=np.float32),
+                   "bottleneck": np.empty(n_kept, dtype=np.int8)}
+
+    for start in range(0, n_samples, chunk_size):
+        size = min(chunk_size, n_samples - start)
+        mixes = sample_mixes(rng, mix, mix_concentration, size)
+
+        # T_agg = sum_k p_k * T_k with a fresh draw of every T_k per sample
+        t_agg = np.zeros((size, n_res))
+        for r in range(n_res):
+            for k in range(n_types):
+                spec = specs[r][k]
+                if isinstance(spec, (int, float)):
+                    if spec:
+                        t_agg[:, r] += mixes[:, k] * spec
+                else:
+                    t_agg[:, r] += mixes[:, k] * sample_distribution(rng, spec, size)
+
+        capacity = np.full_like(t_agg, np.inf)
+        np.divide(60, t_agg, out=capacity, where=t_agg > 0)
+        capacity *= num_resources
+        chunk_bottleneck = np.argmin(capacity, axis=1)
+        chunk_system = capacity[np.arange(size), chunk_bottleneck]
+
+        system_summary.add(chunk_system)
+        for r in range(n_res):
+            pool_summaries[r].add(capacity[:, r])
+        counts += np.bincount(chunk_bottleneck, minlength=n_res)
+
+        if start < n_kept:
+            kept = min(size, n_kept - start)
+            samples["system_capacity"][start:start + kept] = chunk_system[:kept]
+            samples["pool_capacity"][start:start + kept] = capacity[:kept]
+            samples["bottleneck"][start:start + kept] = chunk_bottleneck[:kept]
+
+    return {
+        "n_samples": n_samples,
+        "system_capacity": system_summary.summary(percentiles),
+        "pool_capacity": {
+            name: pool_summaries[r].summary(percentiles) for r, name in enumerate(resource_names)
+        },
+        "bottleneck_probability": {name: float(counts[r] / n_samples) for r, name in enumerate(resource_names)},
+        "samples": samples,
+    }